@@ -0,0 +1,559 @@
+import json
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, AnalysisBatch, AnalysisGrid, AnalysisResult
+
+logger = logging.getLogger(__name__)
+
+# Batch fields every backend returns from get_batch()
+BATCH_FIELDS = ("created_at", "expires_at", "payload", "min_savings",
+                "target_amount", "prefilter", "incremental", "total_customers",
+                "analyzed_count", "qualified_count", "uwm_calls", "reused_calls",
+                "job", "cancel_requested")
+
+# Grid fields describing what a grid was quoted from (optional)
+GRID_SOURCE_FIELDS = ("payload_key", "customer_version", "inputs_fingerprint")
+
+
+class AnalysisStore:
+    """
+    Storage for batch analysis runs and their per-customer results.
+
+    Batches are plain dicts with BATCH_FIELDS (datetimes are tz-aware UTC);
+    "job" is the last progress snapshot of the batch's background job (None
+    until one starts) and "cancel_requested" asks the worker running it to
+    stop, so any worker can report on or cancel a job. Results are the
+    JSON-shaped analysis dicts the API returns. Grids are
+    {"current_payment", "quoted_at", "scenarios", *GRID_SOURCE_FIELDS} dicts
+    holding every price point quoted for a customer, before any min_savings
+    filtering.
+    """
+
+    def create_batch(self, cache_key: str, batch: dict) -> None:
+        raise NotImplementedError
+
+    def get_batch(self, cache_key: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def update_batch(self, cache_key: str, **fields) -> None:
+        raise NotImplementedError
+
+    def delete_batch(self, cache_key: str) -> None:
+        raise NotImplementedError
+
+    def put_result(self, cache_key: str, customer_key: str, result: dict,
+                   qualified: bool, uwm_calls: int = 0,
+                   reused_calls: int = 0) -> None:
+        """
+        Store (or replace) a customer's result. analyzed_count counts
+        customers, so it only grows when the customer is new to the batch;
+        qualified_count follows the change in the customer's qualified flag.
+        uwm_calls / reused_calls grow by the given amounts on every call,
+        re-analyses included, since those quotes were requested.
+        """
+        raise NotImplementedError
+
+    def get_result(self, cache_key: str, customer_key: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def result_keys(self, cache_key: str) -> set:
+        raise NotImplementedError
+
+    def list_results(self,
+                     cache_key: str,
+                     after: Optional[str] = None,
+                     limit: Optional[int] = None,
+                     qualified_only: bool = False,
+                     since: Optional[datetime] = None
+                     ) -> Tuple[List[Tuple[str, dict]], Optional[str]]:
+        """
+        Page through results ordered by customer_key; with `since`, only
+        those stored (inserted or replaced) at or after it.
+        Returns ([(customer_key, result), ...], next_after) where next_after
+        is None on the last page.
+        """
+        raise NotImplementedError
+
+    def mark_viewed(self, cache_key: str, customer_key: str) -> bool:
+        raise NotImplementedError
+
+    def put_grid(self, cache_key: str, customer_key: str, grid: dict) -> None:
+        """Store (or replace) the unfiltered rate grid of a customer."""
+        raise NotImplementedError
+
+    def list_grids(self, cache_key: str) -> List[Tuple[str, dict]]:
+        """All grids of a batch as [(customer_key, grid), ...] by customer_key."""
+        raise NotImplementedError
+
+    def find_grid(self, customer_key: str, payload_key: str,
+                  customer_version: int, inputs_fingerprint: str,
+                  since: datetime) -> Optional[Tuple[str, dict]]:
+        """
+        Newest grid of any live batch quoted for this customer version, inputs
+        and payload at or after `since`, as (cache_key, grid).
+        """
+        raise NotImplementedError
+
+    def sweep_expired(self, now: Optional[datetime] = None) -> int:
+        """Delete expired batches. Returns how many were removed."""
+        raise NotImplementedError
+
+    def stats(self) -> dict:
+        raise NotImplementedError
+
+
+# ============================================================
+# In-memory backend (single process)
+# ============================================================
+class InMemoryAnalysisStore(AnalysisStore):
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._batches = {}  # {cache_key: {**batch, "results": {...}, "qualified": set(), "viewed": set()}}
+
+    def create_batch(self, cache_key, batch):
+        with self._lock:
+            self._batches[cache_key] = {
+                **{f: batch.get(f) for f in BATCH_FIELDS},
+                "incremental": bool(batch.get("incremental", False)),
+                "total_customers": batch.get("total_customers", 0),
+                "analyzed_count": 0,
+                "qualified_count": 0,
+                "uwm_calls": 0,
+                "reused_calls": 0,
+                "job": None,
+                "cancel_requested": False,
+                "results": {},
+                "stored_at": {},
+                "qualified": set(),
+                "grids": {},
+            }
+
+    def get_batch(self, cache_key):
+        with self._lock:
+            entry = self._batches.get(cache_key)
+            if entry is None:
+                return None
+            return {f: entry[f] for f in BATCH_FIELDS}
+
+    def update_batch(self, cache_key, **fields):
+        with self._lock:
+            entry = self._batches.get(cache_key)
+            if entry is not None:
+                entry.update({k: v for k, v in fields.items() if k in BATCH_FIELDS})
+
+    def delete_batch(self, cache_key):
+        with self._lock:
+            self._batches.pop(cache_key, None)
+
+    def put_result(self, cache_key, customer_key, result, qualified,
+                   uwm_calls=0, reused_calls=0):
+        with self._lock:
+            entry = self._batches.get(cache_key)
+            if entry is None:
+                return
+            if customer_key not in entry["results"]:
+                entry["analyzed_count"] += 1
+            was_qualified = customer_key in entry["qualified"]
+            entry["results"][customer_key] = result
+            entry["stored_at"][customer_key] = datetime.now(timezone.utc)
+            entry["qualified_count"] += int(qualified) - int(was_qualified)
+            entry["uwm_calls"] += uwm_calls
+            entry["reused_calls"] += reused_calls
+            if qualified:
+                entry["qualified"].add(customer_key)
+            else:
+                entry["qualified"].discard(customer_key)
+
+    def get_result(self, cache_key, customer_key):
+        with self._lock:
+            entry = self._batches.get(cache_key)
+            if entry is None:
+                return None
+            return entry["results"].get(customer_key)
+
+    def result_keys(self, cache_key):
+        with self._lock:
+            entry = self._batches.get(cache_key)
+            return set(entry["results"]) if entry else set()
+
+    def list_results(self, cache_key, after=None, limit=None, qualified_only=False,
+                     since=None):
+        with self._lock:
+            entry = self._batches.get(cache_key)
+            if entry is None:
+                return [], None
+            keys = sorted(entry["qualified"] if qualified_only else entry["results"])
+            if since is not None:
+                keys = [k for k in keys if entry["stored_at"][k] >= since]
+            if after is not None:
+                keys = [k for k in keys if k > after]
+            page = keys if limit is None else keys[:limit]
+            items = [(k, entry["results"][k]) for k in page]
+
+        next_after = page[-1] if limit is not None and len(keys) > limit else None
+        return items, next_after
+
+    def mark_viewed(self, cache_key, customer_key):
+        with self._lock:
+            entry = self._batches.get(cache_key)
+            if entry is None or customer_key not in entry["results"]:
+                return False
+            entry["results"][customer_key]["viewed"] = True
+            return True
+
+    def put_grid(self, cache_key, customer_key, grid):
+        with self._lock:
+            entry = self._batches.get(cache_key)
+            if entry is not None:
+                entry["grids"][customer_key] = grid
+
+    def list_grids(self, cache_key):
+        with self._lock:
+            entry = self._batches.get(cache_key)
+            if entry is None:
+                return []
+            return sorted(entry["grids"].items())
+
+    def find_grid(self, customer_key, payload_key, customer_version,
+                  inputs_fingerprint, since):
+        found = None
+        with self._lock:
+            for cache_key, entry in self._batches.items():
+                grid = entry["grids"].get(customer_key)
+                if (grid is None or grid["quoted_at"] < since
+                        or grid.get("payload_key") != payload_key
+                        or grid.get("customer_version") != customer_version
+                        or grid.get("inputs_fingerprint") != inputs_fingerprint):
+                    continue
+                if found is None or grid["quoted_at"] > found[1]["quoted_at"]:
+                    found = (cache_key, grid)
+        return found
+
+    def sweep_expired(self, now=None):
+        now = now or datetime.now(timezone.utc)
+        with self._lock:
+            expired = [k for k, e in self._batches.items() if now > e["expires_at"]]
+            for k in expired:
+                del self._batches[k]
+        return len(expired)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "backend": "memory",
+                "batches": len(self._batches),
+                "results": sum(len(e["results"]) for e in self._batches.values()),
+                "grids": sum(len(e["grids"]) for e in self._batches.values()),
+            }
+
+
+# ============================================================
+# SQLAlchemy backend (shared by every worker, survives restarts)
+# ============================================================
+def _to_db_time(dt: datetime) -> datetime:
+    """Store naive UTC (SQLite drops tzinfo)."""
+    if dt is not None and dt.tzinfo is not None:
+        dt = dt.astimezone(timezone.utc).replace(tzinfo=None)
+    return dt
+
+
+def _from_db_time(dt: datetime) -> datetime:
+    if dt is not None and dt.tzinfo is None:
+        dt = dt.replace(tzinfo=timezone.utc)
+    return dt
+
+
+class SqlAnalysisStore(AnalysisStore):
+    """
+    Keeps one AnalysisBatch row per run and one AnalysisResult row per
+    customer. Every call runs in its own app context/session so it can be
+    used from request handlers, background jobs and the sweeper alike.
+    """
+
+    def __init__(self, app):
+        self._app = app
+
+    def _batch_dict(self, row: AnalysisBatch) -> dict:
+        return {
+            "created_at": _from_db_time(row.created_at),
+            "expires_at": _from_db_time(row.expires_at),
+            "payload": json.loads(row.payload_data),
+            "min_savings": row.min_savings,
+            "target_amount": row.target_amount,
+            "prefilter": row.prefilter,
+            "incremental": row.incremental,
+            "total_customers": row.total_customers,
+            "analyzed_count": row.analyzed_count,
+            "qualified_count": row.qualified_count,
+            "uwm_calls": row.uwm_calls,
+            "reused_calls": row.reused_calls,
+            "job": json.loads(row.job_data) if row.job_data else None,
+            "cancel_requested": row.job_cancel_requested,
+        }
+
+    def create_batch(self, cache_key, batch):
+        with self._app.app_context():
+            db.session.add(AnalysisBatch(
+                cache_key=cache_key,
+                payload_data=json.dumps(batch.get("payload") or {}),
+                min_savings=batch["min_savings"],
+                target_amount=batch["target_amount"],
+                prefilter=bool(batch.get("prefilter", False)),
+                incremental=bool(batch.get("incremental", False)),
+                total_customers=batch.get("total_customers", 0),
+                created_at=_to_db_time(batch["created_at"]),
+                expires_at=_to_db_time(batch["expires_at"]),
+            ))
+            db.session.commit()
+
+    def get_batch(self, cache_key):
+        with self._app.app_context():
+            row = db.session.get(AnalysisBatch, cache_key)
+            return self._batch_dict(row) if row else None
+
+    def update_batch(self, cache_key, **fields):
+        values = {}
+        for k, v in fields.items():
+            if k == "payload":
+                values["payload_data"] = json.dumps(v or {})
+            elif k == "job":
+                values["job_data"] = json.dumps(v) if v is not None else None
+            elif k == "cancel_requested":
+                values["job_cancel_requested"] = bool(v)
+            elif k in ("created_at", "expires_at"):
+                values[k] = _to_db_time(v)
+            elif k in BATCH_FIELDS:
+                values[k] = v
+        if not values:
+            return
+        with self._app.app_context():
+            db.session.execute(
+                update(AnalysisBatch)
+                .where(AnalysisBatch.cache_key == cache_key)
+                .values(**values))
+            db.session.commit()
+
+    def delete_batch(self, cache_key):
+        with self._app.app_context():
+            db.session.execute(
+                delete(AnalysisResult).where(AnalysisResult.cache_key == cache_key))
+            db.session.execute(
+                delete(AnalysisGrid).where(AnalysisGrid.cache_key == cache_key))
+            db.session.execute(
+                delete(AnalysisBatch).where(AnalysisBatch.cache_key == cache_key))
+            db.session.commit()
+
+    def put_result(self, cache_key, customer_key, result, qualified,
+                   uwm_calls=0, reused_calls=0):
+        data = json.dumps(result, default=str)
+        with self._app.app_context():
+            existing = db.session.execute(
+                select(AnalysisResult).where(
+                    AnalysisResult.cache_key == cache_key,
+                    AnalysisResult.customer_key == customer_key)).scalar_one_or_none()
+            if existing:
+                analyzed = 0
+                qualified_delta = int(qualified) - int(existing.qualified)
+                existing.result_data = data
+                existing.qualified = qualified
+                existing.viewed = bool(result.get("viewed"))
+                existing.analyzed_at = datetime.utcnow()
+            else:
+                analyzed = 1
+                qualified_delta = int(qualified)
+                db.session.add(AnalysisResult(
+                    cache_key=cache_key,
+                    customer_key=customer_key,
+                    qualified=qualified,
+                    viewed=bool(result.get("viewed")),
+                    result_data=data,
+                ))
+
+            # Counters are bumped in SQL so concurrent workers don't lose updates
+            db.session.execute(
+                update(AnalysisBatch)
+                .where(AnalysisBatch.cache_key == cache_key)
+                .values(analyzed_count=AnalysisBatch.analyzed_count + analyzed,
+                        qualified_count=AnalysisBatch.qualified_count + qualified_delta,
+                        uwm_calls=AnalysisBatch.uwm_calls + uwm_calls,
+                        reused_calls=AnalysisBatch.reused_calls + reused_calls))
+            try:
+                db.session.commit()
+            except IntegrityError:
+                # Another worker stored this customer first (or the batch is gone)
+                db.session.rollback()
+                logger.info("Skipped duplicate/orphaned result %s/%s", cache_key, customer_key)
+
+    def _result_dict(self, row: AnalysisResult) -> dict:
+        result = json.loads(row.result_data)
+        result["viewed"] = row.viewed
+        return result
+
+    def get_result(self, cache_key, customer_key):
+        with self._app.app_context():
+            row = db.session.execute(
+                select(AnalysisResult).where(
+                    AnalysisResult.cache_key == cache_key,
+                    AnalysisResult.customer_key == customer_key)).scalar_one_or_none()
+            return self._result_dict(row) if row else None
+
+    def result_keys(self, cache_key):
+        with self._app.app_context():
+            return set(db.session.execute(
+                select(AnalysisResult.customer_key).where(
+                    AnalysisResult.cache_key == cache_key)).scalars())
+
+    def list_results(self, cache_key, after=None, limit=None, qualified_only=False,
+                     since=None):
+        stmt = (select(AnalysisResult)
+                .where(AnalysisResult.cache_key == cache_key)
+                .order_by(AnalysisResult.customer_key))
+        if qualified_only:
+            stmt = stmt.where(AnalysisResult.qualified.is_(True))
+        if since is not None:
+            stmt = stmt.where(AnalysisResult.analyzed_at >= _to_db_time(since))
+        if after is not None:
+            stmt = stmt.where(AnalysisResult.customer_key > after)
+        if limit is not None:
+            stmt = stmt.limit(limit + 1)
+
+        with self._app.app_context():
+            rows = db.session.execute(stmt).scalars().all()
+            next_after = None
+            if limit is not None and len(rows) > limit:
+                rows = rows[:limit]
+                next_after = rows[-1].customer_key
+            return [(r.customer_key, self._result_dict(r)) for r in rows], next_after
+
+    def mark_viewed(self, cache_key, customer_key):
+        with self._app.app_context():
+            res = db.session.execute(
+                update(AnalysisResult)
+                .where(AnalysisResult.cache_key == cache_key,
+                       AnalysisResult.customer_key == customer_key)
+                .values(viewed=True))
+            db.session.commit()
+            return res.rowcount > 0
+
+    def put_grid(self, cache_key, customer_key, grid):
+        data = json.dumps(grid["scenarios"])
+        quoted_at = _to_db_time(grid["quoted_at"])
+        with self._app.app_context():
+            existing = db.session.execute(
+                select(AnalysisGrid).where(
+                    AnalysisGrid.cache_key == cache_key,
+                    AnalysisGrid.customer_key == customer_key)).scalar_one_or_none()
+            source = {f: grid.get(f) for f in GRID_SOURCE_FIELDS}
+            if existing:
+                existing.grid_data = data
+                existing.current_payment = grid["current_payment"]
+                existing.quoted_at = quoted_at
+                for f, v in source.items():
+                    setattr(existing, f, v)
+            else:
+                db.session.add(AnalysisGrid(
+                    cache_key=cache_key,
+                    customer_key=customer_key,
+                    current_payment=grid["current_payment"],
+                    grid_data=data,
+                    quoted_at=quoted_at,
+                    **source,
+                ))
+            try:
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+                logger.info("Skipped duplicate/orphaned grid %s/%s", cache_key, customer_key)
+
+    def _grid_dict(self, row: AnalysisGrid) -> dict:
+        return {
+            "current_payment": row.current_payment,
+            "quoted_at": _from_db_time(row.quoted_at),
+            "scenarios": json.loads(row.grid_data),
+            **{f: getattr(row, f) for f in GRID_SOURCE_FIELDS},
+        }
+
+    def list_grids(self, cache_key):
+        with self._app.app_context():
+            rows = db.session.execute(
+                select(AnalysisGrid)
+                .where(AnalysisGrid.cache_key == cache_key)
+                .order_by(AnalysisGrid.customer_key)).scalars().all()
+            return [(r.customer_key, self._grid_dict(r)) for r in rows]
+
+    def find_grid(self, customer_key, payload_key, customer_version,
+                  inputs_fingerprint, since):
+        with self._app.app_context():
+            row = db.session.execute(
+                select(AnalysisGrid)
+                .where(AnalysisGrid.customer_key == customer_key,
+                       AnalysisGrid.payload_key == payload_key,
+                       AnalysisGrid.quoted_at >= _to_db_time(since),
+                       AnalysisGrid.customer_version == customer_version,
+                       AnalysisGrid.inputs_fingerprint == inputs_fingerprint)
+                .order_by(AnalysisGrid.quoted_at.desc())
+                .limit(1)).scalar_one_or_none()
+            return (row.cache_key, self._grid_dict(row)) if row else None
+
+    def sweep_expired(self, now=None):
+        now = _to_db_time(now or datetime.now(timezone.utc))
+        with self._app.app_context():
+            expired = select(AnalysisBatch.cache_key).where(AnalysisBatch.expires_at < now)
+            db.session.execute(
+                delete(AnalysisResult).where(AnalysisResult.cache_key.in_(expired)))
+            db.session.execute(
+                delete(AnalysisGrid).where(AnalysisGrid.cache_key.in_(expired)))
+            res = db.session.execute(
+                delete(AnalysisBatch).where(AnalysisBatch.expires_at < now))
+            db.session.commit()
+            return res.rowcount
+
+    def stats(self):
+        with self._app.app_context():
+            return {
+                "backend": "sql",
+                "batches": db.session.query(AnalysisBatch).count(),
+                "results": db.session.query(AnalysisResult).count(),
+                "grids": db.session.query(AnalysisGrid).count(),
+            }
+
+
+# ============================================================
+# TTL sweeper
+# ============================================================
+class AnalysisStoreSweeper:
+    """Daemon thread that drops expired batches every `interval` seconds."""
+
+    def __init__(self, store: AnalysisStore, interval: float = 300.0):
+        self._store = store
+        self._interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self) -> None:
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run,
+                                        name="analysis-store-sweeper",
+                                        daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+
+    def _run(self) -> None:
+        while not self._stop.wait(self._interval):
+            try:
+                removed = self._store.sweep_expired()
+                if removed:
+                    logger.info("Analysis store sweeper removed %d expired batches", removed)
+            except Exception:
+                logger.exception("Analysis store sweep failed")
@@ -0,0 +1,191 @@
+import logging
+import queue
+import threading
+from datetime import datetime, timezone
+from typing import Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class BatchJob:
+    """
+    Runs `process(key)` for every key on a small pool of worker threads.
+
+    - Progress is tracked per key, so a cancelled job can be resumed and only
+      the keys that were never processed are picked up again
+    - `process` must do its own result bookkeeping and returns False when it
+      skipped the key (e.g. the job was cancelled), so a resume picks it up
+    - Exceptions are counted as failures and the job keeps going; failed
+      keys are not done, so a resume retries them
+    - `on_progress(job)` is called after every state change and processed
+      key (one call at a time), so progress can be shared with other
+      processes
+    """
+
+    def __init__(self,
+                 job_id: str,
+                 process: Callable[[str], Optional[bool]],
+                 workers: int = 2,
+                 on_finish: Optional[Callable[["BatchJob"], None]] = None,
+                 on_progress: Optional[Callable[["BatchJob"], None]] = None):
+        self.job_id = job_id
+        self._process = process
+        self.workers = max(1, workers)
+        self._on_finish = on_finish
+        self._on_progress = on_progress
+
+        self._lock = threading.Lock()
+        self._report_lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._threads = []
+
+        self.state = "pending"
+        self.total = 0
+        self.processed = 0
+        self.failed = 0
+        self.errors = []  # last few (key, error) pairs
+        self.started_at = None
+        self.finished_at = None
+        self._done_keys = set()
+
+    # ---------------- control ----------------
+    def start(self, keys: Iterable[str]) -> bool:
+        """Start (or resume) processing `keys`; keys already done are skipped."""
+        with self._lock:
+            if self.is_running():
+                return False
+
+            pending = [k for k in keys if k not in self._done_keys]
+            self.total = len(self._done_keys) + len(pending)
+            self.failed = 0
+            self.errors = []
+            self._cancel.clear()
+            self.state = "running"
+            self.started_at = datetime.now(timezone.utc)
+            self.finished_at = None
+
+            work = queue.Queue()
+            for k in pending:
+                work.put(k)
+
+            self._threads = [
+                threading.Thread(target=self._worker,
+                                 args=(work, ),
+                                 name=f"batch-{self.job_id[:8]}-{i}",
+                                 daemon=True)
+                for i in range(min(self.workers, max(1, len(pending))))
+            ]
+            for t in self._threads:
+                t.start()
+
+            threading.Thread(target=self._wait_for_workers,
+                             name=f"batch-{self.job_id[:8]}-monitor",
+                             daemon=True).start()
+
+        self._report()
+        return True
+
+    def cancel(self) -> bool:
+        with self._lock:
+            if not self.is_running():
+                return False
+            self.state = "cancelling"
+            self._cancel.set()
+
+        self._report()
+        return True
+
+    def is_running(self) -> bool:
+        return self.state in ("running", "cancelling")
+
+    # ---------------- workers ----------------
+    def _worker(self, work: "queue.Queue[str]") -> None:
+        while not self._cancel.is_set():
+            try:
+                key = work.get_nowait()
+            except queue.Empty:
+                return
+
+            try:
+                done = self._process(key) is not False
+            except Exception as e:
+                logger.error("Batch job %s failed on %s: %s",
+                             self.job_id, key, e, exc_info=True)
+                with self._lock:
+                    self.failed += 1
+                    self.errors = (self.errors + [(key, str(e))])[-20:]
+            else:
+                if done:
+                    with self._lock:
+                        self.processed += 1
+                        self._done_keys.add(key)
+            self._report()
+
+    def _wait_for_workers(self) -> None:
+        for t in self._threads:
+            t.join()
+
+        with self._lock:
+            self.state = "cancelled" if self._cancel.is_set() else "completed"
+            self.finished_at = datetime.now(timezone.utc)
+
+        logger.info("Batch job %s %s: %d/%d processed (%d failed)",
+                    self.job_id, self.state, self.processed, self.total,
+                    self.failed)
+        self._report()
+        if self._on_finish:
+            try:
+                self._on_finish(self)
+            except Exception:
+                logger.exception("Batch job %s on_finish hook failed",
+                                 self.job_id)
+
+    # ---------------- reporting ----------------
+    def _report(self) -> None:
+        if self._on_progress is None:
+            return
+        # Serialized, so a slower call never overwrites a newer snapshot
+        with self._report_lock:
+            try:
+                self._on_progress(self)
+            except Exception:
+                logger.exception("Batch job %s on_progress hook failed",
+                                 self.job_id)
+
+    def progress(self) -> dict:
+        with self._lock:
+            return {
+                "job_id": self.job_id,
+                "state": self.state,
+                "total": self.total,
+                "processed": self.processed,
+                "failed": self.failed,
+                "remaining": max(0, self.total - self.processed),
+                "workers": self.workers,
+                "started_at": self.started_at.isoformat() if self.started_at else None,
+                "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+                "errors": [{"key": k, "error": e} for k, e in self.errors],
+            }
+
+
+class BatchJobRegistry:
+    """Jobs of this process, keyed by analysis cache_key."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._jobs = {}
+
+    def get(self, key: str) -> Optional[BatchJob]:
+        with self._lock:
+            return self._jobs.get(key)
+
+    def add(self, key: str, job: BatchJob) -> BatchJob:
+        with self._lock:
+            self._jobs[key] = job
+            return job
+
+    def remove(self, key: str) -> None:
+        with self._lock:
+            job = self._jobs.pop(key, None)
+        if job:
+            job.cancel()
@@ -0,0 +1,149 @@
+"""
+Benchmark of logging overhead per UWM price-quote call.
+
+Compares the old logging (request and response pretty-printed with
+json.dumps(indent=2) at INFO, written synchronously by the calling
+thread) with the structured pipeline in structured_logging (one compact
+JSON line per attempt, bodies redacted and attached to a sampled fraction
+of calls, written by a QueueListener thread). Both write to a temporary
+file. "caller" is the time spent on the thread making the UWM call;
+"total" also waits for the writer thread to drain the queue.
+
+    python bench_logging.py [calls] [products_per_response] [points_per_product]
+"""
+import gc
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import time
+
+from structured_logging import BodyLogPolicy, setup_logging
+
+URL = "https://stg.api.uwm.com/public/instantpricequote/v2/pricequote"
+REPEATS = 3
+
+
+def make_payload(rng):
+    return {
+        "borrowerName": "Jane Q. Borrower",
+        "creditScore": rng.randint(620, 820),
+        "monthlyIncome": rng.randint(4000, 20000),
+        "loanAmount": rng.randint(150000, 900000),
+        "appraisedValue": rng.randint(300000, 1500000),
+        "propertyZipCode": "48226",
+        "propertyState": "MI",
+        "propertyCounty": "Wayne",
+        "purposeTypeId": "2",
+        "loanTypeIds": ["1", "2"],
+        "loanTermIds": ["0"],
+        "buyDownAliasId": rng.choice(["None", "1-0 LLPA", "2-1 LLPA"]),
+    }
+
+
+def make_response(rng, products, points):
+    items = []
+    for p in range(products):
+        term = rng.choice([10, 15, 20, 30])
+        items.append({
+            "actualTermYears": term,
+            "mortgageProductName": f"Conventional {term} Year Fixed",
+            "mortgageProductAlias": f"C{term}-{p}",
+            "quotePricePoints": [{
+                "interestRate": {"value": round(rng.uniform(4, 8), 3)},
+                "apr": {"value": round(rng.uniform(4, 8), 3)},
+                "monthlyPayment": {"value": round(rng.uniform(1000, 6000), 2)},
+                "finalPriceAfterOriginationFee": {"amount": rng.randint(-8000, 6000)},
+                "lockPeriodDays": 30,
+            } for _ in range(points)],
+        })
+    return {"validQuoteItems": items}
+
+
+def run_legacy(calls, path):
+    """The old post_price_quote logging: two pretty-printed INFO records per call."""
+    logger = logging.getLogger("bench.legacy")
+    logger.propagate = False
+    logger.setLevel(logging.INFO)
+    handler = logging.FileHandler(path, mode="w")
+    handler.setFormatter(logging.Formatter("%(levelname)s:%(name)s:%(message)s"))
+    logger.addHandler(handler)
+
+    t0 = time.perf_counter()
+    for payload, response in calls:
+        logger.info("\n>>> UWM REQUEST (%s)\nURL: %s\nPayload:\n%s",
+                    "post_price_quote", URL, json.dumps(payload, indent=2, default=str))
+        logger.info("\n<<< UWM RESPONSE status=%s (attempt %d/%d)\n%s",
+                    200, 1, 5, json.dumps(response, indent=2, default=str))
+    elapsed = time.perf_counter() - t0
+
+    logger.removeHandler(handler)
+    handler.close()
+    return elapsed, elapsed
+
+
+def run_structured(calls, path, policy):
+    """post_price_quote's current logging: one compact record per attempt."""
+    stream = open(path, "w")
+    pipeline = setup_logging("INFO", "json", stream=stream)
+    logger = logging.getLogger("bench.structured")
+
+    t0 = time.perf_counter()
+    for payload, response in calls:
+        log_bodies = policy.sampled()
+        fields = {"event": "uwm_price_quote", "status": 200, "attempt": 1,
+                  "elapsed_ms": 412.3, "response_bytes": 48213}
+        if log_bodies:
+            fields["request_body"] = policy.body(payload)
+            fields["response_body"] = policy.body(response)
+        logger.info("UWM price quote status=%s (attempt %d/%d)", 200, 1, 5,
+                    extra=fields)
+    caller = time.perf_counter() - t0
+    pipeline.stop()
+    total = time.perf_counter() - t0
+
+    logging.getLogger().removeHandler(pipeline.handler)
+    stream.close()
+    return caller, total
+
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    products = int(sys.argv[2]) if len(sys.argv) > 2 else 12
+    points = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    rng = random.Random(1234)
+    calls = [(make_payload(rng), make_response(rng, products, points)) for _ in range(n)]
+    # Keep the collector from rescanning the pre-built bodies during the runs
+    gc.collect()
+    gc.freeze()
+    body_bytes = len(json.dumps(calls[0][1], separators=(",", ":")))
+    print(f"{n} UWM calls, response ~{body_bytes / 1024:.0f} KiB compact "
+          f"({products} products x {points} points)\n")
+
+    runs = [
+        ("legacy pretty-print", lambda path: run_legacy(calls, path)),
+        ("structured, no bodies", lambda path: run_structured(
+            calls, path, BodyLogPolicy(sample_rate=0.0))),
+        ("structured, 1% sampled", lambda path: run_structured(
+            calls, path, BodyLogPolicy(sample_rate=0.01))),
+        ("structured, full bodies", lambda path: run_structured(
+            calls, path, BodyLogPolicy(full=True))),
+    ]
+    baseline = None
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, run in runs:
+            path = os.path.join(tmp, "log.txt")
+            # Fastest of REPEATS runs
+            caller, total = min(run(path) for _ in range(REPEATS))
+            size = os.path.getsize(path)
+            baseline = baseline or caller
+            print(f"  {name:<24}: caller {caller / n * 1e6:8.1f} us/call "
+                  f"({baseline / caller:6.1f}x)  total {total / n * 1e6:8.1f} us/call  "
+                  f"log {size / n / 1024:7.2f} KiB/call")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,416 @@
+"""
+Benchmark of the analysis routes' per-product loops and of
+rate_grid.score_sheets, which the what-if sweep runs over stored grids.
+
+Builds random quote responses for three buydown scenarios (with ties,
+missing fields, repeated products and savings right at the min_savings
+boundary) and checks that every variant picks exactly the same rates,
+order, closest-to-target row and best option as the old loops over the
+raw responses, then times them. "route loops" is the current route code,
+which also collects the grid columns analyze-next stores; "sweep" loads
+those grids with RateSheet.from_dict and scores them with score_sheets.
+Then prints what analyze-next, the detailed route (with its Year 1 / Year
+2 lookups) and accurate-buydown spend per customer past the UWM calls, and
+the memory the sweep's loaded grids take as JSON column lists and as
+RateSheets. Timings on a busy machine vary by 10-15% between runs.
+
+    python bench_rate_grid.py [customers] [products_per_scenario] [points_per_product]
+"""
+import gc
+import json
+import random
+import sys
+import time
+import tracemalloc
+
+from rate_grid import score_sheets
+from rate_index import RateIndex
+from rate_sheet import RateSheet
+
+BUYDOWNS = ["None", "1-0 LLPA", "2-1 LLPA"]
+REPEATS = 5
+
+
+def make_quote(rng, products, points, current_payment, min_savings):
+    items = []
+    for p in range(products):
+        term = rng.choice([10, 15, 20, 30])
+        # Repeat an earlier product name now and then (non-contiguous duplicates)
+        name = f"Conventional {term} Year Fixed #{rng.randrange(max(1, products // 2))}"
+        pps = []
+        for _ in range(points):
+            rate = round(rng.uniform(4.0, 8.0) * 8) / 8  # 1/8 steps: plenty of equal rates
+            if rng.random() < 0.1:
+                # Savings within a cent of min_savings, to exercise rounding
+                payment = current_payment - min_savings + rng.choice([-0.006, -0.005, -0.004, 0.0, 0.004, 0.005])
+            else:
+                payment = current_payment - rng.uniform(-200, 900)
+            pps.append({
+                "interestRate": {"value": rate} if rng.random() > 0.03 else {},
+                "monthlyPayment": {"value": payment} if rng.random() > 0.05 else None,
+                "finalPriceAfterOriginationFee":
+                {"amount": round(rng.uniform(-8000, 6000) / 250) * 250} if rng.random() > 0.05 else {},
+            })
+        items.append({
+            "actualTermYears": term,
+            "mortgageProductName": name,
+            "mortgageProductAlias": f"C{term}-{p}",
+            "quotePricePoints": pps,
+        })
+    return {"validQuoteItems": items}
+
+
+# ---------------- previous per-product loops ----------------
+def _to_float(x):
+    try:
+        return None if x is None else float(x)
+    except (TypeError, ValueError):
+        return None
+
+
+def legacy_score(quotes, current_payment, min_savings, target_amount, rounded_threshold):
+    scenarios = []
+    best_option, best_savings = None, 0.0
+    for buydown, quote_body in zip(BUYDOWNS, quotes):
+        products_by_term = {}
+        for item in quote_body.get("validQuoteItems", []):
+            term = item.get("actualTermYears")
+            product_name = item.get("mortgageProductName")
+            key = (term, product_name)
+            if key not in products_by_term:
+                products_by_term[key] = {
+                    "term_years": term,
+                    "product_name": product_name,
+                    "product_alias": item.get("mortgageProductAlias"),
+                    "rates": []
+                }
+            for pp in item.get("quotePricePoints", []):
+                mp_val = _to_float((pp.get("monthlyPayment") or {}).get("value"))
+                if mp_val is None:
+                    continue
+                savings = current_payment - mp_val
+                passed = (round(savings, 2) >= min_savings
+                          if rounded_threshold else savings >= min_savings)
+                if not passed:
+                    continue
+                ir = pp.get("interestRate")
+                rate_data = {
+                    "interest_rate": _to_float(ir.get("value") if isinstance(ir, dict) else ir),
+                    "monthly_payment": mp_val,
+                    "monthly_savings": round(savings, 2),
+                    "credit_cost": _to_float((pp.get("finalPriceAfterOriginationFee") or {}).get("amount")),
+                }
+                products_by_term[key]["rates"].append(rate_data)
+                if savings > best_savings:
+                    best_savings = float(savings)
+                    best_option = {"buydown": buydown, "product": product_name, "term": term, **rate_data}
+
+        products = []
+        for product in products_by_term.values():
+            product["rates"].sort(key=lambda x: x.get("interest_rate")
+                                  if x.get("interest_rate") is not None else 999)
+            closest = None
+            if product["rates"]:
+                closest_rate = min(
+                    product["rates"],
+                    key=lambda x: abs(x.get("credit_cost", 0) - target_amount)
+                    if x.get("credit_cost") is not None else float('inf'))
+                closest = next(i for i, r in enumerate(product["rates"]) if r is closest_rate)
+            products.append((product["term_years"], product["product_name"],
+                             product["product_alias"], product["rates"], closest))
+        scenarios.append(products)
+    return scenarios, best_option
+
+
+def _closest_products(products_by_term, target_amount):
+    products = []
+    for product in products_by_term.values():
+        rates = product["rates"]
+        rates.sort(key=lambda x: x["interest_rate"]
+                   if x["interest_rate"] is not None else 999)
+        closest = None
+        if rates:
+            closest_rate = min(rates, key=lambda x: abs(x["credit_cost"] - target_amount)
+                               if x["credit_cost"] is not None else float('inf'))
+            closest = next(i for i, r in enumerate(rates) if r is closest_rate)
+        products.append((product["term_years"], product["product_name"],
+                         product["product_alias"], rates, closest))
+    return products
+
+
+def batch_route_score(quotes, current_payment, min_savings, target_amount):
+    """
+    analyze-next's loop: one pass per response that also fills the grid
+    columns stored for the sweep. Returns the scores and the grid.
+    """
+    scenarios, grid = [], []
+    best_option, best_savings = None, 0.0
+    for buydown, quote_body in zip(BUYDOWNS, quotes):
+        products_by_term = {}
+        grid_products = []
+        for item in quote_body.get("validQuoteItems", []):
+            term = item.get("actualTermYears")
+            product_name = item.get("mortgageProductName")
+            key = (term, product_name)
+            if key not in products_by_term:
+                products_by_term[key] = {
+                    "term_years": term,
+                    "product_name": product_name,
+                    "product_alias": item.get("mortgageProductAlias"),
+                    "rates": []
+                }
+            rates = products_by_term[key]["rates"]
+            rate_col, payment_col, credit_col = [], [], []
+            for pp in item.get("quotePricePoints", []):
+                ir = pp.get("interestRate")
+                rate_val = _to_float(ir.get("value") if isinstance(ir, dict) else ir)
+                mp_val = _to_float((pp.get("monthlyPayment") or {}).get("value"))
+                credit_cost = _to_float((pp.get("finalPriceAfterOriginationFee") or {}).get("amount"))
+                rate_col.append(rate_val)
+                payment_col.append(mp_val)
+                credit_col.append(credit_cost)
+                if mp_val is None or current_payment - mp_val < min_savings:
+                    continue
+                savings = current_payment - mp_val
+                rate_data = {
+                    "interest_rate": rate_val,
+                    "monthly_payment": mp_val,
+                    "monthly_savings": round(savings, 2),
+                    "credit_cost": credit_cost,
+                }
+                rates.append(rate_data)
+                if savings > best_savings:
+                    best_savings = float(savings)
+                    best_option = {"buydown": buydown, "product": product_name, "term": term, **rate_data}
+            grid_products.append({
+                "term_years": term, "product_name": product_name,
+                "product_alias": item.get("mortgageProductAlias"),
+                "rate": rate_col, "payment": payment_col, "credit_cost": credit_col,
+            })
+        grid.append({"buydown_type": buydown, "products": grid_products})
+        scenarios.append(_closest_products(products_by_term, target_amount))
+    return (scenarios, best_option), grid
+
+
+def detailed_route_parse(quotes, current_payment):
+    """analyze_customer_detailed's first pass: every point with a payment."""
+    all_scenarios = []
+    for buydown, quote_body in zip(BUYDOWNS, quotes):
+        products_by_term = {}
+        for item in quote_body.get("validQuoteItems", []):
+            term = item.get("actualTermYears")
+            product_name = item.get("mortgageProductName")
+            key = (term, product_name)
+            if key not in products_by_term:
+                products_by_term[key] = {
+                    "term_years": term,
+                    "product_name": product_name,
+                    "product_alias": item.get("mortgageProductAlias"),
+                    "rates": []
+                }
+            for pp in item.get("quotePricePoints", []):
+                mp_val = _to_float((pp.get("monthlyPayment") or {}).get("value"))
+                if mp_val is None:
+                    continue
+                ir = pp.get("interestRate")
+                products_by_term[key]["rates"].append({
+                    "interest_rate": _to_float(ir.get("value") if isinstance(ir, dict) else ir),
+                    "monthly_payment": mp_val,
+                    "monthly_savings": round(current_payment - mp_val, 2),
+                    "credit_cost": _to_float((pp.get("finalPriceAfterOriginationFee") or {}).get("amount")),
+                })
+        all_scenarios.append({"buydown_type": buydown,
+                              "products": list(products_by_term.values())})
+    return all_scenarios
+
+
+def detailed_route_score(quotes, current_payment, min_savings, target_amount):
+    """analyze_customer_detailed's second pass (best option as the legacy loops pick it)."""
+    scenarios = []
+    best_option, best_savings = None, 0.0
+    for scenario in detailed_route_parse(quotes, current_payment):
+        products_by_term = {}
+        for product in scenario["products"]:
+            key = (product["term_years"], product["product_name"])
+            filtered = products_by_term.setdefault(key, {**product, "rates": []})["rates"]
+            for r in product["rates"]:
+                if r["monthly_savings"] < min_savings:
+                    continue
+                filtered.append(r)
+                savings = current_payment - r["monthly_payment"]
+                if savings > best_savings:
+                    best_savings = savings
+                    best_option = {"buydown": scenario["buydown_type"],
+                                   "product": key[1], "term": key[0], **r}
+        scenarios.append(_closest_products(products_by_term, target_amount))
+    return scenarios, best_option
+
+
+def detailed_route(quotes, current_payment, min_savings, target_amount):
+    """The whole detailed route: both passes plus the Year 1 / Year 2 / actual lookups."""
+    all_scenarios = detailed_route_parse(quotes, current_payment)
+    index = RateIndex(all_scenarios)
+    for scenario in all_scenarios:
+        offsets = {"1-0 LLPA": (1.0, 0.0), "2-1 LLPA": (2.0, 1.0)}.get(scenario["buydown_type"])
+        for product in scenario["products"]:
+            rates = [r for r in product["rates"] if r["monthly_savings"] >= min_savings]
+            rates.sort(key=lambda x: x["interest_rate"]
+                       if x["interest_rate"] is not None else 999)
+            for rate in rates:
+                base = rate["interest_rate"]
+                if offsets is None or not base:
+                    continue
+                term, name = product["term_years"], product["product_name"]
+                rate["buydown_breakdown"] = [index.find_closest(term, name, base - offsets[0]),
+                                             index.find_closest(term, name, base - offsets[1]),
+                                             index.find_closest(term, name, base)]
+
+
+def accurate_buydown_match(quote_body, product_name, term_years, target_rate, current_payment):
+    """get_accurate_buydown's match over one response."""
+    best_match, best_diff = None, float('inf')
+    for item in quote_body.get("validQuoteItems", []):
+        if item.get("actualTermYears") != term_years:
+            continue
+        if product_name not in (item.get("mortgageProductName") or ""):
+            continue
+        for pp in item.get("quotePricePoints", []):
+            ir = pp.get("interestRate")
+            rate_val = _to_float(ir.get("value") if isinstance(ir, dict) else ir)
+            if rate_val is None:
+                continue
+            diff = abs(rate_val - target_rate)
+            if diff < best_diff:
+                best_diff = diff
+                mp = _to_float((pp.get("monthlyPayment") or {}).get("value"))
+                best_match = {
+                    "rate": rate_val, "payment": mp,
+                    "savings": current_payment - mp if mp is not None else None,
+                    "credit_cost": _to_float((pp.get("finalPriceAfterOriginationFee") or {}).get("amount")),
+                    "is_exact": diff < 0.01,
+                }
+    return best_match
+
+
+def allocated(build):
+    """Bytes still allocated by what `build()` returns."""
+    gc.collect()
+    tracemalloc.start()
+    kept = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del kept
+    return size
+
+
+def engine_score(grid, current_payment, min_savings, target_amount, rounded_threshold):
+    """score_sheets over a stored grid, as the what-if sweep runs it."""
+    sheets = [RateSheet.from_dict(s, current_payment) for s in grid]
+    score = score_sheets(sheets, current_payment, min_savings, target_amount,
+                         rounded_threshold=rounded_threshold)
+    scenarios = []
+    for selections in score.scenarios:
+        scenarios.append([(sel.term_years, sel.product_name, sel.product_alias,
+                           [entry.rate_dict(i) for entry, i in sel.points], sel.closest)
+                          for sel in selections])
+    best_option = None
+    if score.best:
+        s, entry, i = score.best
+        best_option = {"buydown": sheets[s].buydown_type, "product": entry.product_name,
+                       "term": entry.term_years, **entry.rate_dict(i)}
+    return scenarios, best_option
+
+
+def report(name, legacy_s, elapsed, expected, got, note):
+    """Print one timing line; exit non-zero when `got` differs from `expected`."""
+    mismatches = sum(1 for a, b in zip(expected, got) if a != b)
+    print(f"  {name:<13}: {elapsed * 1000:9.1f} ms  ({legacy_s / elapsed:.2f}x, {note})  "
+          f"mismatches={mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+
+def best_of(repeats, fn, cases):
+    """
+    ([fn(*case) for case in cases], fastest wall time in seconds over
+    `repeats` timed runs). Timed runs drop each result right away, like a
+    request does once it has responded.
+    """
+    results = [fn(*case) for case in cases]
+    best = None
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for case in cases:
+            fn(*case)
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return results, best
+
+
+def main():
+    customers = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    products = int(sys.argv[2]) if len(sys.argv) > 2 else 8
+    points = int(sys.argv[3]) if len(sys.argv) > 3 else 40
+
+    rng = random.Random(1234)
+    cases = []
+    for _ in range(customers):
+        current_payment = rng.uniform(1500, 6000)
+        min_savings = rng.choice([0.0, 100.0, 200.0, 250.5])
+        target_amount = rng.choice([-2000.0, 0.0, -3500.0])
+        quotes = [make_quote(rng, products, points, current_payment, min_savings) for _ in BUYDOWNS]
+        cases.append((quotes, current_payment, min_savings, target_amount))
+
+    # Keep the collector from rescanning the pre-built responses during the runs
+    gc.collect()
+    gc.freeze()
+
+    print(f"{customers} customers x {len(BUYDOWNS)} scenarios x {products} products x {points} points")
+
+    expected, legacy_s = best_of(
+        REPEATS, lambda q, cp, ms, ta: legacy_score(q, cp, ms, ta, False), cases)
+    print(f"\nbatch (analyze-next)\n  legacy loops : {legacy_s * 1000:9.1f} ms")
+    routed, route_s_batch = best_of(REPEATS, batch_route_score, cases)
+    report("route loops", legacy_s, route_s_batch, expected, [score for score, _ in routed],
+           "incl. grid columns")
+
+    # Grids do not depend on the thresholds; both modes re-score the same ones
+    grid_cases = [(grid, cp, ms, ta) for (_, grid), (_, cp, ms, ta) in zip(routed, cases)]
+    got, engine_s = best_of(
+        REPEATS, lambda g, cp, ms, ta: engine_score(g, cp, ms, ta, False), grid_cases)
+    report("sweep (grid)", legacy_s, engine_s, expected, got, "from_dict + score_sheets")
+
+    expected, legacy_s = best_of(
+        REPEATS, lambda q, cp, ms, ta: legacy_score(q, cp, ms, ta, True), cases)
+    print(f"\ndetailed (rounded threshold)\n  legacy loops : {legacy_s * 1000:9.1f} ms")
+    got, route_s = best_of(REPEATS, detailed_route_score, cases)
+    report("route loops", legacy_s, route_s, expected, got, "all points, then filter")
+    got, engine_s = best_of(
+        REPEATS, lambda g, cp, ms, ta: engine_score(g, cp, ms, ta, True), grid_cases)
+    report("sweep (grid)", legacy_s, engine_s, expected, got, "from_dict + score_sheets")
+
+    # Per-route totals, per customer: what each request spends past the UWM calls
+    _, detailed_s = best_of(REPEATS, detailed_route, cases)
+    match_cases = []
+    for quotes, cp, _, _ in cases:
+        item = quotes[2]["validQuoteItems"][0]
+        match_cases.append((quotes[2], item["mortgageProductName"].split(" #")[0],
+                            item["actualTermYears"], 5.0, cp))
+    _, match_s = best_of(REPEATS, accurate_buydown_match, match_cases)
+    print(f"\nper request (ms per customer)\n"
+          f"  analyze-next      : {route_s_batch / customers * 1000:7.3f}\n"
+          f"  detailed          : {detailed_s / customers * 1000:7.3f}  (incl. Year 1/2 lookups)\n"
+          f"  accurate-buydown  : {match_s / customers * 1000:7.3f}  (one response)")
+
+    # What the sweep holds while it scores: every stored grid, loaded
+    texts = [json.dumps(grid) for _, grid in routed]
+    dict_bytes = allocated(lambda: [json.loads(t) for t in texts])
+    sheet_bytes = allocated(lambda: [[RateSheet.from_dict(s, cp) for s in json.loads(t)]
+                                     for t, (_, cp, _, _) in zip(texts, cases)])
+    print(f"\nsweep grids in memory\n"
+          f"  JSON column lists : {dict_bytes / 2**20:7.1f} MiB\n"
+          f"  RateSheets        : {sheet_bytes / 2**20:7.1f} MiB")
+
+
+if __name__ == "__main__":
+    main()
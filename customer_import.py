@@ -0,0 +1,255 @@
+import csv
+import io
+import json
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import IO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import func, insert, select, update
+
+from models import db, Customer
+
+# Customer columns an import row may set; anything else in a row is ignored
+FLOAT_FIELDS = ("current_monthly_payment", "remaining_balance",
+                "property_value", "monthly_income")
+INT_FIELDS = ("credit_score",)
+TEXT_FIELDS = ("name", "phone", "email", "property_zip", "property_county",
+               "property_state")
+IMPORT_FIELDS = TEXT_FIELDS + FLOAT_FIELDS + INT_FIELDS
+
+IMPORT_FORMATS = ("csv", "ndjson")
+
+
+def detect_format(explicit: Optional[str], content_type: str = "",
+                  filename: str = "") -> Optional[str]:
+    """'csv' or 'ndjson' from ?format=, the file name or the Content-Type."""
+    if explicit:
+        explicit = explicit.lower()
+        return explicit if explicit in IMPORT_FORMATS else None
+    filename = (filename or "").lower()
+    content_type = (content_type or "").lower()
+    if filename.endswith((".ndjson", ".jsonl")) or "ndjson" in content_type:
+        return "ndjson"
+    if filename.endswith(".csv") or "csv" in content_type:
+        return "csv"
+    return None
+
+
+def iter_rows(stream: IO[bytes], fmt: str) -> Iterator[Tuple[int, object]]:
+    """
+    (row number, raw row) pairs read lazily from a binary upload stream.
+    CSV rows are dicts keyed by the header line; NDJSON rows are whatever
+    each non-blank line decodes to (a JSONDecodeError message otherwise).
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        # Row 1 is the header, so data rows are numbered like the file's lines
+        for n, row in enumerate(csv.DictReader(text), start=2):
+            # Blank cells mean "keep the current value", as a missing JSON key
+            yield n, {k.strip(): v for k, v in row.items()
+                      if k and v is not None and v.strip() != ""}
+        return
+
+    for n, line in enumerate(text, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield n, json.loads(line)
+        except ValueError as e:
+            yield n, f"Invalid JSON: {e}"
+
+
+def _coerce(name: str, value):
+    if value is None:
+        return None
+    if name in FLOAT_FIELDS:
+        return float(value)
+    if name in INT_FIELDS:
+        return int(float(value))
+    return str(value).strip()
+
+
+def normalize_row(raw) -> Tuple[Optional[str], Dict[str, object]]:
+    """
+    (customer_key or None, {field: value}) for the IMPORT_FIELDS present in
+    `raw`. Raises ValueError for rows that are not objects or hold values
+    of the wrong type.
+    """
+    if isinstance(raw, str):
+        raise ValueError(raw)
+    if not isinstance(raw, dict):
+        raise ValueError("Row must be an object")
+
+    values = {}
+    for name in IMPORT_FIELDS:
+        if name not in raw:
+            continue
+        try:
+            values[name] = _coerce(name, raw[name])
+        except (TypeError, ValueError):
+            raise ValueError(f"Invalid {name}: {raw[name]!r}")
+
+    customer_key = raw.get("customer_key")
+    customer_key = str(customer_key).strip() if customer_key not in (None, "") else None
+    return customer_key, values
+
+
+@dataclass
+class ImportReport:
+    """Per-row outcomes plus counters of one import run."""
+    outcomes: List[dict] = field(default_factory=list)
+    counts: Dict[str, int] = field(default_factory=lambda: {
+        "inserted": 0, "reactivated": 0, "updated": 0, "unchanged": 0,
+        "error": 0})
+    rows: int = 0
+    chunks: int = 0
+    elapsed: float = 0.0
+    aborted: Optional[str] = None  # why reading the upload stopped early
+
+    def add(self, row: int, customer_key: Optional[str], outcome: str,
+            version: Optional[int] = None, error: Optional[str] = None) -> None:
+        entry = {"row": row, "customer_key": customer_key, "outcome": outcome}
+        if version is not None:
+            entry["version"] = version
+        if error is not None:
+            entry["error"] = error
+        self.outcomes.append(entry)
+        self.counts[outcome] += 1
+
+    def stats(self) -> dict:
+        return {
+            "rows": self.rows,
+            **self.counts,
+            "chunks": self.chunks,
+            "elapsed_ms": round(self.elapsed * 1000, 1),
+            "rows_per_second": round(self.rows / self.elapsed, 1) if self.elapsed else None,
+            "aborted": self.aborted,
+        }
+
+
+class CustomerImporter:
+    """
+    Bulk upsert of customers with SCD Type 2 versioning.
+
+    Rows are matched on customer_key one chunk at a time: a single query
+    loads the current versions of the chunk, rows whose fields all equal
+    the current version are skipped, and the rest are written with one
+    UPDATE closing out the changed versions plus one multi-row INSERT of the
+    new versions, in one transaction per chunk. Rows without a customer_key,
+    or with a key not seen before, become version 1 of a new customer; a
+    key whose versions are all closed (a deleted customer) is reactivated
+    as the version after its latest one.
+
+    Fields missing from a row keep the current version's value, like
+    PUT /api/customers/<customer_key>.
+    """
+
+    def __init__(self, chunk_size: int = 500, updated_by: Optional[str] = None):
+        self.chunk_size = max(1, chunk_size)
+        self.updated_by = updated_by
+
+    def run(self, rows: Iterable[Tuple[int, object]]) -> ImportReport:
+        report = ImportReport()
+        start = time.perf_counter()
+
+        chunk, keys = [], set()
+        try:
+            for n, raw in rows:
+                report.rows += 1
+                try:
+                    customer_key, values = normalize_row(raw)
+                except ValueError as e:
+                    key = raw.get("customer_key") if isinstance(raw, dict) else None
+                    report.add(n, key, "error", error=str(e))
+                    continue
+                # A key repeated within a chunk must see the version written
+                # for its first occurrence, so it starts the next chunk
+                if len(chunk) >= self.chunk_size or (customer_key and customer_key in keys):
+                    self._write_chunk(chunk, report)
+                    chunk, keys = [], set()
+                chunk.append((n, customer_key, values))
+                if customer_key:
+                    keys.add(customer_key)
+        except (UnicodeDecodeError, csv.Error) as e:
+            # Rows read so far are still written; the rest of the file is not
+            report.aborted = f"Could not read upload: {e}"
+        if chunk:
+            self._write_chunk(chunk, report)
+
+        report.elapsed = time.perf_counter() - start
+        report.outcomes.sort(key=lambda o: o["row"])
+        return report
+
+    def _write_chunk(self, chunk: list, report: ImportReport) -> None:
+        report.chunks += 1
+        keys = [key for _, key, _ in chunk if key]
+        columns = [getattr(Customer, f) for f in IMPORT_FIELDS]
+        current = {}
+        if keys:
+            for row in db.session.execute(
+                    select(Customer.id, Customer.customer_key, Customer.version,
+                           *columns)
+                    .where(Customer.customer_key.in_(keys),
+                           Customer.is_current.is_(True))):
+                current[row.customer_key] = row
+        # Latest version of keys with no current row, so a deleted customer
+        # continues its history instead of restarting at version 1
+        latest = {}
+        closed_keys = [key for key in keys if key not in current]
+        if closed_keys:
+            latest = dict(db.session.execute(
+                select(Customer.customer_key, func.max(Customer.version))
+                .where(Customer.customer_key.in_(closed_keys))
+                .group_by(Customer.customer_key)).all())
+
+        now = datetime.now(timezone.utc)
+        closed_ids, new_rows, outcomes = [], [], []
+        for n, customer_key, values in chunk:
+            existing = current.get(customer_key) if customer_key else None
+            if existing is None:
+                if not values.get("name"):
+                    report.add(n, customer_key, "error", error="name is required for a new customer")
+                    continue
+                record = {f: values.get(f) for f in IMPORT_FIELDS}
+                previous = latest.get(customer_key)
+                record.update(customer_key=customer_key or str(uuid.uuid4()),
+                              version=previous + 1 if previous else 1)
+                outcome = "reactivated" if previous else "inserted"
+            else:
+                record = {f: values.get(f, getattr(existing, f)) for f in IMPORT_FIELDS}
+                if all(record[f] == getattr(existing, f) for f in IMPORT_FIELDS):
+                    report.add(n, customer_key, "unchanged", version=existing.version)
+                    continue
+                if not record["name"]:
+                    report.add(n, customer_key, "error", error="name cannot be empty")
+                    continue
+                closed_ids.append(existing.id)
+                record.update(customer_key=customer_key, version=existing.version + 1)
+                outcome = "updated"
+
+            record.update(is_current=True, effective_date=now, created_at=now,
+                          updated_by=self.updated_by)
+            new_rows.append(record)
+            outcomes.append((n, record["customer_key"], outcome, record["version"]))
+
+        if not new_rows:
+            return
+
+        try:
+            if closed_ids:
+                db.session.execute(
+                    update(Customer)
+                    .where(Customer.id.in_(closed_ids))
+                    .values(is_current=False, end_date=now))
+            db.session.execute(insert(Customer), new_rows)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            for n, customer_key, _, _ in outcomes:
+                report.add(n, customer_key, "error", error=f"Chunk write failed: {e}")
+            return
+
+        for n, customer_key, outcome, version in outcomes:
+            report.add(n, customer_key, outcome, version=version)
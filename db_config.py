@@ -0,0 +1,74 @@
+import os
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine, make_url
+
+DEFAULT_DATABASE_URL = "sqlite:///mortgage_analyzer.db"  # under instance/
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    value = os.getenv(name)
+    if value is None:
+        return default
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def database_url() -> str:
+    """DATABASE_URL from the environment (postgres:// is accepted as postgresql://)."""
+    url = os.getenv("DATABASE_URL") or DEFAULT_DATABASE_URL
+    if url.startswith("postgres://"):
+        url = "postgresql://" + url[len("postgres://"):]
+    return url
+
+
+def is_sqlite(url: str) -> bool:
+    return make_url(url).get_backend_name() == "sqlite"
+
+
+def engine_options(url: str) -> dict:
+    """
+    SQLALCHEMY_ENGINE_OPTIONS for `url`.
+
+    Server databases get a QueuePool sized by DB_POOL_SIZE / DB_MAX_OVERFLOW,
+    with DB_POOL_TIMEOUT, DB_POOL_RECYCLE and DB_POOL_PRE_PING. SQLite only
+    gets pre-ping and a lock wait (SQLITE_BUSY_TIMEOUT_MS); its pragmas are
+    set per connection by install_sqlite_pragmas().
+    """
+    options = {"pool_pre_ping": _env_bool("DB_POOL_PRE_PING", True)}
+    if is_sqlite(url):
+        busy_ms = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "30000"))
+        options["connect_args"] = {"timeout": busy_ms / 1000.0}
+        return options
+
+    options.update(
+        pool_size=int(os.getenv("DB_POOL_SIZE", "5")),
+        max_overflow=int(os.getenv("DB_MAX_OVERFLOW", "10")),
+        pool_timeout=float(os.getenv("DB_POOL_TIMEOUT", "30")),
+        pool_recycle=int(os.getenv("DB_POOL_RECYCLE", "1800")),
+    )
+    return options
+
+
+def install_sqlite_pragmas(engine: Engine) -> None:
+    """
+    WAL journal (readers no longer block the writer, so several workers can
+    write SCD2 versions and analysis results), busy_timeout and
+    synchronous=NORMAL on every new SQLite connection. No-op for other
+    databases.
+    """
+    if engine.dialect.name != "sqlite":
+        return
+
+    journal_mode = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    busy_ms = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "30000"))
+    synchronous = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_conn, _record):
+        cursor = dbapi_conn.cursor()
+        try:
+            cursor.execute(f"PRAGMA journal_mode={journal_mode}")
+            cursor.execute(f"PRAGMA busy_timeout={busy_ms}")
+            cursor.execute(f"PRAGMA synchronous={synchronous}")
+        finally:
+            cursor.close()
@@ -0,0 +1,147 @@
+import threading
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional
+
+
+def monthly_payment(principal: float, annual_rate_pct: float,
+                    term_years: int) -> float:
+    """Principal & interest payment of a fully amortizing fixed-rate loan."""
+    n = int(term_years) * 12
+    if n <= 0:
+        return float(principal)
+    r = annual_rate_pct / 1200.0
+    if r <= 0:
+        return principal / n
+    return principal * r / (1 - (1 + r)**-n)
+
+
+@dataclass
+class SavingsEstimate:
+    """Best case a customer could get from the market, per the local rate grid."""
+    max_savings: Optional[float]
+    best_payment: Optional[float] = None
+    term_years: Optional[int] = None
+    rate: Optional[float] = None
+    prunable: bool = False
+    reason: Optional[str] = None
+
+    def to_dict(self) -> dict:
+        return {
+            "max_possible_savings": round(self.max_savings, 2) if self.max_savings is not None else None,
+            "best_possible_payment": round(self.best_payment, 2) if self.best_payment is not None else None,
+            "term_years": self.term_years,
+            "rate": self.rate,
+            "reason": self.reason,
+        }
+
+
+class RateGridEstimator:
+    """
+    Local stand-in for UWM used to skip customers that cannot qualify.
+
+    Keeps the lowest note rate seen per term (years) in successful (HTTP
+    200) quote responses no older than `max_age_seconds`; terms without such
+    an observation fall back to `configured` (e.g. from the
+    RATE_TABLE env var). The best rate is lowered by `margin` percentage
+    points before estimating, so pruning stays conservative.
+    """
+
+    def __init__(self,
+                 configured: Optional[Dict[int, float]] = None,
+                 margin: float = 0.25,
+                 max_age_seconds: float = 24 * 3600):
+        self._configured = {int(k): float(v) for k, v in (configured or {}).items()}
+        self.margin = margin
+        self.max_age_seconds = max_age_seconds
+
+        self._lock = threading.Lock()
+        self._observed = {}  # {term_years: (lowest_rate, observed_at)}
+
+        self.assessed = 0
+        self.pruned = 0
+
+    def observe_quote(self, quote_body: dict) -> None:
+        """Record the lowest rate per term from a parsed UWM quote response."""
+        if not isinstance(quote_body, dict):
+            return
+
+        lowest = {}
+        for item in quote_body.get("validQuoteItems", []) or []:
+            try:
+                term = int(item.get("actualTermYears"))
+            except (TypeError, ValueError):
+                continue
+            for pp in item.get("quotePricePoints", []) or []:
+                ir = pp.get("interestRate")
+                rate = ir.get("value") if isinstance(ir, dict) else ir
+                try:
+                    rate = float(rate)
+                except (TypeError, ValueError):
+                    continue
+                if term not in lowest or rate < lowest[term]:
+                    lowest[term] = rate
+
+        if not lowest:
+            return
+
+        now = time.time()
+        with self._lock:
+            for term, rate in lowest.items():
+                current = self._observed.get(term)
+                # Keep the lower rate unless the stored one has gone stale
+                if (current is None or rate <= current[0]
+                        or now - current[1] > self.max_age_seconds):
+                    self._observed[term] = (rate, now)
+
+    def grid(self) -> Dict[int, float]:
+        """{term_years: best known rate} from fresh observations, else configuration."""
+        now = time.time()
+        grid = dict(self._configured)
+        with self._lock:
+            for term, (rate, seen_at) in self._observed.items():
+                if now - seen_at <= self.max_age_seconds:
+                    grid[term] = rate
+        return grid
+
+    def estimate(self, current_payment: Optional[float],
+                 balance: Optional[float]) -> SavingsEstimate:
+        if current_payment is None or not balance:
+            return SavingsEstimate(None, reason="Missing payment or balance")
+
+        grid = self.grid()
+        if not grid:
+            return SavingsEstimate(None, reason="No rate data")
+
+        best = None
+        for term, rate in grid.items():
+            floor_rate = max(0.0, rate - self.margin)
+            payment = monthly_payment(balance, floor_rate, term)
+            if best is None or payment < best.best_payment:
+                best = SavingsEstimate(current_payment - payment,
+                                       best_payment=payment,
+                                       term_years=term,
+                                       rate=round(floor_rate, 3))
+        return best
+
+    def assess(self, current_payment: Optional[float],
+               balance: Optional[float], min_savings: float) -> SavingsEstimate:
+        """Estimate and decide whether the customer can be skipped."""
+        est = self.estimate(current_payment, balance)
+        self.assessed += 1
+        if est.max_savings is not None and est.max_savings < min_savings:
+            est.prunable = True
+            est.reason = (
+                f"Max possible savings ${est.max_savings:,.2f}/mo "
+                f"(at {est.rate:.3f}% over {est.term_years} years) "
+                f"is below min_savings ${min_savings:,.2f}")
+            self.pruned += 1
+        return est
+
+    def stats(self) -> dict:
+        return {
+            "grid": {str(t): r for t, r in sorted(self.grid().items())},
+            "margin": self.margin,
+            "assessed": self.assessed,
+            "pruned": self.pruned,
+        }
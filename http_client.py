@@ -0,0 +1,137 @@
+import socket
+import threading
+from typing import Dict, Optional, Tuple
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connection import HTTPConnection
+from urllib3.util.retry import Retry
+
+
+def keepalive_socket_options(idle: int = 30, interval: int = 10,
+                             count: int = 3) -> list:
+    """
+    urllib3 socket options with TCP keep-alive on, so idle pooled
+    connections (and the SOCKS tunnel behind them) are not silently dropped
+    between bursts of calls. Platform-specific knobs are set when available.
+    """
+    options = list(HTTPConnection.default_socket_options)
+    options.append((socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1))
+    for name, value in (("TCP_KEEPIDLE", idle), ("TCP_KEEPINTVL", interval),
+                        ("TCP_KEEPCNT", count)):
+        if hasattr(socket, name):
+            options.append((socket.IPPROTO_TCP, getattr(socket, name), value))
+    return options
+
+
+class _PooledAdapter(HTTPAdapter):
+    """HTTPAdapter that applies socket options to direct and proxied (SOCKS) pools."""
+
+    def __init__(self, socket_options: list, **kwargs):
+        self.socket_options = socket_options
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, connections, maxsize, block=False, **pool_kwargs):
+        pool_kwargs.setdefault("socket_options", self.socket_options)
+        super().init_poolmanager(connections, maxsize, block=block, **pool_kwargs)
+
+    def proxy_manager_for(self, proxy, **proxy_kwargs):
+        proxy_kwargs.setdefault("socket_options", self.socket_options)
+        return super().proxy_manager_for(proxy, **proxy_kwargs)
+
+    def managers(self) -> list:
+        return [self.poolmanager, *self.proxy_manager.values()]
+
+
+class PooledHttpClient:
+    """
+    Outbound HTTP client for one upstream.
+
+    One HTTPAdapter (a thread-safe urllib3 pool of up to `pool_maxsize`
+    keep-alive connections per host) is shared by per-thread
+    requests.Sessions, so worker threads reuse each other's connections
+    without sharing Session state. Every request gets the (connect, read)
+    `timeout` unless the call passes its own; connection failures are
+    retried `connect_retries` times (requests are never re-sent once they
+    reached the server).
+    """
+
+    def __init__(self,
+                 name: str,
+                 pool_maxsize: int = 10,
+                 timeout: Tuple[float, float] = (5.0, 30.0),
+                 proxies: Optional[Dict[str, str]] = None,
+                 headers: Optional[Dict[str, str]] = None,
+                 connect_retries: int = 1,
+                 keepalive_idle: int = 30):
+        self.name = name
+        self.timeout = timeout
+        self.proxies = proxies or {}
+        self.headers = headers or {}
+
+        self._adapter = _PooledAdapter(
+            keepalive_socket_options(idle=keepalive_idle),
+            pool_connections=4,  # hosts kept per upstream
+            pool_maxsize=pool_maxsize,
+            max_retries=Retry(total=connect_retries, connect=connect_retries,
+                              read=0, status=0, redirect=0,
+                              raise_on_redirect=False))
+        self._local = threading.local()
+
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.errors = 0
+
+    def session(self) -> requests.Session:
+        """This thread's Session (created on first use, shares the pool)."""
+        session = getattr(self._local, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.proxies.update(self.proxies)
+            session.headers.update(self.headers)
+            session.mount("https://", self._adapter)
+            session.mount("http://", self._adapter)
+            self._local.session = session
+        return session
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        kwargs.setdefault("timeout", self.timeout)
+        with self._lock:
+            self.requests += 1
+        try:
+            return self.session().request(method, url, **kwargs)
+        except requests.RequestException:
+            with self._lock:
+                self.errors += 1
+            raise
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def stats(self) -> dict:
+        """Requests vs. connections opened by the live pools (the rest reused one)."""
+        opened = served = idle = 0
+        for manager in self._adapter.managers():
+            for key in list(manager.pools.keys()):
+                pool = manager.pools.get(key)
+                if pool is None:
+                    continue
+                opened += pool.num_connections
+                served += pool.num_requests
+                if pool.pool is not None:
+                    # The queue holds None for slots without a connection
+                    idle += sum(1 for conn in list(pool.pool.queue) if conn is not None)
+        return {
+            "requests": self.requests,
+            "errors": self.errors,
+            "connections_opened": opened,
+            "connections_reused": max(0, served - opened),
+            "reuse_ratio": round((served - opened) / served, 3) if served else None,
+            "pool_maxsize": self._adapter._pool_maxsize,
+            "idle_connections": idle,
+            "timeout": {"connect": self.timeout[0], "read": self.timeout[1]},
+            "proxied": bool(self.proxies),
+        }
@@ -1,29 +1,78 @@
 import os
+import base64
 import json
 import re
+import click
 import requests
 import logging
 import uuid
 import time
-from typing import Any, Dict
+import hashlib
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
 from datetime import datetime, timezone, timedelta
 
-from flask import Flask, request, jsonify, send_from_directory
+from flask import (Flask, Response, request, jsonify, send_from_directory,
+                   stream_with_context)
 from flask_cors import CORS
 from dotenv import load_dotenv
 
 from models import db, Customer
+from token_manager import TokenManager
+from rate_limiter import SharedRateLimiter
+from quote_cache import QuoteResponseCache
+from qualification import Probe, QualificationPlanner, QualificationResult
+from estimator import RateGridEstimator
+from rate_index import RateIndex
+from rate_grid import score_sheets
+from rate_sheet import RateSheet
+from batch_jobs import BatchJob, BatchJobRegistry
+from http_client import PooledHttpClient
+from db_config import database_url, engine_options, install_sqlite_pragmas
+from migrations import migrate
+from payload_template import (PayloadTemplate, PayloadTemplateCache,
+                              QuotePayload, _coerce_list_str,
+                              normalize_uwm_pricequote_payload)
+from structured_logging import (DEFAULT_REDACT_FIELDS, BodyLogPolicy,
+                                setup_logging)
+from metrics import (CONTENT_TYPE as METRICS_CONTENT_TYPE, FAST_BUCKETS,
+                     MetricsRegistry, instrument_engine)
+from tracing import Tracer, add_span, span
+from zipcode_cache import LookupUnavailable, ZipcodeCache, build_offline_dataset
+from customer_import import CustomerImporter, detect_format, iter_rows
+from analysis_store import (InMemoryAnalysisStore, SqlAnalysisStore,
+                            AnalysisStoreSweeper)
 
 # ============================================================
-# Logging
+# Env
 # ============================================================
-logging.basicConfig(level=logging.INFO)
-logger = logging.getLogger(__name__)
+load_dotenv()
 
 # ============================================================
-# Env
+# Logging — JSON lines written by a background thread
 # ============================================================
-load_dotenv()
+LOG_LEVEL = os.getenv("LOG_LEVEL", "INFO")
+LOG_FORMAT = os.getenv("LOG_FORMAT", "json")  # or "text"
+# Records beyond this many waiting to be written are dropped, never blocking
+LOG_QUEUE_SIZE = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+# Fraction of UWM calls logged with their (redacted, capped) request and
+# response bodies; failed calls always include the response
+UWM_LOG_BODY_SAMPLE_RATE = float(os.getenv("UWM_LOG_BODY_SAMPLE_RATE", "0.01"))
+UWM_LOG_BODY_MAX_BYTES = int(os.getenv("UWM_LOG_BODY_MAX_BYTES", "4096"))
+# Debug only: log every UWM request/response body in full (still redacted)
+UWM_LOG_FULL_BODIES = os.getenv("UWM_LOG_FULL_BODIES", "").lower() in ("1", "true", "yes", "on")
+# Extra comma-separated keys to redact from logged bodies
+LOG_REDACT_FIELDS = [f.strip() for f in os.getenv("LOG_REDACT_FIELDS", "").split(",") if f.strip()]
+
+log_pipeline = setup_logging(LOG_LEVEL, LOG_FORMAT, queue_size=LOG_QUEUE_SIZE)
+logger = logging.getLogger(__name__)
+
+uwm_body_log = BodyLogPolicy(
+    sample_rate=UWM_LOG_BODY_SAMPLE_RATE,
+    max_bytes=UWM_LOG_BODY_MAX_BYTES,
+    full=UWM_LOG_FULL_BODIES,
+    redact_fields=DEFAULT_REDACT_FIELDS + tuple(LOG_REDACT_FIELDS))
 
 # UWM_USERNAME = os.getenv("UWM_USERNAME")
 # UWM_PASSWORD = os.getenv("UWM_PASSWORD")
@@ -45,10 +94,81 @@ PRICEQUOTE_URL = os.getenv(
     "PRICEQUOTE_URL",
     "https://stg.api.uwm.com/public/instantpricequote/v2/pricequote")
 
+# Refresh the cached access token this many seconds before it expires
+UWM_TOKEN_REFRESH_MARGIN_SECONDS = float(
+    os.getenv("UWM_TOKEN_REFRESH_MARGIN_SECONDS", "60"))
+
+# ============================================================
+# UWM Rate Limit — token bucket shared by all workers on this host
+# ============================================================
+# Starting (and maximum) sustained rate; the limiter halves it on every 429
+# and slowly recovers after successful calls.
+UWM_RATE_LIMIT_PER_SECOND = float(os.getenv("UWM_RATE_LIMIT_PER_SECOND", str(1 / 1.5)))
+UWM_RATE_LIMIT_BURST = float(os.getenv("UWM_RATE_LIMIT_BURST", "3"))
+UWM_RATE_LIMIT_DB = os.getenv("UWM_RATE_LIMIT_DB")  # defaults to instance/uwm_rate_limit.sqlite3
+
+# ============================================================
+# UWM price quote response cache
+# ============================================================
+# How long an identical quote request is answered from cache (rate sheet
+# lifetime). 0 disables the cache.
+QUOTE_CACHE_TTL_SECONDS = float(os.getenv("QUOTE_CACHE_TTL_SECONDS", "900"))
+QUOTE_CACHE_MAX_MB = float(os.getenv("QUOTE_CACHE_MAX_MB", "64"))
+QUOTE_CACHE_DISK_PATH = os.getenv("QUOTE_CACHE_DISK_PATH")  # optional SQLite file
+
+# ============================================================
+# Local payment estimator (pre-filter before spending UWM calls)
+# ============================================================
+# Percentage points subtracted from the best known rate before estimating,
+# so a customer is only skipped when even a better-than-seen rate can't help.
+PREFILTER_RATE_MARGIN = float(os.getenv("PREFILTER_RATE_MARGIN", "0.25"))
+# Optional fallback rate table, e.g. RATE_TABLE='{"30": 6.25, "15": 5.5}'
+RATE_TABLE = json.loads(os.getenv("RATE_TABLE") or "{}")
+
+# Max in-flight UWM calls per worker when fanning out a customer's scenario grid
+UWM_MAX_CONCURRENCY = int(os.getenv("UWM_MAX_CONCURRENCY", "4"))
+
+# ============================================================
+# Metrics (per process; scraped from GET /metrics)
+# ============================================================
+metrics = MetricsRegistry()
+
+uwm_token_seconds = metrics.histogram(
+    "uwm_token_seconds", "get_access_token latency (cached or refreshed)")
+uwm_price_quote_seconds = metrics.histogram(
+    "uwm_price_quote_seconds",
+    "post_price_quote latency including rate-limit waits and retries",
+    ["source"])
+uwm_request_seconds = metrics.histogram(
+    "uwm_request_seconds", "Round trip of a single UWM price quote attempt")
+uwm_responses_total = metrics.counter(
+    "uwm_responses_total", "UWM price quote responses by HTTP status", ["status"])
+uwm_429_retries_total = metrics.counter(
+    "uwm_429_retries_total", "Price quote attempts retried after a 429")
+uwm_429_backoff_seconds_total = metrics.counter(
+    "uwm_429_backoff_seconds_total", "Seconds UWM asked us to back off after a 429")
+uwm_rate_limit_wait_seconds_total = metrics.counter(
+    "uwm_rate_limit_wait_seconds_total",
+    "Seconds slept in the shared rate limiter before UWM calls")
+analysis_stage_seconds = metrics.histogram(
+    "analysis_stage_seconds",
+    "Time spent per stage of the analysis routes (quote, parse, filter, store)",
+    ["route", "stage"], buckets=FAST_BUCKETS)
+db_query_seconds = metrics.histogram(
+    "db_query_seconds", "Database statement execution time", ["operation"],
+    buckets=FAST_BUCKETS)
+
 # ============================================================
-# UWM Rate Limit — minimum gap between consecutive API calls
+# Analysis tracing (opt-in per request with ?trace=1 or "trace": true)
 # ============================================================
-UWM_REQUEST_DELAY_SECONDS = 1.5  # proactive delay to stay under rate limit
+# Trace every analyze-next / detailed / accurate-buydown request
+ANALYSIS_TRACE_ALL = os.getenv("ANALYSIS_TRACE_ALL", "").lower() in ("1", "true", "yes", "on")
+# Slowest finished traces kept for GET /api/debug/traces
+TRACE_KEEP_SLOWEST = int(os.getenv("TRACE_KEEP_SLOWEST", "50"))
+# Spans recorded per trace; later ones are only counted
+TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "200"))
+
+tracer = Tracer(keep_slowest=TRACE_KEEP_SLOWEST, max_spans=TRACE_MAX_SPANS)
 
 # ============================================================
 # Flask
@@ -56,23 +176,87 @@ UWM_REQUEST_DELAY_SECONDS = 1.5  # proactive delay to stay under rate limit
 app = Flask(__name__, static_folder="static", static_url_path="/")
 CORS(app)
 app.secret_key = os.environ.get("SESSION_SECRET", "dev-secret-key")
-app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite:///mortgage_analyzer.db"
+# DATABASE_URL (default: SQLite under instance/); pool and SQLite pragma
+# settings come from the DB_* / SQLITE_* variables read by db_config
+app.config["SQLALCHEMY_DATABASE_URI"] = database_url()
+app.config["SQLALCHEMY_ENGINE_OPTIONS"] = engine_options(
+    app.config["SQLALCHEMY_DATABASE_URI"])
 app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+# Schema changes are applied by `flask --app main migrate` (or on
+# `python main.py`), not at import
 with app.app_context():
     db.init_app(app)
-    db.create_all()
+    install_sqlite_pragmas(db.engine)
+    instrument_engine(db.engine, db_query_seconds)
+
+
+@app.cli.command("migrate")
+def migrate_command():
+    """Create missing tables, columns and indexes."""
+    actions = migrate()
+    for action in actions:
+        print(action)
+    if not actions:
+        print("Database is up to date")
+
+uwm_rate_limiter = SharedRateLimiter(
+    UWM_RATE_LIMIT_DB or os.path.join(app.instance_path, "uwm_rate_limit.sqlite3"),
+    rate=UWM_RATE_LIMIT_PER_SECOND,
+    burst=UWM_RATE_LIMIT_BURST)
+
+rate_estimator = RateGridEstimator(configured=RATE_TABLE,
+                                   margin=PREFILTER_RATE_MARGIN)
+
+quote_cache = QuoteResponseCache(
+    ttl_seconds=QUOTE_CACHE_TTL_SECONDS,
+    max_bytes=int(QUOTE_CACHE_MAX_MB * 1024 * 1024),
+    disk_path=QUOTE_CACHE_DISK_PATH)
 
 # ============================================================
-# Requests session (SOCKS)
+# Outbound HTTP clients (pooled per upstream; UWM over SOCKS)
 # ============================================================
-session = requests.Session()
-if SOCKS_PROXY:
-    session.proxies = {"http": SOCKS_PROXY, "https": SOCKS_PROXY}
-session.headers.update({
-    "User-Agent": "uwm-ipq-python/1.0",
-    "Accept": "application/json",
-})
+# Keep-alive connections per host for UWM calls; size it to the threads that
+# call UWM at once (UWM_MAX_CONCURRENCY per worker) so none are discarded
+UWM_HTTP_POOL_SIZE = int(os.getenv("UWM_HTTP_POOL_SIZE", "16"))
+UWM_CONNECT_TIMEOUT = float(os.getenv("UWM_CONNECT_TIMEOUT", "10"))
+UWM_READ_TIMEOUT = float(os.getenv("UWM_READ_TIMEOUT", "60"))
+
+# Zipcode lookups (zippopotam.us, then the Census geocoder)
+LOOKUP_HTTP_POOL_SIZE = int(os.getenv("LOOKUP_HTTP_POOL_SIZE", "4"))
+LOOKUP_CONNECT_TIMEOUT = float(os.getenv("LOOKUP_CONNECT_TIMEOUT", "3"))
+LOOKUP_READ_TIMEOUT = float(os.getenv("LOOKUP_READ_TIMEOUT", "5"))
+
+# Seconds a pooled connection may sit idle before TCP keep-alive probes start
+# (keeps the SOCKS tunnel's connections from being dropped between calls)
+HTTP_KEEPALIVE_IDLE_SECONDS = int(os.getenv("HTTP_KEEPALIVE_IDLE_SECONDS", "30"))
+
+uwm_http = PooledHttpClient(
+    "uwm",
+    pool_maxsize=UWM_HTTP_POOL_SIZE,
+    timeout=(UWM_CONNECT_TIMEOUT, UWM_READ_TIMEOUT),
+    proxies={"http": SOCKS_PROXY, "https": SOCKS_PROXY} if SOCKS_PROXY else None,
+    headers={
+        "User-Agent": "uwm-ipq-python/1.0",
+        "Accept": "application/json",
+    },
+    keepalive_idle=HTTP_KEEPALIVE_IDLE_SECONDS)
+
+zippopotam_http = PooledHttpClient(
+    "zippopotam",
+    pool_maxsize=LOOKUP_HTTP_POOL_SIZE,
+    timeout=(LOOKUP_CONNECT_TIMEOUT, LOOKUP_READ_TIMEOUT),
+    headers={"User-Agent": "zipcode-lookup/1.0"},
+    keepalive_idle=HTTP_KEEPALIVE_IDLE_SECONDS)
+
+census_http = PooledHttpClient(
+    "census",
+    pool_maxsize=LOOKUP_HTTP_POOL_SIZE,
+    timeout=(LOOKUP_CONNECT_TIMEOUT, LOOKUP_READ_TIMEOUT),
+    headers={"User-Agent": "zipcode-lookup/1.0"},
+    keepalive_idle=HTTP_KEEPALIVE_IDLE_SECONDS)
+
+http_clients = (uwm_http, zippopotam_http, census_http)
 
 
 # ============================================================
@@ -94,92 +278,6 @@ def interest_rate_value(ir):
     return safe_float(ir)
 
 
-def _to_str(x):
-    if x is None:
-        return None
-    return str(x)
-
-
-def _coerce_list_str(value):
-    """
-    Ensure value is a list[str]. Handles:
-      - [0] -> ["0"]
-      - "0" -> ["0"]
-      - None -> []
-    """
-    if value is None:
-        return []
-    if isinstance(value, list):
-        return [str(v) for v in value]
-    return [str(value)]
-
-
-def normalize_uwm_pricequote_payload(
-        payload: Dict[str, Any]) -> Dict[str, Any]:
-    """
-    Normalizes payload fields for UWM expectations WITHOUT wrapping in priceQuoteRequest.
-    - Fix key casing issues (*ID -> *Id)
-    - Force ID-ish fields to strings
-    - Force array-of-ids to list[str] (loanTypeIds etc)
-    """
-    if not isinstance(payload, dict):
-        payload = {}
-
-    # If someone accidentally sent wrapped payload, unwrap it
-    inner = payload.get(
-        "priceQuoteRequest") if "priceQuoteRequest" in payload else payload
-    if not isinstance(inner, dict):
-        inner = {}
-
-    # Fix common casing variants you used in your builder
-    key_map = {
-        "purposeTypeID": "purposeTypeId",
-        "compensationPayerTypeID": "compensationPayerTypeId",
-        "buyDownAliasID": "buyDownAliasId",
-    }
-    for old_k, new_k in key_map.items():
-        if old_k in inner and new_k not in inner:
-            inner[new_k] = inner.pop(old_k)
-
-    # Ensure list-of-strings where UWM expects string IDs
-    if "loanTypeIds" in inner:
-        inner["loanTypeIds"] = _coerce_list_str(inner.get("loanTypeIds"))
-    if "loanTermIds" in inner:
-        inner["loanTermIds"] = _coerce_list_str(inner.get("loanTermIds"))
-    if "waivableFeeTypeIds" in inner:
-        inner["waivableFeeTypeIds"] = _coerce_list_str(
-            inner.get("waivableFeeTypeIds"))
-
-    # Force typical ID fields to string (but don't stringify booleans)
-    string_id_fields = [
-        "monthsOfReservesId",
-        "monthsOfBankStatementsId",
-        "commitmentPeriodId",
-        "occupancyTypeId",
-        "propertyTypeId",
-        "compensationPayerTypeId",
-        "escrowWaiverTypeId",
-        "tracTypeId",
-        "loanShieldTypeId",
-        "paPlusTypeId",
-        "exactRateTypeId",
-        "purposeTypeId",
-        "numberOfBorrowers",
-    ]
-    for f in string_id_fields:
-        if f in inner and inner[f] is not None and not isinstance(
-                inner[f], bool):
-            inner[f] = _to_str(inner[f])
-
-    # purposeTypeId in particular often needs to be string
-    if "purposeTypeId" in inner and inner[
-            "purposeTypeId"] is not None and not isinstance(
-                inner["purposeTypeId"], str):
-        inner["purposeTypeId"] = str(inner["purposeTypeId"])
-
-    return inner
-
-
 # =========================
 # Robust JSON parsing
 # =========================
@@ -239,7 +337,8 @@ def parse_response_json(resp: requests.Response) -> Dict[str, Any]:
 # ============================================================
 # Auth + UWM Call
 # ============================================================
-def get_access_token() -> str:
+def _fetch_access_token():
+    """Password-grant round trip to TOKEN_URL. Returns (access_token, expires_in)."""
     missing = [
         k for k, v in {
             "UWM_USERNAME": UWM_USERNAME,
@@ -262,11 +361,11 @@ def get_access_token() -> str:
         "scope": UWM_SCOPE,
     }
 
-    resp = session.post(
+    resp = uwm_http.post(
         TOKEN_URL,
         data=data,
         headers={"Content-Type": "application/x-www-form-urlencoded"},
-        timeout=30)
+        timeout=(UWM_CONNECT_TIMEOUT, 30))
 
     if resp.status_code != 200:
         raise RuntimeError(
@@ -277,56 +376,128 @@ def get_access_token() -> str:
     if not access_token:
         raise RuntimeError(f"No access_token in response: {resp.text}")
 
-    return access_token
+    return access_token, safe_float(token_json.get("expires_in"))
 
 
-def post_price_quote(access_token: str, payload: dict, max_retries: int = 5) -> requests.Response:
-    """
-    Normalize payload (fix casing, list[str], ID strings).
-    Automatically retries on 429 Rate Limit responses, waiting the number of
-    seconds UWM specifies in the message (or a default backoff).
-    """
-    normalized = normalize_uwm_pricequote_payload(payload)
+token_manager = TokenManager(
+    _fetch_access_token,
+    refresh_margin=UWM_TOKEN_REFRESH_MARGIN_SECONDS)
 
-    logger.info(
-        "\n>>> UWM REQUEST (%s)\nURL: %s\nPayload:\n%s",
-        "post_price_quote",
-        PRICEQUOTE_URL,
-        json.dumps(normalized, indent=2, default=str)
-    )
 
-    for attempt in range(1, max_retries + 1):
-        resp = session.post(
+def get_access_token() -> str:
+    """Cached UWM access token; refreshed ahead of expiry by token_manager."""
+    with uwm_token_seconds.time(), span("token"):
+        return token_manager.get_token()
+
+
+def post_price_quote(access_token: str,
+                     payload: dict,
+                     max_retries: int = 5,
+                     use_cache: bool = True) -> requests.Response:
+    """
+    Normalize payload (fix casing, list[str], ID strings) unless it is a
+    QuotePayload rendered from a PayloadTemplate, which already is.
+    Identical normalized payloads are answered from quote_cache while fresh.
+    Every attempt first takes a slot from the shared rate limiter, which only
+    waits when the budget is used up.
+    On 429 the limiter is blocked for the number of seconds UWM specifies in
+    the message (or a default backoff) and the call is retried.
+    On a 401 the cached token is dropped and the call is retried once with a
+    freshly fetched token; that retry does not count against `max_retries`.
+    """
+    started = time.perf_counter()
+    if isinstance(payload, QuotePayload):
+        normalized = payload
+    else:
+        normalized = normalize_uwm_pricequote_payload(payload)
+
+    cache_key = None
+    if use_cache and quote_cache.enabled:
+        cache_key = quote_cache.key_for(PRICEQUOTE_URL, normalized)
+        cached = quote_cache.get(cache_key, PRICEQUOTE_URL)
+        if cached is not None:
+            logger.info("UWM quote served from cache",
+                        extra={"event": "uwm_quote_cache_hit",
+                               "cache_key": cache_key[:12]})
+            uwm_price_quote_seconds.observe(time.perf_counter() - started,
+                                            source="cache")
+            add_span("quote_cache_hit", started)
+            return cached
+
+    # Bodies are only redacted and attached for sampled calls (or all of
+    # them with UWM_LOG_FULL_BODIES); serialization happens off this thread
+    log_bodies = uwm_body_log.sampled()
+
+    auth_retried = False
+    attempt = 0
+    while True:
+        attempt += 1
+        waiting = time.perf_counter()
+        waited = uwm_rate_limiter.acquire()
+        uwm_rate_limit_wait_seconds_total.inc(waited)
+        if waited:
+            add_span("rate_limit_wait", waiting, attempt=attempt)
+        sent = time.perf_counter()
+        resp = uwm_http.post(
             PRICEQUOTE_URL,
             json=normalized,
             headers={
                 "Authorization": f"Bearer {access_token}",
                 "Content-Type": "application/json",
             },
-            timeout=60,
         )
+        elapsed = time.perf_counter() - sent
+        uwm_request_seconds.observe(elapsed)
+        uwm_responses_total.inc(status=resp.status_code)
+        add_span("uwm_attempt", sent, attempt=attempt, status=resp.status_code,
+                 buydown=normalized.get("buyDownAliasId"))
 
         try:
             resp_body_parsed = resp.json()
-            resp_body = json.dumps(resp_body_parsed, indent=2, default=str)
         except Exception:
             resp_body_parsed = {}
-            resp_body = resp.text
 
-        logger.info(
-            "\n<<< UWM RESPONSE status=%s (attempt %d/%d)\n%s",
-            resp.status_code, attempt, max_retries,
-            resp_body
-        )
+        fields = {
+            "event": "uwm_price_quote",
+            "status": resp.status_code,
+            "attempt": attempt,
+            "elapsed_ms": round(elapsed * 1000, 1),
+            "response_bytes": len(resp.content),
+        }
+        if log_bodies:
+            fields["request_body"] = uwm_body_log.body(normalized)
+        if log_bodies or resp.status_code not in (200, 429):
+            fields["response_body"] = uwm_body_log.body(resp_body_parsed or resp.text)
+        logger.info("UWM price quote status=%s (attempt %d/%d)",
+                    resp.status_code, attempt, max_retries, extra=fields)
+
+        if resp.status_code == 401 and not auth_retried:
+            auth_retried = True
+            logger.warning("UWM returned 401; refreshing access token and retrying once")
+            token_manager.invalidate(access_token)
+            access_token = token_manager.get_token()
+            # The refresh is not a 429 retry; resend as the same attempt
+            attempt -= 1
+            continue
 
         if resp.status_code != 429:
+            if resp.status_code == 401:
+                logger.error("UWM returned 401 again after refreshing the access token.")
+            elif resp.status_code == 200:
+                uwm_rate_limiter.record_success()
+                rate_estimator.observe_quote(resp_body_parsed)
+                if cache_key:
+                    quote_cache.put(cache_key, resp)
+            uwm_price_quote_seconds.observe(time.perf_counter() - started,
+                                            source="uwm")
             return resp
 
-        # Parse wait time from UWM message: "Try again in 13 seconds."
+        # Wait time from the Retry-After header (seconds), else from UWM's
+        # message: "Try again in 13 seconds."
         wait_seconds = 15  # default
         msg = resp_body_parsed.get("message", "") if isinstance(resp_body_parsed, dict) else ""
-        import re as _re
-        match = _re.search(r"(\d+)\s*second", msg)
+        match = (re.fullmatch(r"\s*(\d+)\s*", resp.headers.get("Retry-After") or "")
+                 or re.search(r"(\d+)\s*second", msg))
         if match:
             wait_seconds = int(match.group(1)) + 1  # +1 buffer
 
@@ -334,48 +505,59 @@ def post_price_quote(access_token: str, payload: dict, max_retries: int = 5) ->
             "Rate limited by UWM (429). Waiting %d seconds before retry %d/%d...",
             wait_seconds, attempt, max_retries
         )
-        time.sleep(wait_seconds)
+        # The next acquire() (here or in any other worker) waits this out
+        uwm_rate_limiter.penalize(wait_seconds)
+        uwm_429_backoff_seconds_total.inc(wait_seconds)
+        if attempt >= max_retries:
+            break
+        uwm_429_retries_total.inc()
 
     # Exhausted retries — return the last 429 response
     logger.error("Exhausted %d retries due to UWM rate limiting.", max_retries)
+    uwm_price_quote_seconds.observe(time.perf_counter() - started, source="uwm")
     return resp
 
 
+uwm_executor = ThreadPoolExecutor(max_workers=UWM_MAX_CONCURRENCY,
+                                  thread_name_prefix="uwm")
+
+
+def post_price_quotes(access_token: str,
+                      payloads: List[dict]) -> List[requests.Response]:
+    """
+    Send several price quotes concurrently (at most UWM_MAX_CONCURRENCY in
+    flight; the shared rate limiter still paces every attempt).
+    Responses come back in the same order as `payloads`.
+    """
+    if len(payloads) <= 1:
+        return [post_price_quote(access_token, p) for p in payloads]
+
+    # Each call runs in a copy of this context, so its spans land in the
+    # caller's trace
+    futures = [
+        uwm_executor.submit(contextvars.copy_context().run, post_price_quote,
+                            access_token, p)
+        for p in payloads
+    ]
+    return [f.result() for f in futures]
+
+
 # ============================================================
 # Payload building
 # ============================================================
 def build_payload_from_customer(customer: Customer,
                                 base_payload: dict) -> dict:
-    """Build API payload from customer data and template (UNWRAPPED inner payload)."""
-    import copy
-    payload = copy.deepcopy(base_payload) if isinstance(base_payload,
-                                                        dict) else {}
-
-    # Override customer-specific fields
-    if "borrowerName" in payload:
-        payload["borrowerName"] = customer.name
-    if "creditScore" in payload:
-        payload["creditScore"] = customer.credit_score
-    if "monthlyIncome" in payload:
-        payload["monthlyIncome"] = customer.monthly_income
-    if "loanAmount" in payload:
-        payload["loanAmount"] = customer.remaining_balance
-    if "appraisedValue" in payload:
-        payload["appraisedValue"] = customer.property_value
-    if "propertyZipCode" in payload:
-        payload["propertyZipCode"] = customer.property_zip
-    if "propertyState" in payload:
-        payload["propertyState"] = customer.property_state
-    if "propertyCounty" in payload:
-        payload["propertyCounty"] = customer.property_county or ""
-
-    # Early coercion for common gotchas
-    if "loanTypeIds" in payload:
-        payload["loanTypeIds"] = _coerce_list_str(payload.get("loanTypeIds"))
-    if "loanTermIds" in payload:
-        payload["loanTermIds"] = _coerce_list_str(payload.get("loanTermIds"))
-
-    return payload
+    """
+    Build API payload from customer data and template (UNWRAPPED inner
+    payload, normalized). For more than one payload per template, compile a
+    PayloadTemplate once and render() each instead.
+    """
+    return dict(PayloadTemplate(base_payload).render(customer))
+
+
+# Compiled payload templates of recent analysis batches (a batch's payload
+# never changes, so one compile serves all of its customers)
+payload_templates = PayloadTemplateCache()
 
 
 # ============================================================
@@ -426,9 +608,12 @@ def calculate_buydown_details_from_response(base_rate: float,
                                             buydown_type: str,
                                             all_scenarios: list,
                                             term_years: int,
-                                            product_name: str):
+                                            product_name: str,
+                                            rate_index: RateIndex = None):
     """
-    Look up actual year-by-year rates from the full API response
+    Look up actual year-by-year rates from the full API response.
+    Pass a RateIndex built once over `all_scenarios` when calling this for
+    many rates of the same response.
     """
     if not base_rate or buydown_type == "None":
         return None
@@ -442,47 +627,12 @@ def calculate_buydown_details_from_response(base_rate: float,
     else:
         return None
 
-    def find_closest_rate(scenarios,
-                          target_rate,
-                          term,
-                          product,
-                          tolerance=0.5):
-        closest_match = None
-        closest_diff = float('inf')
-
-        for scenario in scenarios:
-            if not scenario.get("products"):
-                continue
-
-            for prod in scenario["products"]:
-                if prod.get("term_years") != term or prod.get(
-                        "product_name") != product:
-                    continue
-
-                for rate in prod.get("rates", []):
-                    rate_val = rate.get("interest_rate")
-                    if rate_val is None:
-                        continue
+    if rate_index is None:
+        rate_index = RateIndex(all_scenarios)
 
-                    diff = abs(rate_val - target_rate)
-                    if diff <= tolerance and diff < closest_diff:
-                        closest_diff = diff
-                        closest_match = {
-                            "rate": rate_val,
-                            "payment": rate.get("monthly_payment"),
-                            "savings": rate.get("monthly_savings"),
-                            "credit_cost": rate.get("credit_cost"),
-                            "is_exact": diff < 0.01
-                        }
-
-        return closest_match
-
-    year1 = find_closest_rate(all_scenarios, year1_target, term_years,
-                              product_name)
-    year2 = find_closest_rate(all_scenarios, year2_target, term_years,
-                              product_name)
-    actual = find_closest_rate(all_scenarios, base_rate, term_years,
-                               product_name)
+    year1 = rate_index.find_closest(term_years, product_name, year1_target)
+    year2 = rate_index.find_closest(term_years, product_name, year2_target)
+    actual = rate_index.find_closest(term_years, product_name, base_rate)
 
     if not year1:
         year1 = {
@@ -551,6 +701,92 @@ def filter_rates_by_target(rates_list, target_amount):
 # ============================================================
 # ZIPCODE LOOKUP
 # ============================================================
+# Found ZIPs are kept this long, unknown ZIPs (and lookups that came back
+# without a county) for ZIPCODE_NEGATIVE_TTL_SECONDS; entries older than
+# ZIPCODE_REFRESH_AFTER_SECONDS are served and re-fetched in the background
+ZIPCODE_CACHE_TTL_SECONDS = float(os.getenv("ZIPCODE_CACHE_TTL_SECONDS", str(30 * 86400)))
+ZIPCODE_NEGATIVE_TTL_SECONDS = float(os.getenv("ZIPCODE_NEGATIVE_TTL_SECONDS", "86400"))
+ZIPCODE_REFRESH_AFTER_SECONDS = float(os.getenv("ZIPCODE_REFRESH_AFTER_SECONDS", str(7 * 86400)))
+ZIPCODE_CACHE_MAX_ENTRIES = int(os.getenv("ZIPCODE_CACHE_MAX_ENTRIES", "50000"))
+ZIPCODE_CACHE_DB = os.getenv("ZIPCODE_CACHE_DB")  # defaults to instance/zipcode_cache.sqlite3
+# Optional offline ZIP dataset (see `flask --app main build-zip-dataset`)
+ZIPCODE_OFFLINE_DATASET = os.getenv("ZIPCODE_OFFLINE_DATASET")
+
+
+def fetch_zipcode(zipcode: str):
+    """
+    City/state from zippopotam.us, then county from the Census geocoder.
+    Returns None for an unknown ZIP; raises requests exceptions or
+    LookupUnavailable when zippopotam fails.
+    """
+    zp = zippopotam_http.get(f"https://api.zippopotam.us/us/{zipcode}")
+
+    if zp.status_code == 404:
+        return None
+    if zp.status_code != 200:
+        raise LookupUnavailable(f"zippopotam returned {zp.status_code}")
+
+    data = zp.json()
+    place = (data.get("places") or [{}])[0]
+
+    city = place.get("place name", "") or ""
+    state = place.get("state abbreviation", "") or ""
+
+    lat = place.get("latitude")
+    lon = place.get("longitude")
+
+    county_name = ""
+    county_fips = ""
+
+    if lat and lon:
+        cg = census_http.get(
+            "https://geocoding.geo.census.gov/geocoder/geographies/coordinates",
+            params={
+                "x": lon,
+                "y": lat,
+                "benchmark": "Public_AR_Current",
+                "vintage": "Current_Current",
+                "format": "json",
+            },
+        )
+
+        if cg.status_code == 200:
+            gj = cg.json()
+            counties = ((gj.get("result")
+                         or {}).get("geographies", {}).get("Counties", []))
+            if counties:
+                county_name = counties[0].get("NAME", "") or ""
+                county_fips = counties[0].get("GEOID", "") or ""
+
+    return {
+        "zipcode": zipcode,
+        "state": state,
+        "city": city,
+        "county": county_name,
+        "countyFips": county_fips,
+        "latitude": lat,
+        "longitude": lon,
+    }
+
+
+zipcode_cache = ZipcodeCache(
+    fetch_zipcode,
+    ttl_seconds=ZIPCODE_CACHE_TTL_SECONDS,
+    negative_ttl_seconds=ZIPCODE_NEGATIVE_TTL_SECONDS,
+    refresh_after_seconds=ZIPCODE_REFRESH_AFTER_SECONDS,
+    max_entries=ZIPCODE_CACHE_MAX_ENTRIES,
+    db_path=ZIPCODE_CACHE_DB or os.path.join(app.instance_path, "zipcode_cache.sqlite3"),
+    offline_path=ZIPCODE_OFFLINE_DATASET)
+
+
+@app.cli.command("build-zip-dataset")
+@click.argument("csv_path")
+@click.argument("out_path")
+def build_zip_dataset_command(csv_path, out_path):
+    """Build the offline ZIP dataset from a CSV (zip, city, state, county, county_fips, latitude, longitude)."""
+    print(f"Wrote {build_offline_dataset(csv_path, out_path)} ZIP records to {out_path}")
+
+
 @app.route("/api/zipcode/<zipcode>", methods=["GET"])
 def lookup_zipcode(zipcode):
     try:
@@ -560,68 +796,21 @@ def lookup_zipcode(zipcode):
                 "success": False
             }), 400
 
-        zp = requests.get(
-            f"https://api.zippopotam.us/us/{zipcode}",
-            timeout=5,
-            headers={"User-Agent": "zipcode-lookup/1.0"},
-        )
+        record, source = zipcode_cache.lookup(zipcode)
 
-        if zp.status_code == 404:
+        if record is None:
             return jsonify({
                 "error": "Zipcode not found",
                 "success": False
             }), 404
-        if zp.status_code != 200:
-            return jsonify({
-                "error": "Lookup service unavailable",
-                "success": False
-            }), 503
-
-        data = zp.json()
-        place = (data.get("places") or [{}])[0]
-
-        city = place.get("place name", "") or ""
-        state = place.get("state abbreviation", "") or ""
-
-        lat = place.get("latitude")
-        lon = place.get("longitude")
-
-        county_name = ""
-        county_fips = ""
-
-        if lat and lon:
-            cg = requests.get(
-                "https://geocoding.geo.census.gov/geocoder/geographies/coordinates",
-                params={
-                    "x": lon,
-                    "y": lat,
-                    "benchmark": "Public_AR_Current",
-                    "vintage": "Current_Current",
-                    "format": "json",
-                },
-                timeout=5,
-                headers={"User-Agent": "zipcode-lookup/1.0"},
-            )
-
-            if cg.status_code == 200:
-                gj = cg.json()
-                counties = ((gj.get("result")
-                             or {}).get("geographies", {}).get("Counties", []))
-                if counties:
-                    county_name = counties[0].get("NAME", "") or ""
-                    county_fips = counties[0].get("GEOID", "") or ""
 
-        return jsonify({
-            "zipcode": zipcode,
-            "state": state,
-            "city": city,
-            "county": county_name,
-            "countyFips": county_fips,
-            "latitude": lat,
-            "longitude": lon,
-            "success": True,
-        }), 200
+        return jsonify({**record, "source": source, "success": True}), 200
 
+    except LookupUnavailable:
+        return jsonify({
+            "error": "Lookup service unavailable",
+            "success": False
+        }), 503
     except requests.Timeout:
         return jsonify({
             "error": "Lookup service timeout",
@@ -638,107 +827,282 @@ def lookup_zipcode(zipcode):
 # ============================================================
 # SCREEN 1: Lead Generation
 # ============================================================
+# Seconds between progress frames in streaming mode
+SCREEN1_PROGRESS_INTERVAL_SECONDS = float(
+    os.getenv("SCREEN1_PROGRESS_INTERVAL_SECONDS", "5"))
+
+# Probes quoted concurrently per customer before checking for a qualifying
+# one. Defaults to the UWM concurrency cap so a wave is one round trip;
+# 1 spends the fewest UWM calls at the cost of serial probes.
+SCREEN1_PROBE_WAVE_SIZE = int(
+    os.getenv("SCREEN1_PROBE_WAVE_SIZE", str(UWM_MAX_CONCURRENCY)))
+
+
+def prefilter_customers(customers, min_savings: float):
+    """
+    Rank customers by their locally estimated best-case savings (highest
+    first) and split off those that cannot reach `min_savings`.
+    Returns (candidates, pruned) where pruned is a list of (customer, estimate).
+    """
+    scored = []
+    pruned = []
+    for customer in customers:
+        est = rate_estimator.assess(customer.current_monthly_payment,
+                                    customer.remaining_balance, min_savings)
+        if est.prunable:
+            pruned.append((customer, est))
+        else:
+            scored.append((customer, est))
+
+    # Customers without an estimate keep their place after the ranked ones
+    scored.sort(key=lambda ce: -ce[1].max_savings
+                if ce[1].max_savings is not None else float("inf"))
+    return [c for c, _ in scored], pruned
+
+
+def _pruned_entry(customer: Customer, est) -> dict:
+    return {
+        "customer_key": customer.customer_key,
+        "name": customer.name,
+        "current_payment": customer.current_monthly_payment,
+        **est.to_dict()
+    }
+
+
+def _screen1_lead_from_response(customer: Customer, buydown: str,
+                                resp: requests.Response,
+                                min_savings: float):
+    """First price point in `resp` that saves at least `min_savings`, as a lead dict."""
+    if resp.status_code != 200:
+        return None
+
+    with analysis_stage_seconds.time(route="screen1", stage="parse"):
+        quote_body = parse_response_json(resp)
+        if not isinstance(quote_body, dict) or not quote_body:
+            logger.warning(
+                "Screen1: Could not parse quote response as dict. status=%s body_snip=%r",
+                resp.status_code, (resp.text or "")[:300])
+            return None
+
+    current_payment = customer.current_monthly_payment
+    with analysis_stage_seconds.time(route="screen1", stage="filter"):
+        for item in quote_body.get("validQuoteItems", []):
+            for pp in item.get("quotePricePoints", []):
+                mp_val = safe_float((pp.get("monthlyPayment")
+                                     or {}).get("value"))
+                if mp_val is None:
+                    continue
+
+                savings = current_payment - mp_val
+                if savings >= min_savings:
+                    fpa = pp.get("finalPriceAfterOriginationFee") or {}
+                    return {
+                        "customer_key": customer.customer_key,
+                        "name": customer.name,
+                        "phone": customer.phone,
+                        "email": customer.email,
+                        "current_payment": current_payment,
+                        "new_payment": mp_val,
+                        "monthly_savings": round(savings, 2),
+                        "annual_savings": round(savings * 12, 2),
+                        "product_name": item.get("mortgageProductName"),
+                        "product_alias": item.get("mortgageProductAlias"),
+                        "term_years": item.get("actualTermYears"),
+                        "interest_rate": interest_rate_value(
+                            pp.get("interestRate")),
+                        "buydown_type": buydown,
+                        "credit_cost": safe_float(fpa.get("amount")),
+                    }
+
+    return None
+
+
+def screen1_find_lead(customer: Customer, template: PayloadTemplate,
+                      min_savings: float, access_token: str,
+                      planner: QualificationPlanner) -> QualificationResult:
+    """
+    Probe the customer's buydown x term grid in the order chosen by
+    `planner` (best historical hit rate first) and stop at the first probe
+    with a price point saving at least `min_savings`.
+    """
+    buydown_scenarios = ["None", "1-0 LLPA", "2-1 LLPA"]
+
+    probes = []
+    payloads = {}
+    loan_terms = _coerce_list_str(template.base.get("loanTermIds", ["4"]))
+    for buydown in buydown_scenarios:
+        for term in loan_terms:
+            probe = Probe(buydown, str(term))
+            if probe in payloads:
+                continue
+            payloads[probe] = template.render(customer,
+                                              buyDownAliasId=buydown,
+                                              loanTermIds=[str(term)])
+            probes.append(probe)
+
+    def execute(wave):
+        responses = post_price_quotes(access_token,
+                                      [payloads[p] for p in wave])
+        return [
+            _screen1_lead_from_response(customer, p.buydown, resp, min_savings)
+            for p, resp in zip(wave, responses)
+        ]
+
+    return planner.run(customer.customer_key,
+                       probes,
+                       execute,
+                       wave_size=SCREEN1_PROBE_WAVE_SIZE)
+
+
+def _screen1_stream_mode(data: dict):
+    """'ndjson', 'sse' or None (single JSON document)."""
+    mode = (request.args.get("stream") or data.get("stream") or "")
+    mode = str(mode).lower()
+    if mode in ("ndjson", "sse"):
+        return mode
+
+    accept = request.headers.get("Accept", "")
+    if "text/event-stream" in accept:
+        return "sse"
+    if "application/x-ndjson" in accept:
+        return "ndjson"
+    return None
+
+
+def _screen1_frame(mode: str, event: str, data: dict) -> str:
+    if mode == "sse":
+        return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+    return json.dumps({"type": event, **data}, default=str) + "\n"
+
+
+def _screen1_stream(mode, customers, template, min_savings, pruned):
+    """
+    Yield one frame per qualifying lead as soon as it is found, a progress
+    frame at most every SCREEN1_PROGRESS_INTERVAL_SECONDS (and after the last
+    customer), then a final 'done' frame. If the client goes away the WSGI
+    server closes this generator and no further customers are quoted.
+    """
+    total = len(customers) + len(pruned)
+    analyzed = 0
+    total_leads = 0
+    started = time.monotonic()
+    last_progress = started
+
+    planner = QualificationPlanner.load()
+    try:
+        access_token = get_access_token()
+        yield _screen1_frame(mode, "progress", {
+            "analyzed": 0,
+            "total": total,
+            "total_leads": 0
+        })
+        if pruned:
+            yield _screen1_frame(mode, "pruned", {
+                "pruned": [_pruned_entry(c, est) for c, est in pruned]
+            })
+
+        for customer in customers:
+            logger.info("Analyzing customer: %s", customer.customer_key)
+            result = screen1_find_lead(customer, template, min_savings,
+                                       access_token, planner)
+            analyzed += 1
+
+            if result.qualified:
+                total_leads += 1
+                yield _screen1_frame(mode, "lead", {"lead": result.lead})
+
+            now = time.monotonic()
+            if (now - last_progress >= SCREEN1_PROGRESS_INTERVAL_SECONDS
+                    or analyzed == len(customers)):
+                last_progress = now
+                yield _screen1_frame(mode, "progress", {
+                    "analyzed": analyzed,
+                    "total": total,
+                    "total_pruned": len(pruned),
+                    "total_leads": total_leads,
+                    "elapsed_seconds": round(now - started, 1)
+                })
+
+        yield _screen1_frame(mode, "done", {
+            "analyzed": analyzed,
+            "total": total,
+            "total_pruned": len(pruned),
+            "total_leads": total_leads,
+            "planner": planner.summary()
+        })
+
+    except GeneratorExit:
+        logger.info("Screen 1 stream closed by client after %d/%d customers",
+                    analyzed, total)
+        raise
+    except Exception as e:
+        logger.error("Error in screen1 stream: %s", e, exc_info=True)
+        yield _screen1_frame(mode, "error", {"error": str(e)})
+    finally:
+        planner.flush()
+
+
 @app.route("/api/screen1/analyze", methods=["POST"])
 def screen1_analyze():
+    """
+    Find one qualifying lead per current customer, probing the most likely
+    buydown x term combinations first (see QualificationPlanner).
+    With "prefilter": true, customers whose best-case savings per the local
+    rate grid cannot reach min_savings are skipped and listed under "pruned"
+    with the reason.
+    With ?stream=ndjson|sse (or "stream" in the body, or a matching Accept
+    header) leads and progress are streamed as they are found.
+    """
     try:
         data = request.json or {}
         min_savings = float(data.get("min_savings", 200))
         target_amount = float(data.get("target_amount", -2000))
-        base_payload = data.get("payload", {}) or {}
+        template = PayloadTemplate(data.get("payload", {}) or {})
 
         logger.info("Screen 1 Analysis - Min Savings: $%.2f", min_savings)
 
         customers = Customer.get_current_customers()
-        access_token = get_access_token()
+        pruned = []
+        if data.get("prefilter", False):
+            customers, pruned = prefilter_customers(customers, min_savings)
+
+        stream_mode = _screen1_stream_mode(data)
+        if stream_mode:
+            return Response(
+                stream_with_context(
+                    _screen1_stream(stream_mode, customers, template,
+                                    min_savings, pruned)),
+                mimetype="text/event-stream"
+                if stream_mode == "sse" else "application/x-ndjson",
+                headers={
+                    "Cache-Control": "no-cache",
+                    "X-Accel-Buffering": "no"
+                })
 
-        buydown_scenarios = ["None", "1-0 LLPA", "2-1 LLPA"]
+        access_token = get_access_token()
+        planner = QualificationPlanner.load()
         qualifying_leads = []
 
-        for customer in customers:
-            logger.info("Analyzing customer: %s", customer.name)
-            current_payment = customer.current_monthly_payment
-
-            for buydown in buydown_scenarios:
-                payload = build_payload_from_customer(customer, base_payload)
-                payload["buyDownAliasId"] = buydown  # consistent casing
-
-                loan_terms = payload.get("loanTermIds", ["4"])
-                loan_terms = _coerce_list_str(loan_terms)
-
-                for term in loan_terms:
-                    payload_copy = payload.copy()
-                    payload_copy["loanTermIds"] = [str(term)]
-
-                    resp = post_price_quote(access_token, payload_copy)
-                    time.sleep(UWM_REQUEST_DELAY_SECONDS)
-                    if resp.status_code != 200:
-                        continue
-
-                    quote_body = parse_response_json(resp)
-                    if not isinstance(quote_body, dict) or not quote_body:
-                        logger.warning(
-                            "Screen1: Could not parse quote response as dict. status=%s body_snip=%r",
-                            resp.status_code, (resp.text or "")[:300])
-                        continue
-
-                    for item in quote_body.get("validQuoteItems", []):
-                        for pp in item.get("quotePricePoints", []):
-                            mp_val = safe_float((pp.get("monthlyPayment")
-                                                 or {}).get("value"))
-                            if mp_val is None:
-                                continue
-
-                            savings = current_payment - mp_val
-                            if savings >= min_savings:
-                                rate_val = interest_rate_value(
-                                    pp.get("interestRate"))
-                                fpa = pp.get(
-                                    "finalPriceAfterOriginationFee") or {}
-
-                                qualifying_leads.append({
-                                    "customer_key":
-                                    customer.customer_key,
-                                    "name":
-                                    customer.name,
-                                    "phone":
-                                    customer.phone,
-                                    "email":
-                                    customer.email,
-                                    "current_payment":
-                                    current_payment,
-                                    "new_payment":
-                                    mp_val,
-                                    "monthly_savings":
-                                    round(savings, 2),
-                                    "annual_savings":
-                                    round(savings * 12, 2),
-                                    "product_name":
-                                    item.get("mortgageProductName"),
-                                    "product_alias":
-                                    item.get("mortgageProductAlias"),
-                                    "term_years":
-                                    item.get("actualTermYears"),
-                                    "interest_rate":
-                                    rate_val,
-                                    "buydown_type":
-                                    buydown,
-                                    "credit_cost":
-                                    safe_float(fpa.get("amount")),
-                                })
-                                break
-                        if qualifying_leads and qualifying_leads[-1][
-                                "name"] == customer.name:
-                            break
-                    if qualifying_leads and qualifying_leads[-1][
-                            "name"] == customer.name:
-                        break
-                if qualifying_leads and qualifying_leads[-1][
-                        "name"] == customer.name:
-                    break
+        try:
+            for customer in customers:
+                logger.info("Analyzing customer: %s", customer.customer_key)
+                result = screen1_find_lead(customer, template,
+                                           min_savings, access_token, planner)
+                if result.qualified:
+                    qualifying_leads.append(result.lead)
+        finally:
+            planner.flush()
+
+        summary = planner.summary()
+        logger.info("Screen 1 planner: %d UWM calls, %d saved",
+                    summary["uwm_calls"], summary["uwm_calls_saved"])
 
         return jsonify({
             "total_leads": len(qualifying_leads),
-            "leads": qualifying_leads
+            "leads": qualifying_leads,
+            "total_pruned": len(pruned),
+            "pruned": [_pruned_entry(c, est) for c, est in pruned],
+            "planner": summary
         })
 
     except Exception as e:
@@ -749,10 +1113,152 @@ def screen1_analyze():
 # ============================================================
 # Customers CRUD
 # ============================================================
+# Page size bounds of GET /api/customers?limit=
+CUSTOMER_PAGE_DEFAULT_LIMIT = 100
+CUSTOMER_PAGE_MAX_LIMIT = int(os.getenv("CUSTOMER_PAGE_MAX_LIMIT", "1000"))
+
+
+def _customer_filters(args):
+    """
+    SQL conditions from the query string, or raise ValueError.
+
+    customer_key, state, zip (comma-separated lists allowed), min_credit /
+    max_credit and min_payment / max_payment (inclusive), and q: a
+    case-insensitive substring of name, email, phone or customer_key.
+    """
+    conditions = []
+    q = (args.get("q") or "").strip()
+    if q:
+        conditions.append(db.or_(*(
+            column.icontains(q, autoescape=True)
+            for column in (Customer.name, Customer.email, Customer.phone,
+                           Customer.customer_key))))
+    for param, column in (("customer_key", Customer.customer_key),
+                          ("state", Customer.property_state),
+                          ("zip", Customer.property_zip)):
+        value = args.get(param)
+        if value:
+            values = [v.strip() for v in value.split(",") if v.strip()]
+            if param == "state":
+                values = [v.upper() for v in values]
+            conditions.append(column.in_(values))
+
+    for param, column, cast in (("credit", Customer.credit_score, int),
+                                ("payment", Customer.current_monthly_payment, float)):
+        for bound, op in (("min", column.__ge__), ("max", column.__le__)):
+            value = args.get(f"{bound}_{param}")
+            if value not in (None, ""):
+                try:
+                    conditions.append(op(cast(value)))
+                except ValueError:
+                    raise ValueError(f"Invalid {bound}_{param}: {value!r}")
+    return conditions
+
+
+def _parse_as_of(value: str) -> datetime:
+    """
+    ISO date/datetime from the query string as naive UTC (how effective_date
+    and end_date are stored); naive input is taken as UTC, a bare date as
+    its midnight. Raises ValueError.
+    """
+    try:
+        at = datetime.fromisoformat(value.strip())
+    except (AttributeError, ValueError):
+        raise ValueError(f"Invalid date: {value!r}")
+    if at.tzinfo is not None:
+        at = at.astimezone(timezone.utc).replace(tzinfo=None)
+    return at
+
+
+def _encode_cursor(position) -> str:
+    return base64.urlsafe_b64encode(json.dumps(list(position)).encode()).decode()
+
+
+def _decode_cursor(cursor: str):
+    try:
+        customer_key, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return str(customer_key), int(row_id)
+    except (ValueError, TypeError):
+        raise ValueError("Invalid cursor")
+
+
 @app.route("/api/customers", methods=["GET"])
 def get_customers():
-    customers = Customer.get_current_customers()
-    return jsonify([c.to_dict() for c in customers])
+    """
+    One page of current customers: {"customers": [...], "next_cursor": ...},
+    ordered by customer_key, at most ?limit= (CUSTOMER_PAGE_DEFAULT_LIMIT,
+    capped at CUSTOMER_PAGE_MAX_LIMIT) of them. Pass next_cursor back as
+    ?cursor= for the next page until it is null. ?fields=a,b,c projects the
+    rows, filters are those of _customer_filters, and ?at=<ISO date> lists
+    the versions in effect at that time instead of the current ones.
+    """
+    try:
+        conditions = _customer_filters(request.args)
+        after = _decode_cursor(request.args["cursor"]) if request.args.get("cursor") else None
+        as_of = _parse_as_of(request.args["at"]) if request.args.get("at") else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    fields = Customer.API_FIELDS
+    if request.args.get("fields"):
+        fields = tuple(f.strip() for f in request.args["fields"].split(",") if f.strip())
+        unknown = [f for f in fields if f not in Customer.API_FIELDS]
+        if unknown or not fields:
+            return jsonify({
+                "error": f"Unknown fields: {', '.join(unknown)}" if unknown else "No fields",
+                "fields": list(Customer.API_FIELDS)
+            }), 400
+
+    limit = request.args.get("limit", type=int) or CUSTOMER_PAGE_DEFAULT_LIMIT
+    limit = max(1, min(limit, CUSTOMER_PAGE_MAX_LIMIT))
+
+    customers, last = Customer.get_page(conditions, fields, limit, after, as_of)
+    return jsonify({
+        "customers": customers,
+        "as_of": as_of.isoformat() if as_of else None,
+        "limit": limit,
+        "next_cursor": _encode_cursor(last) if last else None
+    })
+
+
+@app.route("/api/customers/count", methods=["GET"])
+def count_customers():
+    """Number of current customers (or in effect ?at=), with the listing's filters."""
+    try:
+        conditions = _customer_filters(request.args)
+        as_of = _parse_as_of(request.args["at"]) if request.args.get("at") else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    return jsonify({"count": Customer.count(conditions, as_of)})
+
+
+@app.route("/api/customers/changes", methods=["GET"])
+def get_customer_changes():
+    """
+    Portfolio audit: versions that took effect in [?since=, ?until=) (until
+    defaults to now), each with only the fields it changed. Takes the
+    listing's filters, ?limit= and ?cursor= paging.
+    """
+    try:
+        since = _parse_as_of(request.args.get("since", ""))
+        until = (_parse_as_of(request.args["until"]) if request.args.get("until")
+                 else datetime.now(timezone.utc).replace(tzinfo=None))
+        conditions = _customer_filters(request.args)
+        after = _decode_cursor(request.args["cursor"]) if request.args.get("cursor") else None
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    limit = request.args.get("limit", type=int) or CUSTOMER_PAGE_DEFAULT_LIMIT
+    limit = max(1, min(limit, CUSTOMER_PAGE_MAX_LIMIT))
+
+    changes, last = Customer.get_changes_page(since, until, conditions, limit, after)
+    return jsonify({
+        "since": since.isoformat(),
+        "until": until.isoformat(),
+        "changes": changes,
+        "limit": limit,
+        "next_cursor": _encode_cursor(last) if last else None
+    })
 
 
 @app.route("/api/customers/<customer_key>/history", methods=["GET"])
@@ -761,6 +1267,50 @@ def get_customer_history(customer_key):
     return jsonify([c.to_dict() for c in history])
 
 
+@app.route("/api/customers/<customer_key>/as-of", methods=["GET"])
+def get_customer_as_of(customer_key):
+    """The version of a customer in effect at ?at=<ISO date>."""
+    try:
+        as_of = _parse_as_of(request.args.get("at", ""))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    customer = Customer.get_as_of_by_key(customer_key, as_of)
+    if not customer:
+        return jsonify({"error": "No version in effect at that time"}), 404
+    return jsonify(customer.to_dict())
+
+
+@app.route("/api/customers/<customer_key>/diff", methods=["GET"])
+def get_customer_diff(customer_key):
+    """
+    Fields that changed between ?from= and ?to= versions (defaults: the
+    version before `to`, and the current version).
+    """
+    to_version = request.args.get("to", type=int)
+    if to_version is None:
+        current = Customer.get_current_by_key(customer_key)
+        if not current:
+            return jsonify({"error": "Customer not found"}), 404
+        to_version = current.version
+    from_version = request.args.get("from", type=int)
+    if from_version is None:
+        from_version = to_version - 1
+
+    rows = {c.version: c for c in Customer.query.filter(
+        Customer.customer_key == customer_key,
+        Customer.version.in_([from_version, to_version]))}
+    if to_version not in rows or (from_version not in rows and from_version > 0):
+        return jsonify({"error": "Version not found"}), 404
+
+    return jsonify({
+        "customer_key": customer_key,
+        "from_version": from_version if from_version in rows else None,
+        "to_version": to_version,
+        "changes": Customer.diff(rows.get(from_version), rows[to_version])
+    })
+
+
 @app.route("/api/customers", methods=["POST"])
 def add_customer():
     data = request.json or {}
@@ -847,10 +1397,444 @@ def delete_customer(customer_key):
     return jsonify({"message": "Customer deactivated"})
 
 
+# Rows matched and written per transaction by the bulk import
+CUSTOMER_IMPORT_CHUNK_SIZE = int(os.getenv("CUSTOMER_IMPORT_CHUNK_SIZE", "500"))
+
+
+@app.route("/api/customers/import", methods=["POST"])
+def import_customers():
+    """
+    Bulk insert / SCD2 update of customers from a CSV or NDJSON upload.
+
+    The file is the raw request body (Content-Type text/csv or
+    application/x-ndjson) or a multipart "file" field; ?format=csv|ndjson
+    overrides detection. Rows are matched on customer_key; see
+    CustomerImporter. ?outcomes=errors lists only failed rows.
+    """
+    upload = request.files.get("file")
+    if upload is not None:
+        stream, filename = upload.stream, upload.filename
+    else:
+        stream, filename = request.stream, ""
+
+    fmt = detect_format(request.args.get("format"), request.content_type or "",
+                        filename)
+    if fmt is None:
+        return jsonify({
+            "error": "Unknown format; send text/csv or application/x-ndjson, "
+                     "or pass ?format=csv|ndjson"
+        }), 400
+
+    chunk_size = request.args.get("chunk_size", type=int) or CUSTOMER_IMPORT_CHUNK_SIZE
+    importer = CustomerImporter(chunk_size=chunk_size,
+                                updated_by=request.args.get("updated_by"))
+    report = importer.run(iter_rows(stream, fmt))
+
+    outcomes = report.outcomes
+    if request.args.get("outcomes") == "errors":
+        outcomes = [o for o in outcomes if o["outcome"] == "error"]
+
+    logger.info("Customer import (%s): %s", fmt, report.stats())
+    body = {"format": fmt, "stats": report.stats(), "outcomes": outcomes}
+    if report.aborted:
+        return jsonify({"error": report.aborted, **body}), 400
+    return jsonify(body)
+
+
 # ============================================================
 # Analysis cache
 # ============================================================
-analysis_cache = {}  # {cache_key: {...}}
+# "memory" keeps batches in this process only; "sql" shares them between
+# workers and keeps them across restarts.
+ANALYSIS_STORE_BACKEND = os.getenv("ANALYSIS_STORE", "sql").lower()
+ANALYSIS_STORE_SWEEP_SECONDS = float(os.getenv("ANALYSIS_STORE_SWEEP_SECONDS", "300"))
+
+if ANALYSIS_STORE_BACKEND == "memory":
+    analysis_store = InMemoryAnalysisStore()
+else:
+    analysis_store = SqlAnalysisStore(app)
+
+analysis_store_sweeper = AnalysisStoreSweeper(
+    analysis_store, interval=ANALYSIS_STORE_SWEEP_SECONDS)
+analysis_store_sweeper.start()
+
+# Worker threads per server-side batch job (each fans out its own UWM calls)
+ANALYSIS_JOB_WORKERS = int(os.getenv("ANALYSIS_JOB_WORKERS", "2"))
+# A job whose stored progress has not moved for this long is reported as
+# "stalled" (its worker is gone) and may be resumed by any worker
+ANALYSIS_JOB_STALE_SECONDS = float(os.getenv("ANALYSIS_JOB_STALE_SECONDS", "600"))
+# Jobs run by this worker process; the analysis store has every job's progress
+analysis_jobs = BatchJobRegistry()
+
+# How far /results?since=<cursor> polls look back before the cursor
+RESULTS_CURSOR_OVERLAP = timedelta(seconds=5)
+
+# Upper bound on min_savings x target_amount pairs per what-if sweep request
+ANALYSIS_SWEEP_MAX_COMBINATIONS = int(os.getenv("ANALYSIS_SWEEP_MAX_COMBINATIONS", "100"))
+
+# How old a stored rate grid may be and still stand in for new price quotes
+# in an incremental batch
+ANALYSIS_REUSE_MAX_AGE_SECONDS = float(
+    os.getenv("ANALYSIS_REUSE_MAX_AGE_SECONDS", str(QUOTE_CACHE_TTL_SECONDS)))
+
+# Customer fields that go into a price quote; a change to any of them means
+# a stored grid no longer applies
+QUOTE_INPUT_FIELDS = ("remaining_balance", "property_value", "credit_score",
+                      "monthly_income", "property_zip", "property_state",
+                      "property_county")
+
+
+def _get_live_cache_entry(cache_key):
+    """Return (batch, error_response). Expired batches are dropped."""
+    cache_entry = analysis_store.get_batch(cache_key)
+    if cache_entry is None:
+        return None, (jsonify({"error": "Cache key not found"}), 404)
+
+    if datetime.now(timezone.utc) > cache_entry["expires_at"]:
+        analysis_store.delete_batch(cache_key)
+        analysis_jobs.remove(cache_key)
+        return None, (jsonify({"error": "Cache expired"}), 410)
+
+    return cache_entry, None
+
+
+def _sha256_json(value) -> str:
+    return hashlib.sha256(
+        json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def payload_fingerprint(base_payload: dict) -> str:
+    """Stable key of a batch payload, so grids quoted from it can be matched."""
+    return _sha256_json(base_payload or {})
+
+
+def customer_inputs_fingerprint(customer: Customer) -> str:
+    """Digest of the customer fields that feed a price quote."""
+    return _sha256_json([getattr(customer, f) for f in QUOTE_INPUT_FIELDS])
+
+
+def _reusable_grid(cache_entry: dict, customer: Customer):
+    """
+    (cache_key, grid) of the newest stored grid quoted from the same payload,
+    customer version and inputs within ANALYSIS_REUSE_MAX_AGE_SECONDS, or None.
+    Grids holding a failed scenario are re-quoted instead.
+    """
+    since = datetime.now(timezone.utc) - timedelta(
+        seconds=ANALYSIS_REUSE_MAX_AGE_SECONDS)
+    found = analysis_store.find_grid(customer.customer_key,
+                                     payload_fingerprint(cache_entry["payload"]),
+                                     customer.version,
+                                     customer_inputs_fingerprint(customer),
+                                     since)
+    if found is None or any("error" in s for s in found[1]["scenarios"]):
+        return None
+    return found
+
+
+def _observe_stage(route: str, stage: str, started: float) -> float:
+    """
+    Record a stage of `route` that began at `started` (metrics, plus a span
+    of the current trace); returns the time now.
+    """
+    now = time.perf_counter()
+    analysis_stage_seconds.observe(now - started, route=route, stage=stage)
+    add_span(stage, started, now)
+    return now
+
+
+def _trace_requested() -> bool:
+    """?trace=1 or "trace": true in the JSON body (or ANALYSIS_TRACE_ALL)."""
+    if ANALYSIS_TRACE_ALL:
+        return True
+    if request.args.get("trace", "").lower() in ("1", "true", "yes"):
+        return True
+    data = request.get_json(silent=True)
+    return isinstance(data, dict) and data.get("trace") is True
+
+
+def analyze_customer_for_cache(cache_key: str, cache_entry: dict,
+                               customer: Customer, access_token: str):
+    """
+    Quote every buydown scenario for one customer against the batch settings
+    in `cache_entry` and record the result in the analysis store.
+    Returns (analysis_result, qualified, best_savings).
+
+    Incremental batches re-score a still fresh grid of an earlier batch
+    instead of quoting when the customer's version and quote inputs are
+    unchanged (see _reusable_grid).
+    """
+    base_payload = cache_entry["payload"]
+    min_savings = cache_entry["min_savings"]
+    target_amount = cache_entry["target_amount"]
+
+    if cache_entry.get("prefilter"):
+        with span("prefilter"):
+            est = rate_estimator.assess(customer.current_monthly_payment,
+                                        customer.remaining_balance, min_savings)
+        if est.prunable:
+            analysis_result = {
+                "customer": customer.to_dict(),
+                "scenarios": [],
+                "target_amount": target_amount,
+                "best_option": None,
+                "analyzed_at": datetime.now(timezone.utc).isoformat(),
+                "viewed": False,
+                "pruned": True,
+                "prune_reason": est.reason,
+                "estimate": est.to_dict()
+            }
+            analysis_store.put_result(cache_key, customer.customer_key,
+                                      analysis_result, False)
+            return analysis_result, False, 0.0
+
+    buydown_scenarios = ["None", "1-0 LLPA", "2-1 LLPA"]
+
+    results = []
+    best_option = None
+    best_savings = 0.0
+    current_payment = customer.current_monthly_payment
+
+    t = time.perf_counter()
+    reused = _reusable_grid(cache_entry, customer) if cache_entry.get("incremental") else None
+    if reused:
+        reused_from, grid = reused
+        # Column-wise scenarios (RateSheet.to_dict form) of an earlier batch
+        grid_scenarios = grid["scenarios"]
+        quoted_at = grid["quoted_at"]
+        responses = []
+    else:
+        template = payload_templates.get(cache_key, base_payload)
+        payloads = [template.render(customer, buyDownAliasId=buydown)
+                    for buydown in buydown_scenarios]
+        t = _observe_stage("batch", "payload", t)
+
+        responses = post_price_quotes(access_token, payloads)
+        grid_scenarios = []
+        quoted_at = None
+    t = _observe_stage("batch", "reuse" if reused else "quote", t)
+
+    def product_rates(products_by_term, term, product_name, product_alias):
+        key = (term, product_name)
+        if key not in products_by_term:
+            products_by_term[key] = {
+                "term_years": term,
+                "product_name": product_name,
+                "product_alias": product_alias,
+                "rates": []
+            }
+        return products_by_term[key]["rates"]
+
+    def add_rate(rates, buydown, term, product_name, rate_val, mp_val,
+                 credit_cost):
+        nonlocal best_option, best_savings
+        savings = current_payment - mp_val
+        rate_data = {
+            "interest_rate": rate_val,
+            "monthly_payment": mp_val,
+            "monthly_savings": round(savings, 2),
+            "credit_cost": credit_cost,
+            # Avoid NameError; this is only an estimated breakdown
+            "buydown_breakdown": calculate_buydown_details(
+                rate_val, buydown, customer.remaining_balance,
+                int(term) if term else 0)
+        }
+        rates.append(rate_data)
+
+        if savings > best_savings:
+            best_savings = float(savings)
+            best_option = {
+                "buydown": buydown,
+                "product": product_name,
+                "term": term,
+                **rate_data
+            }
+
+    # products_by_term of each grid scenario (None for a failed one)
+    scenario_products = []
+
+    for buydown, resp in zip(buydown_scenarios, responses):
+        if resp.status_code != 200:
+            grid_scenarios.append({
+                "buydown_type": buydown,
+                "error": resp.text,
+                "products": []
+            })
+            scenario_products.append(None)
+            continue
+
+        quote_body = parse_response_json(resp)
+        if not isinstance(quote_body, dict) or not quote_body:
+            grid_scenarios.append({
+                "buydown_type": buydown,
+                "error": "Could not parse response",
+                "products": []
+            })
+            scenario_products.append(None)
+            continue
+
+        # One pass: every price point goes into the grid columns, the ones
+        # that pass min_savings into the result too
+        products_by_term = {}
+        grid_products = []
+        for item in quote_body.get("validQuoteItems", []):
+            term = item.get("actualTermYears")
+            product_name = item.get("mortgageProductName")
+            product_alias = item.get("mortgageProductAlias")
+            rates = product_rates(products_by_term, term, product_name,
+                                  product_alias)
+
+            rate_col, payment_col, credit_col = [], [], []
+            for pp in item.get("quotePricePoints", []):
+                rate_val = interest_rate_value(pp.get("interestRate"))
+                mp_val = safe_float((pp.get("monthlyPayment")
+                                     or {}).get("value"))
+                fpa = pp.get("finalPriceAfterOriginationFee") or {}
+                credit_cost = safe_float(fpa.get("amount"))
+                rate_col.append(rate_val)
+                payment_col.append(mp_val)
+                credit_col.append(credit_cost)
+
+                if mp_val is None or current_payment - mp_val < min_savings:
+                    continue
+                add_rate(rates, buydown, term, product_name, rate_val, mp_val,
+                         credit_cost)
+
+            grid_products.append({
+                "term_years": term,
+                "product_name": product_name,
+                "product_alias": product_alias,
+                "rate": rate_col,
+                "payment": payment_col,
+                "credit_cost": credit_col
+            })
+
+        grid_scenarios.append({"buydown_type": buydown, "products": grid_products})
+        scenario_products.append(products_by_term)
+
+    if reused:
+        for scenario in grid_scenarios:
+            buydown = scenario["buydown_type"]
+            products_by_term = {}
+            for product in scenario["products"]:
+                term = product["term_years"]
+                product_name = product["product_name"]
+                rates = product_rates(products_by_term, term, product_name,
+                                      product["product_alias"])
+                for rate_val, mp_val, credit_cost in zip(
+                        product["rate"], product["payment"],
+                        product["credit_cost"]):
+                    if mp_val is None or current_payment - mp_val < min_savings:
+                        continue
+                    add_rate(rates, buydown, term, product_name, rate_val,
+                             mp_val, credit_cost)
+            scenario_products.append(products_by_term)
+    t = _observe_stage("batch", "parse", t)
+
+    for scenario, products_by_term in zip(grid_scenarios, scenario_products):
+        if products_by_term is None:
+            results.append(scenario)
+            continue
+
+        # Mark closest to target on each product
+        for product in products_by_term.values():
+            product["rates"].sort(key=lambda x: x["interest_rate"]
+                                  if x["interest_rate"] is not None else 999)
+            if product["rates"]:
+                closest_rate = min(
+                    product["rates"],
+                    key=lambda x: abs(x["credit_cost"] - target_amount)
+                    if x["credit_cost"] is not None else float('inf'))
+                closest_rate["is_closest_to_target"] = True
+
+        results.append({
+            "buydown_type": scenario["buydown_type"],
+            "products": list(products_by_term.values())
+        })
+
+    analyzed_at = datetime.now(timezone.utc)
+    analysis_result = {
+        "customer": customer.to_dict(),
+        "scenarios": results,
+        "target_amount": target_amount,
+        "best_option": best_option,
+        "analyzed_at": analyzed_at.isoformat(),
+        "viewed": False
+    }
+    if reused:
+        analysis_result["reused_from"] = {
+            "cache_key": reused_from,
+            "quoted_at": quoted_at.isoformat()
+        }
+
+    t = _observe_stage("batch", "filter", t)
+
+    # Keep every quoted price point so /sweep can re-score other thresholds
+    # and later incremental batches can reuse them; a reused grid keeps its
+    # original quote time so it still ages out
+    analysis_store.put_grid(cache_key, customer.customer_key, {
+        "current_payment": customer.current_monthly_payment,
+        "quoted_at": quoted_at or analyzed_at,
+        "scenarios": grid_scenarios,
+        "payload_key": payload_fingerprint(base_payload),
+        "customer_version": customer.version,
+        "inputs_fingerprint": customer_inputs_fingerprint(customer),
+    })
+
+    qualified = bool(best_option and best_savings >= min_savings)
+    calls = len(buydown_scenarios)
+    analysis_store.put_result(cache_key, customer.customer_key,
+                              analysis_result, qualified,
+                              uwm_calls=0 if reused else calls,
+                              reused_calls=calls if reused else 0)
+    _observe_stage("batch", "store", t)
+
+    return analysis_result, qualified, best_savings
+
+
+def _start_analysis_job(cache_key: str, cache_entry: dict) -> BatchJob:
+    """Launch (or resume) the server-side job that walks all current customers."""
+
+    def process(customer_key):
+        batch = analysis_store.get_batch(cache_key)
+        if (datetime.now(timezone.utc) > cache_entry["expires_at"]
+                or batch is None or batch["cancel_requested"]):
+            # Not analysed; left pending for a resume
+            job.cancel()
+            return False
+        with app.app_context():
+            customer = Customer.get_current_by_key(customer_key)
+            if not customer:
+                return
+            analyze_customer_for_cache(cache_key, cache_entry, customer,
+                                       get_access_token())
+
+    def report(job):
+        # Shared through the store, so /progress and /cancel work on any worker
+        analysis_store.update_batch(cache_key, job={
+            **job.progress(),
+            "updated_at": datetime.now(timezone.utc).isoformat(),
+        })
+
+    job = analysis_jobs.get(cache_key)
+    if job is None:
+        job = analysis_jobs.add(
+            cache_key,
+            BatchJob(cache_key, process, workers=ANALYSIS_JOB_WORKERS,
+                     on_progress=report))
+
+    customers = Customer.get_current_customers()
+    if cache_entry.get("prefilter"):
+        # Most promising customers first; pruned ones are recorded without
+        # UWM calls by analyze_customer_for_cache
+        candidates, pruned = prefilter_customers(
+            customers, cache_entry["min_savings"])
+        customers = candidates + [c for c, _ in pruned]
+    customer_keys = [c.customer_key for c in customers]
+    analysis_store.update_batch(cache_key, total_customers=len(customer_keys),
+                                cancel_requested=False)
+    done = analysis_store.result_keys(cache_key)
+    job.start(k for k in customer_keys if k not in done)
+    return job
 
 
 @app.route("/api/analysis/start", methods=["POST"])
@@ -860,241 +1844,369 @@ def start_batch_analysis():
     min_savings = float(data.get("min_savings", 200))
     target_amount = float(data.get("target_amount", -2000))
     ttl_hours = float(data.get("ttl_hours", 2))
+    background = bool(data.get("background", False))
+    prefilter = bool(data.get("prefilter", False))
+    incremental = bool(data.get("incremental", False))
 
     cache_key = str(uuid.uuid4())
 
-    analysis_cache[cache_key] = {
+    cache_entry = {
         "created_at": datetime.now(timezone.utc),
         "expires_at": datetime.now(timezone.utc) + timedelta(hours=ttl_hours),
         "payload": base_payload,
         "min_savings": min_savings,
         "target_amount": target_amount,
-        "results": {},
+        "prefilter": prefilter,
+        "incremental": incremental,
         "total_customers": 0,
-        "analyzed_count": 0,
-        "qualified_count": 0
     }
+    analysis_store.create_batch(cache_key, cache_entry)
+
+    if not background:
+        return jsonify({"cache_key": cache_key, "message": "Analysis started"})
 
-    return jsonify({"cache_key": cache_key, "message": "Analysis started"})
+    job = _start_analysis_job(cache_key, cache_entry)
+    return jsonify({
+        "cache_key": cache_key,
+        "message": "Background analysis started",
+        "job": job.progress()
+    })
 
 
 @app.route("/api/analysis/<cache_key>/analyze-next", methods=["POST"])
 def analyze_next_customer(cache_key):
+    trace = tracer.start("analyze_next", enabled=_trace_requested(),
+                         cache_key=cache_key)
     try:
-        if cache_key not in analysis_cache:
-            return jsonify({"error": "Cache key not found"}), 404
-
-        cache_entry = analysis_cache[cache_key]
-
-        if datetime.now(timezone.utc) > cache_entry["expires_at"]:
-            del analysis_cache[cache_key]
-            return jsonify({"error": "Cache expired"}), 410
+        cache_entry, error = _get_live_cache_entry(cache_key)
+        if error:
+            return error
 
         data = request.json or {}
         customer_key = data.get("customer_key")
         if not customer_key:
             return jsonify({"error": "customer_key required"}), 400
+        if trace:
+            trace.attrs["customer_key"] = customer_key
 
-        customer = Customer.get_current_by_key(customer_key)
+        with span("customer_lookup"):
+            customer = Customer.get_current_by_key(customer_key)
         if not customer:
             return jsonify({"error": "Customer not found"}), 404
 
-        base_payload = cache_entry["payload"]
-        min_savings = cache_entry["min_savings"]
-        target_amount = cache_entry["target_amount"]
+        analysis_result, qualified, best_savings = analyze_customer_for_cache(
+            cache_key, cache_entry, customer, get_access_token())
 
-        access_token = get_access_token()
-        buydown_scenarios = ["None", "1-0 LLPA", "2-1 LLPA"]
-
-        results = []
-        best_option = None
-        best_savings = 0.0
-
-        for buydown in buydown_scenarios:
-            payload = build_payload_from_customer(customer, base_payload)
-            payload["buyDownAliasId"] = buydown
-
-            resp = post_price_quote(access_token, payload)
-            time.sleep(UWM_REQUEST_DELAY_SECONDS)
-
-            if resp.status_code != 200:
-                results.append({
-                    "buydown_type": buydown,
-                    "error": resp.text,
-                    "products": []
-                })
-                continue
+        response = {
+            "qualified": qualified,
+            "customer_key": customer_key,
+            "customer_name": customer.name,
+            "best_savings": best_savings if analysis_result["best_option"] else 0,
+            "reused": "reused_from" in analysis_result,
+            "analysis": analysis_result if qualified else None
+        }
+        if trace:
+            response["trace"] = trace.summary()
+        return jsonify(response)
 
-            quote_body = parse_response_json(resp)
-            if not isinstance(quote_body, dict) or not quote_body:
-                results.append({
-                    "buydown_type": buydown,
-                    "error": "Could not parse response",
-                    "products": []
-                })
-                continue
+    except Exception as e:
+        logger.error("Error in analyze_next_customer: %s", e, exc_info=True)
+        return jsonify({"error": str(e)}), 500
+    finally:
+        tracer.finish(trace)
 
-            products_by_term = {}
 
-            for item in quote_body.get("validQuoteItems", []):
-                term = item.get("actualTermYears")
-                product_name = item.get("mortgageProductName")
+def _job_progress(cache_key: str, cache_entry: dict) -> Optional[dict]:
+    """
+    Progress of the batch's background job: live when this worker runs it,
+    otherwise the snapshot the running worker stored, with a running job
+    whose worker stopped reporting shown as "stalled".
+    """
+    job = analysis_jobs.get(cache_key)
+    if job and job.is_running():
+        return job.progress()
 
-                key = (term, product_name)
-                if key not in products_by_term:
-                    products_by_term[key] = {
-                        "term_years": term,
-                        "product_name": product_name,
-                        "product_alias": item.get("mortgageProductAlias"),
-                        "rates": []
-                    }
+    stored = cache_entry.get("job")
+    if stored and stored["state"] in ("running", "cancelling"):
+        updated_at = datetime.fromisoformat(stored["updated_at"])
+        age = (datetime.now(timezone.utc) - updated_at).total_seconds()
+        if age > ANALYSIS_JOB_STALE_SECONDS:
+            stored = {**stored, "state": "stalled"}
+    return stored
 
-                for pp in item.get("quotePricePoints", []):
-                    mp_val = safe_float((pp.get("monthlyPayment")
-                                         or {}).get("value"))
-                    if mp_val is None:
-                        continue
 
-                    savings = customer.current_monthly_payment - mp_val
-                    if savings < min_savings:
-                        continue
+@app.route("/api/analysis/<cache_key>/progress", methods=["GET"])
+def get_analysis_progress(cache_key):
+    cache_entry, error = _get_live_cache_entry(cache_key)
+    if error:
+        return error
 
-                    rate_val = interest_rate_value(pp.get("interestRate"))
-                    fpa = pp.get("finalPriceAfterOriginationFee") or {}
-                    credit_cost = safe_float(fpa.get("amount"))
+    return jsonify({
+        "cache_key": cache_key,
+        "total_customers": cache_entry["total_customers"],
+        "analyzed_count": cache_entry["analyzed_count"],
+        "qualified_count": cache_entry["qualified_count"],
+        "incremental": cache_entry["incremental"],
+        "uwm_calls": cache_entry["uwm_calls"],
+        "reused_calls": cache_entry["reused_calls"],
+        "job": _job_progress(cache_key, cache_entry)
+    })
 
-                    # Avoid NameError; this is only an estimated breakdown
-                    buydown_details = calculate_buydown_details(
-                        rate_val, buydown, customer.remaining_balance,
-                        int(term) if term else 0)
 
-                    rate_data = {
-                        "interest_rate": rate_val,
-                        "monthly_payment": mp_val,
-                        "monthly_savings": round(savings, 2),
-                        "credit_cost": credit_cost,
-                        "buydown_breakdown": buydown_details
-                    }
+@app.route("/api/analysis/<cache_key>/cancel", methods=["POST"])
+def cancel_analysis_job(cache_key):
+    cache_entry, error = _get_live_cache_entry(cache_key)
+    if error:
+        return error
 
-                    products_by_term[key]["rates"].append(rate_data)
-
-                    if savings > best_savings:
-                        best_savings = float(savings)
-                        best_option = {
-                            "buydown": buydown,
-                            "product": product_name,
-                            "term": term,
-                            **rate_data
-                        }
-
-            # Mark closest to target on each product
-            for product in products_by_term.values():
-                product["rates"].sort(
-                    key=lambda x: x.get("interest_rate")
-                    if x.get("interest_rate") is not None else 999)
-
-                if product["rates"]:
-                    closest_rate = min(
-                        product["rates"],
-                        key=lambda x: abs(
-                            x.get("credit_cost", 0) - target_amount)
-                        if x.get("credit_cost") is not None else float('inf'))
-                    closest_rate["is_closest_to_target"] = True
+    job = analysis_jobs.get(cache_key)
+    if job and job.cancel():
+        return jsonify({"cache_key": cache_key, "job": job.progress()})
 
-            results.append({
-                "buydown_type": buydown,
-                "products": list(products_by_term.values())
-            })
+    progress = _job_progress(cache_key, cache_entry)
+    if not progress:
+        return jsonify({"error": "No background job for this analysis"}), 404
 
-        analysis_result = {
-            "customer": customer.to_dict(),
-            "scenarios": results,
-            "target_amount": target_amount,
-            "best_option": best_option,
-            "analyzed_at": datetime.now(timezone.utc).isoformat(),
-            "viewed": False
-        }
+    if progress["state"] == "running":
+        # Another worker runs it; it checks the flag before each customer
+        analysis_store.update_batch(cache_key, cancel_requested=True)
+        progress = {**progress, "state": "cancelling"}
+    elif progress["state"] == "stalled":
+        progress = {**progress, "state": "cancelled",
+                    "finished_at": datetime.now(timezone.utc).isoformat()}
+        analysis_store.update_batch(cache_key, job=progress)
+    return jsonify({"cache_key": cache_key, "job": progress})
 
-        cache_entry["results"][customer_key] = analysis_result
-        cache_entry["analyzed_count"] += 1
 
-        qualified = bool(best_option and best_savings >= min_savings)
-        if qualified:
-            cache_entry["qualified_count"] += 1
+@app.route("/api/analysis/<cache_key>/resume", methods=["POST"])
+def resume_analysis_job(cache_key):
+    cache_entry, error = _get_live_cache_entry(cache_key)
+    if error:
+        return error
 
-        return jsonify({
-            "qualified": qualified,
-            "customer_key": customer_key,
-            "customer_name": customer.name,
-            "best_savings": best_savings if best_option else 0,
-            "analysis": analysis_result if qualified else None
-        })
+    progress = _job_progress(cache_key, cache_entry)
+    if progress and progress["state"] in ("running", "cancelling"):
+        return jsonify({"error": "Job is already running", "job": progress}), 409
 
-    except Exception as e:
-        logger.error("Error in analyze_next_customer: %s", e, exc_info=True)
-        return jsonify({"error": str(e)}), 500
+    job = _start_analysis_job(cache_key, cache_entry)
+    return jsonify({"cache_key": cache_key, "job": job.progress()})
 
 
 @app.route("/api/analysis/<cache_key>/results", methods=["GET"])
 def get_cached_results(cache_key):
-    if cache_key not in analysis_cache:
-        return jsonify({"error": "Cache key not found"}), 404
-
-    cache_entry = analysis_cache[cache_key]
-
-    if datetime.now(timezone.utc) > cache_entry["expires_at"]:
-        del analysis_cache[cache_key]
-        return jsonify({"error": "Cache expired"}), 410
+    """
+    Batch results keyed by customer_key.
+    Optional paging: ?limit=N&after=<customer_key> (ordered by customer_key),
+    and ?qualified_only=1 to skip customers that did not qualify.
+    ?since=<cursor> returns only results stored since an earlier response's
+    `cursor`, so pollers fetch just what is new.
+    """
+    cache_entry, error = _get_live_cache_entry(cache_key)
+    if error:
+        return error
+
+    limit = request.args.get("limit", type=int)
+    after = request.args.get("after") or None
+    qualified_only = request.args.get("qualified_only", "").lower() in ("1", "true", "yes")
+    since = request.args.get("since") or None
+    if since is not None:
+        try:
+            since = datetime.fromisoformat(since)
+        except ValueError:
+            return jsonify({"error": "since must be an ISO timestamp"}), 400
+        if since.tzinfo is None:
+            since = since.replace(tzinfo=timezone.utc)
+
+    # Results are stamped before they commit, so the next poll looks back a
+    # little; callers skip customers they already have
+    cursor = datetime.now(timezone.utc) - RESULTS_CURSOR_OVERLAP
+    items, next_after = analysis_store.list_results(
+        cache_key,
+        after=after,
+        limit=max(1, limit) if limit else None,
+        qualified_only=qualified_only,
+        since=since)
 
     return jsonify({
         "cache_key": cache_key,
         "created_at": cache_entry["created_at"].isoformat(),
         "expires_at": cache_entry["expires_at"].isoformat(),
+        "total_customers": cache_entry["total_customers"],
         "analyzed_count": cache_entry["analyzed_count"],
         "qualified_count": cache_entry["qualified_count"],
-        "results": cache_entry["results"]
+        "uwm_calls": cache_entry["uwm_calls"],
+        "reused_calls": cache_entry["reused_calls"],
+        "results": dict(items),
+        "next_after": next_after,
+        "cursor": cursor.isoformat()
     })
 
 
 @app.route("/api/analysis/<cache_key>/result/<customer_key>", methods=["GET"])
 def get_customer_analysis(cache_key, customer_key):
-    if cache_key not in analysis_cache:
-        return jsonify({"error": "Cache key not found"}), 404
+    cache_entry, error = _get_live_cache_entry(cache_key)
+    if error:
+        return error
 
-    cache_entry = analysis_cache[cache_key]
-
-    if customer_key not in cache_entry["results"]:
+    result = analysis_store.get_result(cache_key, customer_key)
+    if result is None:
         return jsonify({"error": "Customer analysis not found"}), 404
 
-    return jsonify(cache_entry["results"][customer_key])
+    return jsonify(result)
 
 
 @app.route("/api/analysis/<cache_key>/mark-viewed/<customer_key>",
            methods=["POST"])
 def mark_analysis_viewed(cache_key, customer_key):
-    if cache_key not in analysis_cache:
-        return jsonify({"error": "Cache key not found"}), 404
+    cache_entry, error = _get_live_cache_entry(cache_key)
+    if error:
+        return error
 
-    cache_entry = analysis_cache[cache_key]
-    if customer_key in cache_entry["results"]:
-        cache_entry["results"][customer_key]["viewed"] = True
+    if analysis_store.mark_viewed(cache_key, customer_key):
         return jsonify({"success": True})
 
     return jsonify({"error": "Customer analysis not found"}), 404
 
 
+def rescore_grid(sheets: List[RateSheet], current_payment: float,
+                 min_savings: float, target_amount: float):
+    """
+    Score a stored grid against other thresholds the same way
+    analyze_customer_for_cache does. Returns None unless the customer
+    qualifies; otherwise the best option plus the closest-to-target rate
+    with the highest savings.
+    """
+    score = score_sheets(sheets, current_payment, min_savings, target_amount)
+    if score.best is None:
+        return None
+
+    s, entry, i = score.best
+    best_savings = float(entry.savings[i])
+    if best_savings < min_savings:
+        return None
+
+    target_option = None
+    target_savings = None
+    for sheet, selections in zip(sheets, score.scenarios):
+        for sel in selections:
+            if not sel.points:
+                continue
+            closest_entry, k = sel.points[sel.closest]
+            if target_option is None or closest_entry.savings[k] > target_savings:
+                target_savings = closest_entry.savings[k]
+                target_option = {
+                    "buydown": sheet.buydown_type,
+                    "product": sel.product_name,
+                    "term": sel.term_years,
+                    **closest_entry.rate_dict(k)
+                }
+
+    return {
+        "best_savings": round(best_savings, 2),
+        "best_option": {
+            "buydown": sheets[s].buydown_type,
+            "product": entry.product_name,
+            "term": entry.term_years,
+            **entry.rate_dict(i)
+        },
+        "target_option": target_option
+    }
+
+
+def _float_list(value) -> List[float]:
+    return [float(v) for v in (value if isinstance(value, list) else [value])]
+
+
+@app.route("/api/analysis/<cache_key>/sweep", methods=["POST"])
+def sweep_analysis(cache_key):
+    """
+    What-if re-scoring of a batch from its stored rate grids; no UWM calls.
+
+    Body: {"min_savings": number or list, "target_amount": number or list}
+    (each defaults to the batch setting). Every combination is scored
+    against every customer quoted so far. Customers skipped by the prefilter
+    have no grid and are only counted.
+    """
+    cache_entry, error = _get_live_cache_entry(cache_key)
+    if error:
+        return error
+
+    data = request.json or {}
+    try:
+        min_values = _float_list(data.get("min_savings", cache_entry["min_savings"]))
+        target_values = _float_list(
+            data.get("target_amount", cache_entry["target_amount"]))
+    except (TypeError, ValueError):
+        return jsonify({"error": "min_savings and target_amount must be numbers or lists of numbers"}), 400
+
+    combinations = [(m, t) for m in min_values for t in target_values]
+    if not combinations or len(combinations) > ANALYSIS_SWEEP_MAX_COMBINATIONS:
+        return jsonify({
+            "error": f"Between 1 and {ANALYSIS_SWEEP_MAX_COMBINATIONS} "
+                     "min_savings x target_amount combinations allowed"
+        }), 400
+
+    started = time.perf_counter()
+    grids = []
+    for customer_key, grid in analysis_store.list_grids(cache_key):
+        current_payment = grid["current_payment"]
+        if current_payment is None:
+            continue
+        sheets = [
+            RateSheet.from_dict(s, current_payment)
+            for s in grid["scenarios"] if not s.get("error")
+        ]
+        grids.append((customer_key, current_payment, sheets))
+    loaded_ms = (time.perf_counter() - started) * 1000
+
+    sweeps = []
+    for min_savings, target_amount in combinations:
+        qualified = []
+        for customer_key, current_payment, sheets in grids:
+            summary = rescore_grid(sheets, current_payment, min_savings,
+                                   target_amount)
+            if summary:
+                qualified.append({"customer_key": customer_key, **summary})
+        qualified.sort(key=lambda q: -q["best_savings"])
+        sweeps.append({
+            "min_savings": min_savings,
+            "target_amount": target_amount,
+            "qualified_count": len(qualified),
+            "qualified": qualified
+        })
+
+    elapsed_ms = (time.perf_counter() - started) * 1000
+    logger.info("Sweep %s: %d customers x %d combinations in %.1f ms",
+                cache_key, len(grids), len(combinations), elapsed_ms)
+
+    return jsonify({
+        "cache_key": cache_key,
+        "total_customers": cache_entry["total_customers"],
+        "analyzed_count": cache_entry["analyzed_count"],
+        "customers_scored": len(grids),
+        "customers_without_grid": max(0, cache_entry["analyzed_count"] - len(grids)),
+        "uwm_calls": 0,
+        "load_ms": round(loaded_ms, 1),
+        "elapsed_ms": round(elapsed_ms, 1),
+        "sweeps": sweeps
+    })
+
+
 # ============================================================
 # Legacy detailed analysis (accurate buydown lookup)
 # ============================================================
 @app.route("/api/customers/<customer_key>/analyze", methods=["POST"])
 def analyze_customer_detailed(customer_key):
+    trace = tracer.start("analyze_detailed", enabled=_trace_requested(),
+                         customer_key=customer_key)
     try:
         data = request.json or {}
         base_payload = data.get("payload", {}) or {}
         min_savings = float(data.get("min_savings", 200))
         target_amount = float(data.get("target_amount", -2000))
 
-        customer = Customer.get_current_by_key(customer_key)
+        with span("customer_lookup"):
+            customer = Customer.get_current_by_key(customer_key)
         if not customer:
             return jsonify({"error": "Customer not found"}), 404
 
@@ -1104,13 +2216,16 @@ def analyze_customer_detailed(customer_key):
         # FIRST PASS: Collect ALL rates from ALL scenarios (no filtering)
         all_scenarios_data = []
 
-        for buydown in buydown_scenarios:
-            payload = build_payload_from_customer(customer, base_payload)
-            payload["buyDownAliasId"] = buydown
+        t = time.perf_counter()
+        template = PayloadTemplate(base_payload)
+        payloads = [template.render(customer, buyDownAliasId=buydown)
+                    for buydown in buydown_scenarios]
+        t = _observe_stage("detailed", "payload", t)
 
-            resp = post_price_quote(access_token, payload)
-            time.sleep(UWM_REQUEST_DELAY_SECONDS)
+        responses = post_price_quotes(access_token, payloads)
+        t = _observe_stage("detailed", "quote", t)
 
+        for buydown, resp in zip(buydown_scenarios, responses):
             if resp.status_code != 200:
                 all_scenarios_data.append({
                     "buydown_type": buydown,
@@ -1155,24 +2270,20 @@ def analyze_customer_detailed(customer_key):
                     savings = customer.current_monthly_payment - mp_val
 
                     products_by_term[key]["rates"].append({
-                        "interest_rate":
-                        rate_val,
-                        "monthly_payment":
-                        mp_val,
-                        "monthly_savings":
-                        round(savings, 2),
-                        "credit_cost":
-                        safe_float(fpa.get("amount")),
+                        "interest_rate": rate_val,
+                        "monthly_payment": mp_val,
+                        "monthly_savings": round(savings, 2),
+                        "credit_cost": safe_float(fpa.get("amount")),
                     })
 
             all_scenarios_data.append({
-                "buydown_type":
-                buydown,
-                "products":
-                list(products_by_term.values())
+                "buydown_type": buydown,
+                "products": list(products_by_term.values())
             })
+        t = _observe_stage("detailed", "parse", t)
 
         # SECOND PASS: Build filtered results with buydown details
+        rate_index = RateIndex(all_scenarios_data)
         results = []
 
         for scenario in all_scenarios_data:
@@ -1184,6 +2295,8 @@ def analyze_customer_detailed(customer_key):
                 continue
 
             for product in scenario.get("products", []):
+                term = product["term_years"]
+                product_name = product["product_name"]
                 filtered_rates = [
                     r for r in product["rates"]
                     if r["monthly_savings"] >= min_savings
@@ -1191,35 +2304,30 @@ def analyze_customer_detailed(customer_key):
                 if not filtered_rates:
                     continue
 
-                filtered_rates.sort(key=lambda x: x.get("interest_rate", 999))
+                filtered_rates.sort(key=lambda x: x["interest_rate"]
+                                    if x["interest_rate"] is not None else 999)
 
                 for rate in filtered_rates:
                     if buydown_type != "None":
                         buydown_details = calculate_buydown_details_from_response(
                             rate["interest_rate"], buydown_type,
-                            all_scenarios_data, product["term_years"],
-                            product["product_name"])
+                            all_scenarios_data, term, product_name,
+                            rate_index)
                         rate["buydown_breakdown"] = buydown_details
                     else:
                         rate["buydown_breakdown"] = None
 
-                if filtered_rates:
-                    closest_rate = min(
-                        filtered_rates,
-                        key=lambda x: abs(
-                            x.get("credit_cost", 0) - target_amount)
-                        if x.get("credit_cost") is not None else float('inf'))
-                    closest_rate["is_closest_to_target"] = True
+                closest_rate = min(
+                    filtered_rates,
+                    key=lambda x: abs(x["credit_cost"] - target_amount)
+                    if x["credit_cost"] is not None else float('inf'))
+                closest_rate["is_closest_to_target"] = True
 
                 filtered_products.append({
-                    "term_years":
-                    product["term_years"],
-                    "product_name":
-                    product["product_name"],
-                    "product_alias":
-                    product["product_alias"],
-                    "rates":
-                    filtered_rates
+                    "term_years": term,
+                    "product_name": product_name,
+                    "product_alias": product["product_alias"],
+                    "rates": filtered_rates
                 })
 
             results.append({
@@ -1227,17 +2335,151 @@ def analyze_customer_detailed(customer_key):
                 "products": filtered_products
             })
 
-        return jsonify({
+        _observe_stage("detailed", "filter", t)
+        response = {
             "customer": customer.to_dict(),
             "scenarios": results,
             "target_amount": target_amount,
-        })
+        }
+        if trace:
+            response["trace"] = trace.summary()
+        return jsonify(response)
 
     except Exception as e:
         logger.error("Error in analyze_customer_detailed: %s",
                      e,
                      exc_info=True)
         return jsonify({"error": str(e)}), 500
+    finally:
+        tracer.finish(trace)
+
+
+# ============================================================
+# Metrics endpoint (Prometheus text format)
+# ============================================================
+def _analysis_store_counts():
+    stats = analysis_store.stats()
+    return {(kind, ): stats[kind] for kind in ("batches", "results", "grids")}
+
+
+def _quote_cache_lookups():
+    stats = quote_cache.stats()
+    return {("memory_hit", ): stats["hits"] - stats["disk_hits"],
+            ("disk_hit", ): stats["disk_hits"], ("miss", ): stats["misses"]}
+
+
+def _zipcode_cache_lookups():
+    stats = zipcode_cache.stats()
+    return {**{(tier, ): n for tier, n in stats["hits"].items()},
+            ("network", ): stats["fetches"]}
+
+
+def _http_client_stat(field):
+    return lambda: {(client.name, ): client.stats()[field] for client in http_clients}
+
+
+metrics.callback("analysis_store_entries", "Analysis store rows by kind",
+                 _analysis_store_counts, ["kind"])
+metrics.callback("quote_cache_entries", "UWM quote cache entries (memory tier)",
+                 lambda: quote_cache.stats()["entries"])
+metrics.callback("quote_cache_bytes", "UWM quote cache size (memory tier)",
+                 lambda: quote_cache.stats()["bytes"])
+metrics.callback("quote_cache_lookups_total", "UWM quote cache lookups by outcome",
+                 _quote_cache_lookups, ["outcome"], type="counter")
+metrics.callback("zipcode_cache_entries", "Zipcode cache entries (memory tier)",
+                 lambda: zipcode_cache.stats()["entries"])
+metrics.callback("zipcode_cache_lookups_total", "Zipcode lookups by answering tier",
+                 _zipcode_cache_lookups, ["tier"], type="counter")
+metrics.callback("http_client_requests_total", "Outbound HTTP requests per upstream",
+                 _http_client_stat("requests"), ["client"], type="counter")
+metrics.callback("http_client_errors_total", "Outbound HTTP request errors per upstream",
+                 _http_client_stat("errors"), ["client"], type="counter")
+metrics.callback("http_client_connections_opened_total",
+                 "Connections opened by the live pools per upstream",
+                 _http_client_stat("connections_opened"), ["client"], type="counter")
+metrics.callback("http_client_idle_connections", "Idle pooled connections per upstream",
+                 _http_client_stat("idle_connections"), ["client"])
+metrics.callback("uwm_token_refreshes_total", "UWM access token fetches",
+                 lambda: token_manager.stats()["refreshes"], type="counter")
+metrics.callback("log_records_dropped_total", "Log records dropped on a full queue",
+                 lambda: log_pipeline.stats()["dropped"], type="counter")
+
+
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    return Response(metrics.render(), content_type=METRICS_CONTENT_TYPE)
+
+
+# ============================================================
+# Debug: UWM token cache, rate limiter, quote cache, rate grid, HTTP pools,
+# zipcode cache, logging, analysis traces
+# ============================================================
+@app.route("/api/debug/token-stats", methods=["GET"])
+def debug_token_stats():
+    return jsonify(token_manager.stats())
+
+
+@app.route("/api/debug/rate-limit", methods=["GET"])
+def debug_rate_limit():
+    return jsonify(uwm_rate_limiter.stats())
+
+
+@app.route("/api/debug/quote-cache", methods=["GET"])
+def debug_quote_cache():
+    return jsonify(quote_cache.stats())
+
+
+@app.route("/api/debug/quote-cache", methods=["DELETE"])
+def clear_quote_cache():
+    quote_cache.clear()
+    return jsonify({"message": "Quote cache cleared"})
+
+
+@app.route("/api/debug/rate-grid", methods=["GET"])
+def debug_rate_grid():
+    return jsonify(rate_estimator.stats())
+
+
+@app.route("/api/debug/http", methods=["GET"])
+def debug_http_clients():
+    return jsonify({client.name: client.stats() for client in http_clients})
+
+
+@app.route("/api/debug/zipcode-cache", methods=["GET"])
+def debug_zipcode_cache():
+    return jsonify(zipcode_cache.stats())
+
+
+@app.route("/api/debug/zipcode-cache", methods=["DELETE"])
+def clear_zipcode_cache():
+    zipcode_cache.clear()
+    return jsonify({"message": "Zipcode cache cleared"})
+
+
+@app.route("/api/debug/traces", methods=["GET"])
+def debug_traces():
+    """Slowest traced analyses, slowest first (?limit=, ?name=analyze_next)."""
+    limit = request.args.get("limit", type=int)
+    return jsonify({
+        **tracer.stats(),
+        "traces": tracer.slowest(limit=limit, name=request.args.get("name")),
+    })
+
+
+@app.route("/api/debug/traces", methods=["DELETE"])
+def clear_traces():
+    tracer.clear()
+    return jsonify({"message": "Traces cleared"})
+
+
+@app.route("/api/debug/logging", methods=["GET"])
+def debug_logging():
+    return jsonify({
+        **log_pipeline.stats(),
+        "uwm_body_sample_rate": uwm_body_log.sample_rate,
+        "uwm_body_max_bytes": uwm_body_log.max_bytes,
+        "uwm_full_bodies": uwm_body_log.full,
+    })
 
 
 # ============================================================
@@ -1261,8 +2503,11 @@ def debug_build_payload(customer_key):
         if loan_term:
             payload["loanTermIds"] = [str(loan_term)]
 
-        logger.info("Built debug payload for customer %s:\n%s", customer_key,
-                    json.dumps(payload, indent=2, default=str))
+        fields = {"event": "debug_payload", "customer_key": customer_key}
+        if uwm_body_log.full:
+            fields["payload"] = uwm_body_log.body(payload)
+        logger.info("Built debug payload for customer %s", customer_key,
+                    extra=fields)
 
         return jsonify({
             "payload_unwrapped":
@@ -1278,8 +2523,70 @@ def debug_build_payload(customer_key):
 # ============================================================
 # FIXED: Accurate buydown endpoint (MUST be above catch-all + above app.run)
 # ============================================================
+# Farther than this from the target means UWM doesn't have the Year 1 rate
+ACCURATE_BUYDOWN_MAX_RATE_DIFF = 0.125
+
+
+def match_accurate_buydown(quote_body: dict, product_name: str,
+                           term_years: int, target_rate: float,
+                           current_payment: float):
+    """
+    Find the price point closest to `target_rate` for a product in a UWM
+    quote response. Returns (match, error); exactly one of them is None.
+    """
+    # product_name is the base name (e.g. "Conventional Elite 10 Year Fixed")
+    # UWM returns buydown products with a suffix e.g. "... - Buydown 2-1 LLPA"
+    # So match by: same term_years AND product name starts with or contains base name
+    best_match = None
+    best_diff = float('inf')
+
+    for item in quote_body.get("validQuoteItems", []):
+        if item.get("actualTermYears") != term_years:
+            continue
+        item_product = item.get("mortgageProductName") or ""
+        # Accept if the item product name contains the base product name
+        if product_name not in item_product:
+            continue
+        for pp in item.get("quotePricePoints", []):
+            rate_val = interest_rate_value(pp.get("interestRate"))
+            if rate_val is None:
+                continue
+            diff = abs(rate_val - target_rate)
+            if diff < best_diff:
+                best_diff = diff
+                mp = safe_float((pp.get("monthlyPayment")
+                                 or {}).get("value"))
+                best_match = {
+                    "rate": rate_val,
+                    "payment": mp,
+                    "savings": (current_payment - mp)
+                                if mp is not None else None,
+                    "credit_cost": safe_float(
+                        (pp.get("finalPriceAfterOriginationFee") or {}).get("amount")),
+                    "is_exact": diff < 0.01
+                }
+
+    if best_match:
+        diff = abs(best_match["rate"] - target_rate)
+        logger.info("Accurate buydown match: target=%.3f returned=%.3f diff=%.4f",
+                    target_rate, best_match["rate"], diff)
+        if diff > ACCURATE_BUYDOWN_MAX_RATE_DIFF:
+            logger.warning(
+                "Closest rate %.3f is %.4f away from target %.3f — exceeds threshold",
+                best_match["rate"], diff, target_rate)
+            return None, f"No rate close enough to {target_rate} (closest was {best_match['rate']})"
+        return best_match, None
+
+    logger.warning("No accurate match found. term=%s product=%s target=%.3f items=%s",
+                   term_years, product_name, target_rate,
+                   [(i.get("actualTermYears"), i.get("mortgageProductName"))
+                    for i in quote_body.get("validQuoteItems", [])])
+    return None, "No accurate match found"
+
+
 @app.route("/api/buydown/accurate", methods=["POST"])
 def get_accurate_buydown():
+    trace = tracer.start("accurate_buydown", enabled=_trace_requested())
     try:
         data = request.json or {}
         customer_key = data.get("customer_key")
@@ -1292,82 +2599,142 @@ def get_accurate_buydown():
         target_rate = float(target_rate_raw)
 
         base_payload = data.get("payload", {}) or {}
+        if trace:
+            trace.attrs.update(customer_key=customer_key,
+                               buydown_type=buydown_type)
 
-        customer = Customer.get_current_by_key(customer_key)
+        with span("customer_lookup"):
+            customer = Customer.get_current_by_key(customer_key)
         if not customer:
             return jsonify({"error": "Customer not found"}), 404
 
-        payload = build_payload_from_customer(customer, base_payload)
-        payload["buyDownAliasId"] = buydown_type
-        payload["targetRateValue"] = target_rate
+        with span("payload"):
+            payload = PayloadTemplate(base_payload).render(
+                customer, buyDownAliasId=buydown_type, targetRateValue=target_rate)
 
         logger.info(
-            "\n=== ACCURATE BUYDOWN REQUEST ===\ncustomer=%s  product=%s  term=%s  buydown=%s  targetRate=%.3f",
-            customer_key, product_name, term_years, buydown_type, target_rate
-        )
+            "Accurate buydown request: customer=%s product=%s term=%s buydown=%s targetRate=%.3f",
+            customer_key, product_name, term_years, buydown_type, target_rate)
         access_token = get_access_token()
         resp = post_price_quote(access_token, payload)
-        time.sleep(UWM_REQUEST_DELAY_SECONDS)
         if resp.status_code != 200:
             return jsonify({"error": resp.text}), resp.status_code
 
-        quote_body = parse_response_json(resp)
-        if not isinstance(quote_body, dict) or not quote_body:
-            return jsonify({"error": "Could not parse response"}), 500
+        with span("parse"):
+            quote_body = parse_response_json(resp)
+            if not isinstance(quote_body, dict) or not quote_body:
+                return jsonify({"error": "Could not parse response"}), 500
+
+        with span("match"):
+            match, error = match_accurate_buydown(
+                quote_body, product_name, term_years, target_rate,
+                customer.current_monthly_payment)
+        if error:
+            return jsonify({"error": error}), 404
+        if trace:
+            match["trace"] = trace.summary()
+        return jsonify(match)
 
-        # product_name is the base name (e.g. "Conventional Elite 10 Year Fixed")
-        # UWM returns buydown products with a suffix e.g. "... - Buydown 2-1 LLPA"
-        # So match by: same term_years AND product name starts with or contains base name
-        best_match = None
-        best_diff = float('inf')
+    except Exception as e:
+        logger.error("Error in get_accurate_buydown: %s", e, exc_info=True)
+        return jsonify({"error": str(e)}), 500
+    finally:
+        tracer.finish(trace)
 
-        for item in quote_body.get("validQuoteItems", []):
-            if item.get("actualTermYears") != term_years:
-                continue
-            item_product = item.get("mortgageProductName") or ""
-            # Accept if the item product name contains the base product name
-            if product_name not in item_product:
-                continue
-            for pp in item.get("quotePricePoints", []):
-                rate_val = interest_rate_value(pp.get("interestRate"))
-                if rate_val is None:
-                    continue
-                diff = abs(rate_val - target_rate)
-                if diff < best_diff:
-                    best_diff = diff
-                    mp = safe_float((pp.get("monthlyPayment")
-                                     or {}).get("value"))
-                    best_match = {
-                        "rate": rate_val,
-                        "payment": mp,
-                        "savings": (customer.current_monthly_payment - mp)
-                                    if mp is not None else None,
-                        "credit_cost": safe_float(
-                            (pp.get("finalPriceAfterOriginationFee") or {}).get("amount")),
-                        "is_exact": diff < 0.01
-                    }
 
-        MAX_RATE_DIFF = 0.125  # more than this means UWM doesn't have the Year 1 rate
-
-        if best_match:
-            diff = abs(best_match["rate"] - target_rate)
-            logger.info("Accurate buydown match: target=%.3f returned=%.3f diff=%.4f",
-                        target_rate, best_match["rate"], diff)
-            if diff > MAX_RATE_DIFF:
-                logger.warning(
-                    "Closest rate %.3f is %.4f away from target %.3f — exceeds threshold, returning 404",
-                    best_match["rate"], diff, target_rate)
-                return jsonify({"error": f"No rate close enough to {target_rate} (closest was {best_match['rate']})"}), 404
-            return jsonify(best_match)
-
-        logger.warning("No accurate match found. term=%s product=%s target=%.3f items=%s",
-                       term_years, product_name, target_rate,
-                       [(i.get("actualTermYears"), i.get("mortgageProductName"))
-                        for i in quote_body.get("validQuoteItems", [])])
-        return jsonify({"error": "No accurate match found"}), 404
+@app.route("/api/buydown/accurate/batch", methods=["POST"])
+def get_accurate_buydown_batch():
+    """
+    Resolve several Year 1 buydown rates for one customer in one request.
+
+    Body: {customer_key, payload, lookups: [{product_name, term_years,
+    buydown_type, target_rate}, ...]}. Lookups sharing a buydown type and
+    target rate share one UWM call; the calls run concurrently. Results come
+    back in lookup order, each either the match or an `error` + `status`.
+    """
+    try:
+        data = request.json or {}
+        customer_key = data.get("customer_key")
+        lookups = data.get("lookups")
+        if not isinstance(lookups, list) or not lookups:
+            return jsonify({"error": "lookups must be a non-empty list"}), 400
+
+        parsed = []
+        for i, lookup in enumerate(lookups):
+            if not isinstance(lookup, dict) or lookup.get("target_rate") is None:
+                return jsonify({"error": f"lookups[{i}]: missing target_rate"}), 400
+            try:
+                parsed.append({
+                    "product_name": lookup.get("product_name") or "",
+                    "term_years": int(lookup.get("term_years", 0)),
+                    "buydown_type": lookup.get("buydown_type"),
+                    "target_rate": float(lookup["target_rate"]),
+                })
+            except (TypeError, ValueError):
+                return jsonify({"error": f"lookups[{i}]: invalid term_years or target_rate"}), 400
+
+        customer = Customer.get_current_by_key(customer_key)
+        if not customer:
+            return jsonify({"error": "Customer not found"}), 404
+
+        base_payload = data.get("payload", {}) or {}
+
+        # One UWM call per (buydown type, target rate). The rate is grouped
+        # as parsed, so every lookup is matched against the exact rate its
+        # payload requested
+        groups = {}
+        for i, lookup in enumerate(parsed):
+            key = (lookup["buydown_type"], lookup["target_rate"])
+            groups.setdefault(key, []).append(i)
+
+        template = PayloadTemplate(base_payload)
+        payloads = [
+            template.render(customer, buyDownAliasId=buydown_type,
+                            targetRateValue=target_rate)
+            for buydown_type, target_rate in groups
+        ]
+
+        logger.info("Accurate buydown batch: customer=%s lookups=%d uwm_calls=%d",
+                    customer_key, len(parsed), len(payloads))
+        access_token = get_access_token()
+        responses = post_price_quotes(access_token, payloads)
+
+        results = [None] * len(parsed)
+        for indexes, resp in zip(groups.values(), responses):
+            quote_body = None
+            error, status = None, None
+            if resp.status_code != 200:
+                error, status = resp.text, resp.status_code
+            else:
+                quote_body = parse_response_json(resp)
+                if not isinstance(quote_body, dict) or not quote_body:
+                    error, status = "Could not parse response", 500
+
+            for i in indexes:
+                lookup = parsed[i]
+                result = dict(lookup)
+                if error:
+                    result.update({"error": error, "status": status})
+                else:
+                    match, match_error = match_accurate_buydown(
+                        quote_body, lookup["product_name"],
+                        lookup["term_years"], lookup["target_rate"],
+                        customer.current_monthly_payment)
+                    if match_error:
+                        result.update({"error": match_error, "status": 404})
+                    else:
+                        result.update(match)
+                results[i] = result
+
+        return jsonify({
+            "customer_key": customer_key,
+            "lookups": len(parsed),
+            "uwm_calls": len(payloads),
+            "results": results,
+        })
 
     except Exception as e:
-        logger.error("Error in get_accurate_buydown: %s", e, exc_info=True)
+        logger.error("Error in get_accurate_buydown_batch: %s", e, exc_info=True)
         return jsonify({"error": str(e)}), 500
 
 
@@ -1496,6 +2863,8 @@ def serve(path):
 # Run (KEEP THIS LAST in file)
 # ============================================================
 if __name__ == "__main__":
+    with app.app_context():
+        migrate()
     # Optional: print routes once to verify registration
     # print(app.url_map)
     app.run(host="0.0.0.0", port=5000, debug=False)
\ No newline at end of file
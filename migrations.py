@@ -0,0 +1,70 @@
+import logging
+from typing import List
+
+from sqlalchemy import inspect, literal, text
+from sqlalchemy.engine import Engine
+from sqlalchemy.sql.schema import Column
+
+from models import db
+
+logger = logging.getLogger(__name__)
+
+
+def _column_ddl(engine: Engine, column: Column) -> str:
+    """ADD COLUMN clause; NOT NULL only when a scalar default can backfill rows."""
+    dialect = engine.dialect
+    quote = dialect.identifier_preparer.quote
+    ddl = f"{quote(column.name)} {column.type.compile(dialect=dialect)}"
+
+    default = column.default.arg if column.default is not None and column.default.is_scalar else None
+    if default is not None:
+        value = literal(default, column.type).compile(
+            dialect=dialect, compile_kwargs={"literal_binds": True})
+        ddl += f" DEFAULT {value}"
+        if not column.nullable:
+            ddl += " NOT NULL"
+    return ddl
+
+
+def migrate(engine: Engine = None) -> List[str]:
+    """
+    Bring the database up to the models: create missing tables, then add
+    columns and indexes that tables created by earlier versions lack.
+    Idempotent; returns what it did. Needs an app context.
+
+    Only additive changes are made; nothing is dropped or altered.
+    """
+    engine = engine or db.engine
+    actions = []
+
+    existing_tables = set(inspect(engine).get_table_names())
+    db.create_all()
+    for table in db.metadata.sorted_tables:
+        if table.name not in existing_tables:
+            actions.append(f"created table {table.name}")
+
+    inspector = inspect(engine)
+    quote = engine.dialect.identifier_preparer.quote
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            if table.name not in existing_tables:
+                continue
+
+            columns = {c["name"] for c in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in columns:
+                    continue
+                conn.execute(text(
+                    f"ALTER TABLE {quote(table.name)} ADD COLUMN {_column_ddl(engine, column)}"))
+                actions.append(f"added column {table.name}.{column.name}")
+
+            indexes = {i["name"] for i in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in indexes:
+                    continue
+                index.create(conn)
+                actions.append(f"created index {index.name}")
+
+    for action in actions:
+        logger.info("migrate: %s", action)
+    return actions
@@ -55,8 +55,26 @@ class Customer(db.Model):
 
     __table_args__ = (
         db.Index('ix_customer_key_current', 'customer_key', 'is_current'),
+        # Keyset pagination of current customers in (customer_key, id) order
+        db.Index('ix_customer_current_key_id', 'is_current', 'customer_key', 'id'),
+        # Point-in-time (as-of) lookups, per customer and portfolio-wide
+        db.Index('ix_customer_key_effective', 'customer_key', 'effective_date', 'end_date'),
+        db.Index('ix_customer_effective_end', 'effective_date', 'end_date'),
     )
 
+    # Keys of to_dict(), all plain columns; the API's `fields=` choices
+    API_FIELDS = ('id', 'customer_key', 'version', 'name', 'phone', 'email',
+                  'current_monthly_payment', 'remaining_balance',
+                  'property_value', 'property_zip', 'property_county',
+                  'property_state', 'credit_score', 'monthly_income',
+                  'effective_date', 'end_date', 'is_current', 'created_at')
+
+    # Business fields compared between versions (SCD2 bookkeeping excluded)
+    DIFF_FIELDS = ('name', 'phone', 'email', 'current_monthly_payment',
+                   'remaining_balance', 'property_value', 'property_zip',
+                   'property_county', 'property_state', 'credit_score',
+                   'monthly_income')
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -92,4 +110,175 @@ class Customer(db.Model):
     @staticmethod
     def get_current_by_key(customer_key):
         """Get the current version of a customer by key"""
-        return Customer.query.filter_by(customer_key=customer_key, is_current=True).first()
\ No newline at end of file
+        return Customer.query.filter_by(customer_key=customer_key, is_current=True).first()
+
+    @staticmethod
+    def version_conditions(as_of=None):
+        """Current versions, or the versions in effect at naive-UTC `as_of`"""
+        if as_of is None:
+            return [Customer.is_current.is_(True)]
+        return [Customer.effective_date <= as_of,
+                db.or_(Customer.end_date.is_(None), Customer.end_date > as_of)]
+
+    @staticmethod
+    def get_as_of_by_key(customer_key, as_of):
+        """The version of a customer in effect at `as_of`, or None"""
+        return Customer.query.filter(Customer.customer_key == customer_key,
+                                     *Customer.version_conditions(as_of)).first()
+
+    @staticmethod
+    def get_page(conditions=(), fields=API_FIELDS, limit=100, after=None, as_of=None):
+        """
+        One page of current customers (or those in effect at `as_of`) ordered
+        by (customer_key, id), as dicts holding only `fields` (same formatting
+        as to_dict()). `after` is the (customer_key, id) of the last row of
+        the previous page. Returns (rows, (customer_key, id) of the last row
+        or None when no more).
+        """
+        columns = [getattr(Customer, f) for f in fields]
+        stmt = (db.select(Customer.customer_key, Customer.id, *columns)
+                .where(*Customer.version_conditions(as_of), *conditions)
+                .order_by(Customer.customer_key, Customer.id)
+                .limit(limit + 1))
+        if after is not None:
+            stmt = stmt.where(db.tuple_(Customer.customer_key, Customer.id) > after)
+
+        rows = db.session.execute(stmt).all()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        page = [{
+            f: v.isoformat() if isinstance(v, datetime) else v
+            for f, v in zip(fields, row[2:])
+        } for row in rows]
+        return page, (tuple(rows[-1][:2]) if more else None)
+
+    @staticmethod
+    def count(conditions=(), as_of=None):
+        """Number of current customers (or in effect at `as_of`) matching `conditions`"""
+        return db.session.execute(
+            db.select(db.func.count())
+            .select_from(Customer)
+            .where(*Customer.version_conditions(as_of), *conditions)).scalar_one()
+
+    @staticmethod
+    def diff(old, new):
+        """{field: {"from", "to"}} for DIFF_FIELDS that differ; `old` may be None"""
+        changes = {}
+        for f in Customer.DIFF_FIELDS:
+            before = getattr(old, f) if old is not None else None
+            after = getattr(new, f)
+            if before != after:
+                changes[f] = {"from": before, "to": after}
+        return changes
+
+    @staticmethod
+    def get_changes_page(since, until, conditions=(), limit=100, after=None):
+        """
+        Versions that took effect in [since, until), each with the fields it
+        changed against the version before it, ordered by (customer_key, id).
+        Returns (changes, (customer_key, id) of the last row or None).
+        """
+        prev = db.aliased(Customer)
+        stmt = (db.select(Customer, prev)
+                .outerjoin(prev, db.and_(prev.customer_key == Customer.customer_key,
+                                         prev.version == Customer.version - 1))
+                .where(Customer.effective_date >= since,
+                       Customer.effective_date < until, *conditions)
+                .order_by(Customer.customer_key, Customer.id)
+                .limit(limit + 1))
+        if after is not None:
+            stmt = stmt.where(db.tuple_(Customer.customer_key, Customer.id) > after)
+
+        rows = db.session.execute(stmt).all()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        changes = [{
+            "customer_key": new.customer_key,
+            "from_version": old.version if old is not None else None,
+            "to_version": new.version,
+            "effective_date": new.effective_date.isoformat(),
+            "changes": Customer.diff(old, new),
+        } for new, old in rows]
+        last = (rows[-1][0].customer_key, rows[-1][0].id) if more else None
+        return changes, last
+
+class AnalysisBatch(db.Model):
+    """One batch analysis run (formerly an entry of the in-memory analysis_cache)"""
+    __tablename__ = 'analysis_batches'
+
+    cache_key = db.Column(db.String(36), primary_key=True)
+    payload_data = db.Column(db.Text, nullable=False)  # JSON string
+    min_savings = db.Column(db.Float, nullable=False)
+    target_amount = db.Column(db.Float, nullable=False)
+    prefilter = db.Column(db.Boolean, nullable=False, default=False)
+    incremental = db.Column(db.Boolean, nullable=False, default=False)
+    total_customers = db.Column(db.Integer, nullable=False, default=0)
+    analyzed_count = db.Column(db.Integer, nullable=False, default=0)
+    qualified_count = db.Column(db.Integer, nullable=False, default=0)
+    uwm_calls = db.Column(db.Integer, nullable=False, default=0)  # price quotes sent
+    reused_calls = db.Column(db.Integer, nullable=False, default=0)  # price quotes reused from earlier grids
+    job_data = db.Column(db.Text, nullable=True)  # JSON progress snapshot of the background job
+    job_cancel_requested = db.Column(db.Boolean, nullable=False, default=False)  # /cancel from any worker
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+class AnalysisResult(db.Model):
+    """Analysis result of one customer within a batch"""
+    __tablename__ = 'analysis_results'
+
+    id = db.Column(db.Integer, primary_key=True)
+    cache_key = db.Column(db.String(36),
+                          db.ForeignKey('analysis_batches.cache_key', ondelete='CASCADE'),
+                          nullable=False)
+    customer_key = db.Column(db.String(50), nullable=False)
+    qualified = db.Column(db.Boolean, nullable=False, default=False)
+    viewed = db.Column(db.Boolean, nullable=False, default=False)
+    result_data = db.Column(db.Text, nullable=False)  # JSON string
+    analyzed_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('cache_key', 'customer_key', name='uq_analysis_result_customer'),
+        # Incremental polling (/results?since=...)
+        db.Index('ix_analysis_result_analyzed', 'cache_key', 'analyzed_at'),
+    )
+
+
+class AnalysisGrid(db.Model):
+    """Unfiltered rate grid quoted for one customer within a batch (for what-if sweeps)"""
+    __tablename__ = 'analysis_grids'
+
+    id = db.Column(db.Integer, primary_key=True)
+    cache_key = db.Column(db.String(36),
+                          db.ForeignKey('analysis_batches.cache_key', ondelete='CASCADE'),
+                          nullable=False)
+    customer_key = db.Column(db.String(50), nullable=False)
+    current_payment = db.Column(db.Float)
+    grid_data = db.Column(db.Text, nullable=False)  # JSON string (RateSheet.to_dict() per scenario)
+    quoted_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    # What the grid was quoted from, for incremental re-analysis
+    payload_key = db.Column(db.String(64))  # sha256 of the batch payload
+    customer_version = db.Column(db.Integer)
+    inputs_fingerprint = db.Column(db.String(64))  # sha256 of the quote-relevant customer fields
+
+    __table_args__ = (
+        db.UniqueConstraint('cache_key', 'customer_key', name='uq_analysis_grid_customer'),
+        db.Index('ix_analysis_grid_reuse', 'customer_key', 'payload_key', 'quoted_at'),
+    )
+
+
+class ProbeStat(db.Model):
+    """Screen 1 hit rate per (buydown, loan term) probe, accumulated across runs"""
+    __tablename__ = 'probe_stats'
+
+    id = db.Column(db.Integer, primary_key=True)
+    buydown_type = db.Column(db.String(50), nullable=False)
+    loan_term_id = db.Column(db.String(20), nullable=False)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    hits = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.UniqueConstraint('buydown_type', 'loan_term_id', name='uq_probe_stat'),
+    )
@@ -0,0 +1,164 @@
+import copy
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+def _to_str(x):
+    if x is None:
+        return None
+    return str(x)
+
+
+def _coerce_list_str(value):
+    """
+    Ensure value is a list[str]. Handles:
+      - [0] -> ["0"]
+      - "0" -> ["0"]
+      - None -> []
+    """
+    if value is None:
+        return []
+    if isinstance(value, list):
+        return [str(v) for v in value]
+    return [str(value)]
+
+
+def normalize_uwm_pricequote_payload(
+        payload: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normalizes payload fields for UWM expectations WITHOUT wrapping in priceQuoteRequest.
+    - Fix key casing issues (*ID -> *Id)
+    - Force ID-ish fields to strings
+    - Force array-of-ids to list[str] (loanTypeIds etc)
+    """
+    if not isinstance(payload, dict):
+        payload = {}
+
+    # If someone accidentally sent wrapped payload, unwrap it
+    inner = payload.get(
+        "priceQuoteRequest") if "priceQuoteRequest" in payload else payload
+    if not isinstance(inner, dict):
+        inner = {}
+
+    # Fix common casing variants you used in your builder
+    key_map = {
+        "purposeTypeID": "purposeTypeId",
+        "compensationPayerTypeID": "compensationPayerTypeId",
+        "buyDownAliasID": "buyDownAliasId",
+    }
+    for old_k, new_k in key_map.items():
+        if old_k in inner and new_k not in inner:
+            inner[new_k] = inner.pop(old_k)
+
+    # Ensure list-of-strings where UWM expects string IDs
+    if "loanTypeIds" in inner:
+        inner["loanTypeIds"] = _coerce_list_str(inner.get("loanTypeIds"))
+    if "loanTermIds" in inner:
+        inner["loanTermIds"] = _coerce_list_str(inner.get("loanTermIds"))
+    if "waivableFeeTypeIds" in inner:
+        inner["waivableFeeTypeIds"] = _coerce_list_str(
+            inner.get("waivableFeeTypeIds"))
+
+    # Force typical ID fields to string (but don't stringify booleans)
+    string_id_fields = [
+        "monthsOfReservesId",
+        "monthsOfBankStatementsId",
+        "commitmentPeriodId",
+        "occupancyTypeId",
+        "propertyTypeId",
+        "compensationPayerTypeId",
+        "escrowWaiverTypeId",
+        "tracTypeId",
+        "loanShieldTypeId",
+        "paPlusTypeId",
+        "exactRateTypeId",
+        "purposeTypeId",
+        "numberOfBorrowers",
+    ]
+    for f in string_id_fields:
+        if f in inner and inner[f] is not None and not isinstance(
+                inner[f], bool):
+            inner[f] = _to_str(inner[f])
+
+    # purposeTypeId in particular often needs to be string
+    if "purposeTypeId" in inner and inner[
+            "purposeTypeId"] is not None and not isinstance(
+                inner["purposeTypeId"], str):
+        inner["purposeTypeId"] = str(inner["purposeTypeId"])
+
+    return inner
+
+
+# Payload key -> Customer attribute filled in per customer, when the key is
+# present in the template
+CUSTOMER_FIELDS = (
+    ("borrowerName", "name"),
+    ("creditScore", "credit_score"),
+    ("monthlyIncome", "monthly_income"),
+    ("loanAmount", "remaining_balance"),
+    ("appraisedValue", "property_value"),
+    ("propertyZipCode", "property_zip"),
+    ("propertyState", "property_state"),
+    ("propertyCounty", "property_county"),
+)
+
+
+class QuotePayload(dict):
+    """A price-quote payload that is already normalized for UWM."""
+    __slots__ = ()
+
+
+class PayloadTemplate:
+    """
+    A base payload compiled once: copied, unwrapped and normalized (see
+    normalize_uwm_pricequote_payload), with the customer fields it carries
+    looked up up front.
+
+    render() then builds each customer / scenario payload as a shallow
+    overlay of the normalized base, so nested values (ID lists, etc.) are
+    shared between payloads and must be treated as read-only.
+    """
+    __slots__ = ("base", "customer_fields")
+
+    def __init__(self, base_payload: Optional[dict]):
+        base = copy.deepcopy(base_payload) if isinstance(base_payload, dict) else {}
+        self.base = normalize_uwm_pricequote_payload(base)
+        self.customer_fields = [(key, attr) for key, attr in CUSTOMER_FIELDS
+                                if key in self.base]
+
+    def render(self, customer, **overrides) -> QuotePayload:
+        """
+        Payload for `customer` with `overrides` (e.g. buyDownAliasId,
+        loanTermIds) applied and normalized like the template.
+        """
+        payload = QuotePayload(self.base)
+        for key, attr in self.customer_fields:
+            payload[key] = getattr(customer, attr)
+        if "propertyCounty" in payload:
+            payload["propertyCounty"] = payload["propertyCounty"] or ""
+        if overrides:
+            payload.update(normalize_uwm_pricequote_payload(overrides))
+        return payload
+
+
+class PayloadTemplateCache:
+    """Compiled templates of recent batches by cache key (LRU)."""
+
+    def __init__(self, max_entries: int = 64):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._templates = OrderedDict()
+
+    def get(self, key: str, base_payload: Optional[dict]) -> PayloadTemplate:
+        with self._lock:
+            template = self._templates.get(key)
+            if template is not None:
+                self._templates.move_to_end(key)
+                return template
+
+        template = PayloadTemplate(base_payload)
+        with self._lock:
+            self._templates[key] = template
+            while len(self._templates) > self.max_entries:
+                self._templates.popitem(last=False)
+        return template
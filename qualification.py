@@ -0,0 +1,166 @@
+import logging
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from models import db, ProbeStat
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Probe:
+    """One UWM call of the Screen 1 grid: a buydown scenario for one loan term."""
+    buydown: str
+    term: str
+
+
+@dataclass
+class QualificationResult:
+    """Outcome of probing one customer."""
+    customer_key: str
+    probes_planned: int = 0
+    calls_made: int = 0
+    lead: Optional[dict] = None
+    probe: Optional[Probe] = None
+
+    @property
+    def qualified(self) -> bool:
+        return self.lead is not None
+
+    @property
+    def calls_saved(self) -> int:
+        return self.probes_planned - self.calls_made
+
+
+@dataclass
+class _PlannerTotals:
+    customers: int = 0
+    qualified: int = 0
+    grid_size: int = 0
+    calls_made: int = 0
+    hits_by_probe: Dict[Probe, int] = field(default_factory=dict)
+
+
+class QualificationPlanner:
+    """
+    Orders a customer's buydown x term probes by how often each one
+    qualified in earlier runs and stops at the first qualifying probe.
+
+    Hit rates are Laplace-smoothed ((hits + 1) / (attempts + 2)), so probes
+    without history sit at 0.5 and keep their original order on ties.
+    """
+
+    def __init__(self, stats: Optional[Dict[Tuple[str, str], Tuple[int, int]]] = None):
+        self._lock = threading.Lock()
+        self._stats = {k: list(v) for k, v in (stats or {}).items()}  # {(buydown, term): [attempts, hits]}
+        self._pending = {}  # increments not yet flushed to the DB
+        self._totals = _PlannerTotals()
+
+    @classmethod
+    def load(cls) -> "QualificationPlanner":
+        """Build a planner from the persisted ProbeStat rows (needs an app context)."""
+        rows = ProbeStat.query.all()
+        return cls({(r.buydown_type, r.loan_term_id): (r.attempts, r.hits) for r in rows})
+
+    def hit_rate(self, probe: Probe) -> float:
+        attempts, hits = self._stats.get((probe.buydown, probe.term), (0, 0))
+        return (hits + 1) / (attempts + 2)
+
+    def plan(self, probes: List[Probe]) -> List[Probe]:
+        with self._lock:
+            return sorted(probes, key=lambda p: -self.hit_rate(p))
+
+    def record(self, probe: Probe, hit: bool) -> None:
+        key = (probe.buydown, probe.term)
+        with self._lock:
+            for counts in (self._stats.setdefault(key, [0, 0]),
+                           self._pending.setdefault(key, [0, 0])):
+                counts[0] += 1
+                counts[1] += 1 if hit else 0
+
+    def run(self,
+            customer_key: str,
+            probes: List[Probe],
+            execute: Callable[[List[Probe]], List[Optional[dict]]],
+            wave_size: int = 1) -> QualificationResult:
+        """
+        Probe in planned order, `wave_size` probes at a time. `execute` quotes
+        a wave and returns the lead (or None) of each probe in the same order.
+        Stops after the first wave containing a qualifying probe; the lead of
+        the highest-ranked qualifying probe wins.
+        """
+        ordered = self.plan(probes)
+        result = QualificationResult(customer_key, probes_planned=len(ordered))
+        wave_size = max(1, wave_size)
+
+        for start in range(0, len(ordered), wave_size):
+            wave = ordered[start:start + wave_size]
+            leads = execute(wave)
+            result.calls_made += len(wave)
+
+            for probe, lead in zip(wave, leads):
+                self.record(probe, lead is not None)
+                if lead is not None and result.lead is None:
+                    result.lead = lead
+                    result.probe = probe
+
+            if result.qualified:
+                break
+
+        with self._lock:
+            totals = self._totals
+            totals.customers += 1
+            totals.grid_size += result.probes_planned
+            totals.calls_made += result.calls_made
+            if result.qualified:
+                totals.qualified += 1
+                totals.hits_by_probe[result.probe] = totals.hits_by_probe.get(result.probe, 0) + 1
+
+        return result
+
+    def flush(self) -> None:
+        """Add this run's attempts/hits to ProbeStat (needs an app context)."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+        if not pending:
+            return
+
+        now = datetime.utcnow()
+        for (buydown, term), (attempts, hits) in pending.items():
+            res = db.session.execute(
+                update(ProbeStat)
+                .where(ProbeStat.buydown_type == buydown,
+                       ProbeStat.loan_term_id == term)
+                .values(attempts=ProbeStat.attempts + attempts,
+                        hits=ProbeStat.hits + hits,
+                        updated_at=now))
+            if res.rowcount == 0:
+                db.session.add(ProbeStat(buydown_type=buydown, loan_term_id=term,
+                                         attempts=attempts, hits=hits, updated_at=now))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another worker inserted the same probe row first; stats are advisory
+            db.session.rollback()
+            logger.info("Probe stats flush raced with another worker; skipped")
+
+    def summary(self) -> dict:
+        with self._lock:
+            t = self._totals
+            return {
+                "customers": t.customers,
+                "qualified": t.qualified,
+                "grid_size": t.grid_size,
+                "uwm_calls": t.calls_made,
+                "uwm_calls_saved": t.grid_size - t.calls_made,
+                "qualifying_probes": [{
+                    "buydown_type": p.buydown,
+                    "loan_term_id": p.term,
+                    "count": n
+                } for p, n in sorted(t.hits_by_probe.items(), key=lambda kv: -kv[1])],
+            }
@@ -0,0 +1,210 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+import requests
+from requests.structures import CaseInsensitiveDict
+
+logger = logging.getLogger(__name__)
+
+
+class QuoteResponseCache:
+    """
+    Content-addressed cache for UWM price quote responses.
+
+    - Key: sha256 of the canonical JSON of (url, normalized payload); the
+      access token is deliberately not part of the key
+    - Memory tier: LRU bounded by `max_bytes` of response bodies
+    - Optional disk tier: SQLite file shared by all workers on the host
+    - Only 200 responses are cached; entries live for `ttl_seconds`
+
+    `get()` returns a fresh requests.Response each time, so callers use it
+    exactly like a live response.
+    """
+
+    def __init__(self,
+                 ttl_seconds: float = 900.0,
+                 max_bytes: int = 64 * 1024 * 1024,
+                 disk_path: Optional[str] = None):
+        self.ttl_seconds = ttl_seconds
+        self.max_bytes = max_bytes
+        self.disk_path = disk_path
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # {key: (stored_at, status, headers, encoding, content)}
+        self._bytes = 0
+        self._local = threading.local()
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            self._disk().execute("""
+                CREATE TABLE IF NOT EXISTS quote_cache (
+                    key TEXT PRIMARY KEY,
+                    stored_at REAL NOT NULL,
+                    status INTEGER NOT NULL,
+                    headers TEXT NOT NULL,
+                    encoding TEXT,
+                    content BLOB NOT NULL
+                )
+            """)
+
+    @property
+    def enabled(self) -> bool:
+        return self.ttl_seconds > 0
+
+    @staticmethod
+    def key_for(url: str, normalized_payload: Dict[str, Any]) -> str:
+        canonical = json.dumps({"url": url, "payload": normalized_payload},
+                               sort_keys=True,
+                               separators=(",", ":"),
+                               default=str)
+        return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+    # ---------------- disk tier ----------------
+    def _disk(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.disk_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _disk_get(self, key: str):
+        row = self._disk().execute(
+            "SELECT stored_at, status, headers, encoding, content FROM quote_cache WHERE key = ?",
+            (key, )).fetchone()
+        if row is None:
+            return None
+        stored_at, status, headers, encoding, content = row
+        return stored_at, status, json.loads(headers), encoding, bytes(content)
+
+    def _disk_put(self, key: str, entry) -> None:
+        stored_at, status, headers, encoding, content = entry
+        conn = self._disk()
+        conn.execute(
+            "INSERT OR REPLACE INTO quote_cache (key, stored_at, status, headers, encoding, content) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (key, stored_at, status, json.dumps(headers), encoding, content))
+        conn.execute("DELETE FROM quote_cache WHERE stored_at < ?",
+                     (time.time() - self.ttl_seconds, ))
+
+    # ---------------- memory tier ----------------
+    def _remember(self, key: str, entry) -> None:
+        size = len(entry[4])
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[4])
+            self._entries[key] = entry
+            self._bytes += size
+            while self._bytes > self.max_bytes and self._entries:
+                _, evicted = self._entries.popitem(last=False)
+                self._bytes -= len(evicted[4])
+                self.evictions += 1
+
+    def _forget(self, key: str) -> None:
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= len(old[4])
+
+    # ---------------- public API ----------------
+    def get(self, key: str, url: str = None) -> Optional[requests.Response]:
+        if not self.enabled:
+            return None
+
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+
+        if entry is not None and now - entry[0] > self.ttl_seconds:
+            self._forget(key)
+            entry = None
+
+        if entry is None and self.disk_path:
+            try:
+                entry = self._disk_get(key)
+            except sqlite3.Error as e:
+                logger.warning("Quote cache disk read failed: %s", e)
+                entry = None
+            if entry is not None and now - entry[0] > self.ttl_seconds:
+                entry = None
+            if entry is not None:
+                self._remember(key, entry)
+                self.disk_hits += 1
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return self._to_response(entry, url)
+
+    def put(self, key: str, resp: requests.Response) -> None:
+        if not self.enabled or resp.status_code != 200:
+            return
+
+        entry = (time.time(), resp.status_code,
+                 dict(getattr(resp, "headers", None) or {}),
+                 getattr(resp, "encoding", None), resp.content or b"")
+        self._remember(key, entry)
+        self.stores += 1
+
+        if self.disk_path:
+            try:
+                self._disk_put(key, entry)
+            except sqlite3.Error as e:
+                logger.warning("Quote cache disk write failed: %s", e)
+
+    @staticmethod
+    def _to_response(entry, url: str = None) -> requests.Response:
+        _, status, headers, encoding, content = entry
+        resp = requests.Response()
+        resp.status_code = status
+        resp.headers = CaseInsensitiveDict(headers)
+        resp.encoding = encoding
+        resp._content = content
+        resp.url = url
+        return resp
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+        if self.disk_path:
+            self._disk().execute("DELETE FROM quote_cache")
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        with self._lock:
+            entries, size = len(self._entries), self._bytes
+        return {
+            "enabled": self.enabled,
+            "ttl_seconds": self.ttl_seconds,
+            "entries": entries,
+            "bytes": size,
+            "max_bytes": self.max_bytes,
+            "disk_tier": bool(self.disk_path),
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "stores": self.stores,
+            "evictions": self.evictions,
+        }
@@ -0,0 +1,100 @@
+from dataclasses import dataclass, field
+from typing import List, Optional, Sequence, Tuple
+
+from rate_sheet import ProductRates, RateSheet
+
+# Sort key the analysis routes use for a missing interest rate
+MISSING_RATE_KEY = 999.0
+
+
+@dataclass
+class ProductSelection:
+    """Price points of one (term_years, product_name) that passed min_savings."""
+    term_years: object
+    product_name: Optional[str]
+    product_alias: Optional[str]
+    points: List[Tuple[ProductRates, int]] = field(default_factory=list)  # ascending by rate
+    closest: Optional[int] = None  # position in `points` of the credit closest to target
+
+
+@dataclass
+class GridScore:
+    """
+    `scenarios[s]` lists the products of `sheets[s]` in order of first
+    appearance; `best` is the (sheet index, entry, point) with the highest
+    positive savings, first in scan order on ties.
+    """
+    scenarios: List[List[ProductSelection]]
+    best: Optional[Tuple[int, ProductRates, int]] = None
+
+
+def score_sheets(sheets: Sequence[RateSheet],
+                 current_payment: float,
+                 min_savings: float,
+                 target_amount: float,
+                 rounded_threshold: bool = False) -> GridScore:
+    """
+    Savings, min_savings filter, rate ordering and closest-to-target credit for
+    every product of every sheet in one pass.
+
+    Mirrors the per-product loops of the analysis routes: price points without
+    a payment are skipped; savings are `current_payment - payment`, compared
+    unrounded (batch analysis) or rounded to cents (`rounded_threshold`,
+    detailed analysis); points sort stably by rate with a missing rate as 999;
+    the closest credit is the first minimum of |credit_cost - target_amount|
+    in that order, a missing credit counting as infinitely far.
+
+    The filter runs on the sheets' savings columns (NaN, a missing payment,
+    fails every comparison), so rate and credit cost are only read for the
+    points that pass.
+    """
+    scenarios = []
+    best, best_savings = None, 0.0
+    # round() moves a value by at most half a cent
+    floor = min_savings - 0.01
+    inf = float("inf")
+
+    for s, sheet in enumerate(sheets):
+        # {(term_years, product_name): (selection, rate sort keys, credit distances)}
+        groups = {}
+        for entry in sheet.products:
+            key = (entry.term_years, entry.product_name)
+            group = groups.get(key)
+            if group is None:
+                group = groups[key] = (ProductSelection(key[0], key[1],
+                                                        entry.product_alias), [], [])
+
+            savings = entry.savings
+            if rounded_threshold:
+                passing = [i for i, v in enumerate(savings)
+                           if v >= floor and round(v, 2) >= min_savings]
+            else:
+                passing = [i for i, v in enumerate(savings) if v >= min_savings]
+            if not passing:
+                continue
+
+            sel, rate_keys, distances = group
+            rates, credit_costs = entry.rate, entry.credit_cost
+            for i in passing:
+                sel.points.append((entry, i))
+                rate = rates[i]
+                rate_keys.append(MISSING_RATE_KEY if rate != rate else rate)
+                dist = abs(credit_costs[i] - target_amount)
+                distances.append(inf if dist != dist else dist)
+
+            # First maximum, so ties keep the earlier point in scan order
+            i = max(passing, key=savings.__getitem__)
+            if savings[i] > best_savings:
+                best, best_savings = (s, entry, i), savings[i]
+
+        selections = []
+        for sel, rate_keys, distances in groups.values():
+            if sel.points:
+                order = sorted(range(len(rate_keys)), key=rate_keys.__getitem__)
+                sel.points = [sel.points[k] for k in order]
+                distances = [distances[k] for k in order]
+                sel.closest = distances.index(min(distances))
+            selections.append(sel)
+        scenarios.append(selections)
+
+    return GridScore(scenarios, best)
@@ -0,0 +1,81 @@
+from bisect import bisect_left
+from typing import Optional
+
+
+class RateIndex:
+    """
+    Rates of one customer's quote scenarios grouped by
+    (term_years, product_name), each group sorted by interest rate.
+
+    Built once per analysis; replaces walking every scenario, product and
+    rate for each Year 1 / Year 2 / actual lookup.
+    """
+
+    def __init__(self, scenarios: list):
+        groups = {}
+        seq = 0
+        for scenario in scenarios:
+            if not scenario.get("products"):
+                continue
+
+            for prod in scenario["products"]:
+                key = (prod.get("term_years"), prod.get("product_name"))
+                group = groups.setdefault(key, [])
+                for rate in prod.get("rates", []):
+                    rate_val = rate.get("interest_rate")
+                    if rate_val is None:
+                        continue
+                    group.append((rate_val, seq, rate))
+                    seq += 1
+
+        # {key: (rate values, scan order, rate dicts)}; the sort is stable, so
+        # equal rates keep the order in which the scenarios listed them
+        self._groups = {}
+        for key, group in groups.items():
+            group.sort(key=lambda t: t[0])
+            self._groups[key] = ([t[0] for t in group], [t[1] for t in group],
+                                 [t[2] for t in group])
+
+    def find_closest(self,
+                     term_years,
+                     product_name,
+                     target_rate: float,
+                     tolerance: float = 0.5) -> Optional[dict]:
+        """
+        Rate closest to `target_rate` within `tolerance`. Ties go to the rate
+        seen first in scenario order, like the linear scan this replaces.
+        """
+        group = self._groups.get((term_years, product_name))
+        if not group:
+            return None
+        vals, seqs, rates = group
+        n = len(vals)
+
+        i = bisect_left(vals, target_rate)
+        best = None  # (diff, seq, index)
+
+        # Nearest value on each side, plus any further values whose float
+        # difference rounds to the same amount
+        for start, step in ((i, 1), (i - 1, -1)):
+            if not 0 <= start < n:
+                continue
+            side_diff = abs(vals[start] - target_rate)
+            j = start
+            while 0 <= j < n and abs(vals[j] - target_rate) == side_diff:
+                cand = (side_diff, seqs[j], j)
+                if best is None or cand < best:
+                    best = cand
+                j += step
+
+        if best is None or best[0] > tolerance:
+            return None
+
+        diff, _, j = best
+        rate = rates[j]
+        return {
+            "rate": vals[j],
+            "payment": rate.get("monthly_payment"),
+            "savings": rate.get("monthly_savings"),
+            "credit_cost": rate.get("credit_cost"),
+            "is_exact": diff < 0.01
+        }
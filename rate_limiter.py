@@ -0,0 +1,182 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class SharedRateLimiter:
+    """
+    Token bucket shared by every process on the host through a small SQLite
+    file, so all gunicorn workers draw from one UWM budget.
+
+    - `acquire()` only sleeps when the bucket is empty (or UWM told us to back off)
+    - `penalize(seconds)` is called on a 429: it blocks the bucket for the
+      number of seconds UWM asked for and lowers the refill rate, once per
+      blocked window (the other calls that were in flight get 429s too)
+    - `record_success()` creeps the rate back up towards `max_rate`
+    """
+
+    def __init__(self,
+                 path: str,
+                 name: str = "uwm",
+                 rate: float = 1.0,
+                 burst: float = 1.0,
+                 min_rate: float = 0.05,
+                 max_rate: float = None,
+                 recovery_step: float = 0.02):
+        self.path = path
+        self.name = name
+        self.initial_rate = rate
+        self.burst = max(1.0, burst)
+        self.min_rate = min_rate
+        self.max_rate = max_rate if max_rate is not None else rate
+        self.recovery_step = recovery_step
+
+        self._local = threading.local()
+
+        # Process-local counters (the bucket itself is shared)
+        self.acquired = 0
+        self.waits = 0
+        self.seconds_waited = 0.0
+        self.penalties = 0
+
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        conn = self._conn()
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS rate_buckets (
+                name TEXT PRIMARY KEY,
+                tokens REAL NOT NULL,
+                rate REAL NOT NULL,
+                updated_at REAL NOT NULL,
+                blocked_until REAL NOT NULL DEFAULT 0
+            )
+        """)
+        conn.execute(
+            "INSERT OR IGNORE INTO rate_buckets (name, tokens, rate, updated_at, blocked_until) "
+            "VALUES (?, ?, ?, ?, 0)", (name, self.burst, rate, time.time()))
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _try_take(self) -> float:
+        """Take one token if available. Returns 0 on success, else seconds to wait."""
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT tokens, rate, updated_at, blocked_until FROM rate_buckets WHERE name = ?",
+                (self.name, )).fetchone()
+            tokens, rate, updated_at, blocked_until = row
+            now = time.time()
+
+            if now < blocked_until:
+                conn.execute("COMMIT")
+                return blocked_until - now
+
+            tokens = min(self.burst,
+                         tokens + max(0.0, now - updated_at) * rate)
+            if tokens >= 1.0:
+                conn.execute(
+                    "UPDATE rate_buckets SET tokens = ?, updated_at = ? WHERE name = ?",
+                    (tokens - 1.0, now, self.name))
+                conn.execute("COMMIT")
+                return 0.0
+
+            conn.execute(
+                "UPDATE rate_buckets SET tokens = ?, updated_at = ? WHERE name = ?",
+                (tokens, now, self.name))
+            conn.execute("COMMIT")
+            return (1.0 - tokens) / rate
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    def acquire(self) -> float:
+        """Block until a request may be sent. Returns the seconds spent waiting."""
+        waited = 0.0
+        while True:
+            wait = self._try_take()
+            if wait <= 0:
+                break
+            time.sleep(wait)
+            waited += wait
+
+        self.acquired += 1
+        if waited:
+            self.waits += 1
+            self.seconds_waited += waited
+        return waited
+
+    def penalize(self, retry_after: float) -> bool:
+        """
+        UWM answered 429 "Try again in N seconds": stop everyone for N seconds,
+        empty the bucket and lower the learned rate to what lets one burst
+        through in N seconds (at least halving it, never below min_rate).
+
+        A 429 that arrives while the bucket is already blocked belongs to the
+        same overrun and changes nothing. Returns whether the penalty applied.
+        """
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            rate, blocked_until = conn.execute(
+                "SELECT rate, blocked_until FROM rate_buckets WHERE name = ?",
+                (self.name, )).fetchone()
+            now = time.time()
+            if now < blocked_until:
+                conn.execute("COMMIT")
+                return False
+
+            new_rate = rate / 2.0
+            if retry_after > 0:
+                new_rate = min(new_rate, self.burst / retry_after)
+            new_rate = max(self.min_rate, new_rate)
+            conn.execute(
+                "UPDATE rate_buckets SET tokens = 0, rate = ?, updated_at = ?, "
+                "blocked_until = ? WHERE name = ?",
+                (new_rate, now, now + retry_after, self.name))
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        self.penalties += 1
+        logger.warning(
+            "UWM rate limit hit: blocking for %.1fs, rate %.3f -> %.3f req/s",
+            retry_after, rate, new_rate)
+        return True
+
+    def record_success(self) -> None:
+        """Additive increase after a successful call, capped at max_rate."""
+        if not self.recovery_step:
+            return
+        conn = self._conn()
+        conn.execute(
+            "UPDATE rate_buckets SET rate = MIN(?, rate + ?) WHERE name = ? AND rate < ?",
+            (self.max_rate, self.recovery_step, self.name, self.max_rate))
+
+    def stats(self) -> dict:
+        row = self._conn().execute(
+            "SELECT tokens, rate, blocked_until FROM rate_buckets WHERE name = ?",
+            (self.name, )).fetchone()
+        tokens, rate, blocked_until = row
+        return {
+            "rate_per_second": round(rate, 4),
+            "max_rate_per_second": self.max_rate,
+            "burst": self.burst,
+            "tokens": round(tokens, 3),
+            "blocked_for_seconds": round(max(0.0, blocked_until - time.time()), 1),
+            "acquired": self.acquired,
+            "waits": self.waits,
+            "seconds_waited": round(self.seconds_waited, 3),
+            "penalties": self.penalties,
+        }
@@ -0,0 +1,121 @@
+from array import array
+from typing import Dict, Iterator, List, Optional, Tuple
+
+NAN = float("nan")
+
+
+def _num(x) -> float:
+    """Column value of a stored field: the float, or NaN when missing/invalid."""
+    if type(x) is float:
+        return x
+    try:
+        return NAN if x is None else float(x)
+    except (TypeError, ValueError):
+        return NAN
+
+
+def _opt(value: float) -> Optional[float]:
+    # NaN is the only value not equal to itself; it marks a missing field
+    return None if value != value else value
+
+
+class ProductRates:
+    """
+    One product of a stored rate grid: the product plus its price points
+    stored as parallel float columns. Missing values are NaN in the columns
+    and come back as None from `point()` / `points()`.
+    """
+    __slots__ = ("term_years", "product_name", "product_alias", "rate",
+                 "payment", "credit_cost", "savings")
+
+    def __init__(self, term_years, product_name, product_alias):
+        self.term_years = term_years
+        self.product_name = product_name
+        self.product_alias = product_alias
+        self.rate = array("d")
+        self.payment = array("d")
+        self.credit_cost = array("d")
+        self.savings = array("d")
+
+    def __len__(self) -> int:
+        return len(self.payment)
+
+    def point(self, i: int) -> Tuple[Optional[float], ...]:
+        """(rate, payment, credit_cost, savings) of price point `i`."""
+        return (_opt(self.rate[i]), _opt(self.payment[i]),
+                _opt(self.credit_cost[i]), _opt(self.savings[i]))
+
+    def points(self) -> Iterator[Tuple[Optional[float], ...]]:
+        for i in range(len(self.payment)):
+            yield self.point(i)
+
+    def rate_dict(self, i: int) -> dict:
+        """Price point `i` in the JSON shape the analysis routes send."""
+        # Inlined NaN -> None checks: this runs for every rate a sweep sends
+        rate, payment = self.rate[i], self.payment[i]
+        credit_cost, savings = self.credit_cost[i], self.savings[i]
+        return {
+            "interest_rate": None if rate != rate else rate,
+            "monthly_payment": None if payment != payment else payment,
+            "monthly_savings": None if savings != savings else round(savings, 2),
+            "credit_cost": None if credit_cost != credit_cost else credit_cost,
+        }
+
+
+class RateSheet:
+    """
+    Stored rate grid of one customer and buydown scenario, loaded for the
+    what-if sweep.
+
+    analyze-next stores every quoted price point column-wise (the to_dict()
+    form) while it scores the raw response; the sweep loads those grids into
+    float columns, with savings computed against the customer's current
+    payment once, at load time. The analysis routes themselves never build
+    RateSheets.
+    """
+    __slots__ = ("buydown_type", "products")
+
+    def __init__(self, buydown_type: str, products: List[ProductRates] = None):
+        self.buydown_type = buydown_type
+        self.products = products or []
+
+    def to_dict(self) -> dict:
+        """Column-wise JSON form (savings are derived, so not stored)."""
+        return {
+            "buydown_type": self.buydown_type,
+            "products": [{
+                "term_years": p.term_years,
+                "product_name": p.product_name,
+                "product_alias": p.product_alias,
+                "rate": [_opt(v) for v in p.rate],
+                "payment": [_opt(v) for v in p.payment],
+                "credit_cost": [_opt(v) for v in p.credit_cost],
+            } for p in self.products],
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, current_payment: float) -> "RateSheet":
+        """Inverse of to_dict(); savings are computed against `current_payment`."""
+        products = []
+        for p in data.get("products", []):
+            product = ProductRates(p.get("term_years"), p.get("product_name"),
+                                   p.get("product_alias"))
+            payments = [_num(v) for v in p.get("payment", [])]
+            product.rate.extend(_num(v) for v in p.get("rate", []))
+            product.payment.extend(payments)
+            product.credit_cost.extend(_num(v) for v in p.get("credit_cost", []))
+            product.savings.extend(current_payment - v if v == v else NAN
+                                   for v in payments)
+            products.append(product)
+        return cls(data.get("buydown_type"), products)
+
+    def by_product(self) -> Dict[tuple, List[ProductRates]]:
+        """{(term_years, product_name): entries}, in order of first appearance."""
+        groups = {}
+        for product in self.products:
+            groups.setdefault((product.term_years, product.product_name),
+                              []).append(product)
+        return groups
+
+    def __len__(self) -> int:
+        return sum(len(p) for p in self.products)
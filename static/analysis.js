@@ -136,9 +136,9 @@ async function getParametersFromURL() {
 
 async function loadCustomerForSingleAnalysis(cKey) {
   try {
-    // Fetch all customers and find the one we need
-    const customers = await apiCall('/api/customers');
-    const customer = (customers || []).find(c => c.customer_key === cKey);
+    // Fetch just the customer we need
+    const page = await apiCall(`/api/customers?customer_key=${encodeURIComponent(cKey)}&limit=1`);
+    const customer = (page.customers || [])[0];
 
     if (!customer) {
       showToast('Customer not found', 'error');
@@ -276,28 +276,27 @@ async function displaySummaryTable(data) {
     return rates.find(r => r.interest_rate !== null && Math.abs(r.interest_rate - targetRate) < 0.01) || null;
   }
 
-  // Helper: call /api/buydown/accurate with targetRateValue
-  async function fetchAccurateYear1(customerKey, productName, termYears, buydownType, targetRate, payload) {
+  // Helper: resolve all missing Year 1 rates with one /api/buydown/accurate/batch call
+  async function fetchAccurateYear1Batch(customerKey, lookups, payload) {
+    if (!lookups.length) return [];
     try {
-
-      const resp = await fetch('/api/buydown/accurate', {
+      const resp = await fetch('/api/buydown/accurate/batch', {
         method: 'POST',
         headers: { 'Content-Type': 'application/json' },
         body: JSON.stringify({
           customer_key: customerKey,
-          product_name: productName,
-          term_years: termYears,
-          buydown_type: buydownType,
-          target_rate: targetRate,
+          lookups: lookups,
           payload: payload
         })
       });
       const result = await resp.json();
-      if (result && !result.error) return result;
+      if (result && Array.isArray(result.results)) {
+        return result.results.map(r => (r && !r.error) ? r : null);
+      }
     } catch (e) {
-      console.warn('fetchAccurateYear1 failed:', e);
+      console.warn('fetchAccurateYear1Batch failed:', e);
     }
-    return null;
+    return lookups.map(() => null);
   }
 
   // Show a loading placeholder while we resolve Year 1 data
@@ -307,6 +306,7 @@ async function displaySummaryTable(data) {
   const summaryData = {};
   const customerKey = data.customer.customer_key;
   const payload = (analysisData && analysisData.payload) ? analysisData.payload : {};
+  const pendingLookups = []; // Year 1 rates missing from the rate lists
 
   for (const scenario of data.scenarios || []) {
     const buydownType = scenario.buydown_type;
@@ -350,18 +350,7 @@ async function displaySummaryTable(data) {
         year1Source = 'rates';
       }
 
-      // Step 2: if not found, call /api/buydown/accurate with targetRateValue
-      if (!year1Rate && targetY1Rate !== null) {
-        const accurate = await fetchAccurateYear1(customerKey, productName, term, buydownType, targetY1Rate, payload);
-        if (accurate) {
-          year1Rate = accurate.rate;
-          year1Payment = accurate.payment;
-          year1Savings = accurate.savings;
-          year1Source = 'api';
-        }
-      }
-
-      summaryData[term].push({
+      const item = {
         buydownType,
         productName,
         rate: year1Rate !== null ? year1Rate : (targetY1Rate || baseRate),
@@ -371,10 +360,35 @@ async function displaySummaryTable(data) {
         yearLabel: 'Year 1',
         year1Source,
         baseRate
-      });
+      };
+      summaryData[term].push(item);
+
+      // Step 2: if not found, queue a targetRateValue lookup for the batch call
+      if (!year1Rate && targetY1Rate !== null) {
+        pendingLookups.push({
+          item,
+          lookup: {
+            product_name: productName,
+            term_years: term,
+            buydown_type: buydownType,
+            target_rate: targetY1Rate
+          }
+        });
+      }
     }
   }
 
+  const accurateResults = await fetchAccurateYear1Batch(
+    customerKey, pendingLookups.map(p => p.lookup), payload);
+  pendingLookups.forEach(({ item }, i) => {
+    const accurate = accurateResults[i];
+    if (!accurate) return;
+    item.rate = accurate.rate;
+    item.payment = accurate.payment;
+    item.savings = accurate.savings;
+    item.year1Source = 'api';
+  });
+
   // Sort terms ascending
   const sortedTerms = Object.keys(summaryData).sort((a, b) => parseInt(a) - parseInt(b));
 
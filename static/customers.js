@@ -1,7 +1,16 @@
 // Customers page functionality
 
-let allCustomers = [];
+// Rows per page and the columns the table shows
+const PAGE_SIZE = 50;
+const LIST_FIELDS = 'customer_key,name,phone,email,current_monthly_payment,credit_score,property_value,version';
+
+let allCustomers = [];  // rows of the current page
 let currentEditingKey = null;
+// Keyset paging: the cursor each visited page starts at (null: first page)
+let pageCursors = [null];
+let pageIndex = 0;
+let nextCursor = null;
+let searchTerm = '';
 
 document.addEventListener('DOMContentLoaded', () => {
   setupEventListeners();
@@ -27,6 +36,21 @@ function setupEventListeners() {
     filterCustomers(e.target.value);
   }, 300));
 
+  // Paging
+  document.getElementById('prevPageBtn').addEventListener('click', () => {
+    if (pageIndex > 0) {
+      pageIndex -= 1;
+      loadCustomers();
+    }
+  });
+  document.getElementById('nextPageBtn').addEventListener('click', () => {
+    if (nextCursor) {
+      pageCursors[pageIndex + 1] = nextCursor;
+      pageIndex += 1;
+      loadCustomers();
+    }
+  });
+
   // Zip code lookup
   const zipInput = document.getElementById('cZip');
   zipInput.addEventListener('blur', handleZipLookup);
@@ -119,12 +143,45 @@ async function handleCustomerSubmit(e) {
   }
 }
 
+function customerQuery(extra = {}) {
+  const params = new URLSearchParams(extra);
+  if (searchTerm) params.set('q', searchTerm);
+  return params.toString();
+}
+
 async function loadCustomers() {
   const tbody = document.getElementById('customerTableBody');
 
   try {
-    const customers = await apiCall('/api/customers');
+    const query = { limit: PAGE_SIZE, fields: LIST_FIELDS };
+    if (pageCursors[pageIndex]) query.cursor = pageCursors[pageIndex];
+    const [page, total] = await Promise.all([
+      apiCall(`/api/customers?${customerQuery(query)}`),
+      apiCall(`/api/customers/count?${customerQuery()}`)
+    ]);
+
+    // A page emptied by deletes: step back to the last non-empty one
+    if (page.customers.length === 0 && pageIndex > 0) {
+      pageIndex -= 1;
+      return loadCustomers();
+    }
+
+    const customers = page.customers;
     allCustomers = customers;
+    nextCursor = page.next_cursor;
+    pageCursors = pageCursors.slice(0, pageIndex + 1);
+    renderPager(customers.length, total.count);
+
+    if (customers.length === 0 && searchTerm) {
+      tbody.innerHTML = `
+        <tr>
+          <td colspan="7" style="text-align: center; padding: 2rem; color: var(--text-secondary);">
+            No customers match "${escapeHtml(searchTerm)}"
+          </td>
+        </tr>
+      `;
+      return;
+    }
 
     if (customers.length === 0) {
       tbody.innerHTML = `
@@ -202,21 +259,21 @@ function renderCustomers(customers) {
   `).join('');
 }
 
-function filterCustomers(searchTerm) {
-  if (!searchTerm) {
-    renderCustomers(allCustomers);
-    return;
-  }
-
-  const term = searchTerm.toLowerCase();
-  const filtered = allCustomers.filter(customer =>
-    customer.name?.toLowerCase().includes(term) ||
-    customer.email?.toLowerCase().includes(term) ||
-    customer.phone?.includes(term) ||
-    customer.customer_key?.toLowerCase().includes(term)
-  );
+function renderPager(shown, total) {
+  const first = pageIndex * PAGE_SIZE;
+  document.getElementById('customerPageInfo').textContent = shown
+    ? `Showing ${first + 1}-${first + shown} of ${total}`
+    : '';
+  document.getElementById('prevPageBtn').disabled = pageIndex === 0;
+  document.getElementById('nextPageBtn').disabled = !nextCursor;
+}
 
-  renderCustomers(filtered);
+function filterCustomers(term) {
+  // Searched on the server (name, email, phone or ID), from the first page
+  searchTerm = term.trim();
+  pageCursors = [null];
+  pageIndex = 0;
+  loadCustomers();
 }
 
 function getCreditScoreBadgeClass(score) {
@@ -234,10 +291,15 @@ function escapeHtml(text) {
   return div.innerHTML;
 }
 
-window.editCustomer = function(customerKey) {
-  const customer = allCustomers.find(c => c.customer_key === customerKey);
-  if (customer) {
-    openCustomerForm(customer);
+window.editCustomer = async function(customerKey) {
+  // The table only holds the listed columns; the form needs the full record
+  try {
+    const page = await apiCall(`/api/customers?customer_key=${encodeURIComponent(customerKey)}&limit=1`);
+    if (page.customers.length) {
+      openCustomerForm(page.customers[0]);
+    }
+  } catch (error) {
+    showToast(`Error: ${error.message}`, 'error');
   }
 };
 
@@ -8,8 +8,8 @@ document.addEventListener('DOMContentLoaded', async () => {
 async function loadDashboardStats() {
   try {
     // Load customers count
-    const customers = await apiCall('/api/customers');
-    document.getElementById('totalCustomers').textContent = customers.length;
+    const { count } = await apiCall('/api/customers/count');
+    document.getElementById('totalCustomers').textContent = count;
 
     // Load saved payloads count
     const payloads = await getSavedPayloads();
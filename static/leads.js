@@ -4,7 +4,12 @@ let isSearching = false;
 let searchAbortController = null;
 let currentCacheKey = null;
 let qualifiedLeads = [];
+let renderedLeadKeys = new Set();
 let viewedCustomers = new Set();
+// /results cursor of the last poll; later polls fetch only newer results
+let resultsCursor = null;
+
+const JOB_POLL_INTERVAL_MS = 2000;
 
 document.addEventListener('DOMContentLoaded', async () => {
   setupEventListeners();
@@ -66,6 +71,8 @@ async function loadCachedResults() {
     // Clear existing grid
     document.getElementById('leadsGrid').innerHTML = '';
     qualifiedLeads = [];
+    renderedLeadKeys = new Set();
+    resultsCursor = data.cursor;
 
     // Display all cached results
     Object.entries(data.results).forEach(([customerKey, result]) => {
@@ -76,12 +83,32 @@ async function loadCachedResults() {
           analyzed_at: result.analyzed_at
         };
         qualifiedLeads.push(lead);
+        renderedLeadKeys.add(customerKey);
         addLeadCard(lead, customerKey);
       }
     });
 
     updateResultsCount();
-    updateProgressDisplay(data.analyzed_count, data.qualified_count, 0);
+    updateProgressDisplay(data.analyzed_count, data.qualified_count, data.total_customers || 0);
+
+    // Keep following a job that is still running server-side
+    const progress = await apiCall(`/api/analysis/${currentCacheKey}/progress`);
+    if (jobState(progress) === 'running') {
+      isSearching = true;
+      searchAbortController = new AbortController();
+      document.getElementById('searchBtn').classList.add('hidden');
+      document.getElementById('stopBtn').classList.remove('hidden');
+      document.getElementById('progressSection').classList.remove('hidden');
+      try {
+        await pollAnalysisJob();
+      } catch (error) {
+        if (error.name !== 'AbortError') {
+          console.error('Failed to follow analysis job:', error);
+        }
+      } finally {
+        searchComplete();
+      }
+    }
 
   } catch (error) {
     // Cache expired or not found
@@ -113,7 +140,7 @@ async function handleSearch(e) {
   const targetAmount = parseFloat(document.getElementById('targetAmount').value);
   const ttlHours = parseFloat(document.getElementById('ttlHours').value);
 
-  // Start new analysis session
+  // Start new analysis session (runs server-side; this page only polls it)
   try {
     const startResponse = await apiCall('/api/analysis/start', {
       method: 'POST',
@@ -121,7 +148,8 @@ async function handleSearch(e) {
         payload: payload,
         min_savings: minSavings,
         target_amount: targetAmount,
-        ttl_hours: ttlHours
+        ttl_hours: ttlHours,
+        background: true
       })
     });
 
@@ -132,6 +160,8 @@ async function handleSearch(e) {
 
     // Reset state
     qualifiedLeads = [];
+    renderedLeadKeys = new Set();
+    resultsCursor = null;
     viewedCustomers = new Set();
     isSearching = true;
     searchAbortController = new AbortController();
@@ -144,56 +174,9 @@ async function handleSearch(e) {
     document.getElementById('resultsSection').classList.remove('hidden');
     document.getElementById('leadsGrid').innerHTML = '';
 
-    // Get all customers
-    const customers = await apiCall('/api/customers', {
-      signal: searchAbortController.signal
-    });
-
-    const total = customers.length;
-    let analyzed = 0;
-
-    updateProgressDisplay(analyzed, 0, total);
-
-    // Process customers one by one
-    for (const customer of customers) {
-      if (!isSearching) break;
-
-      try {
-        const result = await apiCall(`/api/analysis/${currentCacheKey}/analyze-next`, {
-          method: 'POST',
-          body: JSON.stringify({
-            customer_key: customer.customer_key
-          }),
-          signal: searchAbortController.signal
-        });
-
-        analyzed++;
-        updateProgressDisplay(analyzed, qualifiedLeads.length, total);
-
-        if (result.qualified && result.analysis) {
-          const lead = {
-            customer: result.analysis.customer,
-            ...result.analysis.best_option,
-            analyzed_at: result.analysis.analyzed_at
-          };
-          qualifiedLeads.push(lead);
-          addLeadCard(lead, customer.customer_key);
-          updateResultsCount();
-        }
-
-      } catch (error) {
-        if (error.name !== 'AbortError') {
-          console.error(`Error analyzing customer ${customer.customer_key}:`, error);
-        }
-        analyzed++;
-        updateProgressDisplay(analyzed, qualifiedLeads.length, total);
-      }
-    }
+    updateProgressDisplay(0, 0, startResponse.job ? startResponse.job.total : 0);
 
-    // Search complete
-    if (isSearching) {
-      showToast(`Analysis complete! Found ${qualifiedLeads.length} qualified leads`, 'success');
-    }
+    await pollAnalysisJob();
 
   } catch (error) {
     if (error.name !== 'AbortError') {
@@ -204,6 +187,57 @@ async function handleSearch(e) {
   }
 }
 
+async function pollAnalysisJob() {
+  while (isSearching) {
+    const progress = await apiCall(`/api/analysis/${currentCacheKey}/progress`, {
+      signal: searchAbortController.signal
+    });
+
+    await refreshLeadsFromResults();
+    updateProgressDisplay(progress.analyzed_count, qualifiedLeads.length, progress.total_customers);
+
+    const state = jobState(progress);
+    if (state !== 'running' && state !== 'cancelling') {
+      if (state === 'completed') {
+        showToast(`Analysis complete! Found ${qualifiedLeads.length} qualified leads`, 'success');
+      }
+      break;
+    }
+
+    await new Promise(resolve => setTimeout(resolve, JOB_POLL_INTERVAL_MS));
+  }
+}
+
+// A progress response can come from a server worker that is not running the
+// job and has no progress stored for it yet; unfinished counts mean it runs
+function jobState(progress) {
+  if (progress.job) return progress.job.state;
+  return progress.analyzed_count < progress.total_customers ? 'running' : 'completed';
+}
+
+async function refreshLeadsFromResults() {
+  const since = resultsCursor ? `&since=${encodeURIComponent(resultsCursor)}` : '';
+  const data = await apiCall(`/api/analysis/${currentCacheKey}/results?qualified_only=1${since}`, {
+    signal: searchAbortController ? searchAbortController.signal : undefined
+  });
+  resultsCursor = data.cursor;
+
+  Object.entries(data.results).forEach(([customerKey, result]) => {
+    if (!result.best_option || renderedLeadKeys.has(customerKey)) return;
+
+    const lead = {
+      customer: result.customer,
+      ...result.best_option,
+      analyzed_at: result.analyzed_at
+    };
+    qualifiedLeads.push(lead);
+    renderedLeadKeys.add(customerKey);
+    addLeadCard(lead, customerKey);
+  });
+
+  updateResultsCount();
+}
+
 function updateProgressDisplay(analyzed, qualified, total) {
   if (total > 0) {
     const percentage = (analyzed / total) * 100;
@@ -293,6 +327,10 @@ function stopSearch() {
   if (searchAbortController) {
     searchAbortController.abort();
   }
+  if (currentCacheKey) {
+    apiCall(`/api/analysis/${currentCacheKey}/cancel`, { method: 'POST' })
+      .catch(error => console.error('Failed to cancel analysis job:', error));
+  }
   isSearching = false;
   searchComplete();
   showToast('Search stopped', 'info');
@@ -0,0 +1,195 @@
+import atexit
+import copy
+import json
+import logging
+import queue
+import random
+import sys
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Iterable, Optional
+
+# Borrower identity, financial and location keys (those the UWM quote
+# payload carries included) and credential keys masked in logged bodies
+# (case-insensitive, at any depth)
+DEFAULT_REDACT_FIELDS = (
+    "borrowerName", "borrowerFirstName", "borrowerLastName", "firstName",
+    "lastName", "email", "phone", "ssn", "socialSecurityNumber",
+    "dateOfBirth", "address", "propertyAddress", "propertyStreetAddress",
+    "propertyZipCode", "propertyCounty", "propertyState", "zipCode",
+    "creditScore", "monthlyIncome", "monthlyDebt", "loanAmount",
+    "secondLoanAmount", "appraisedValue", "salesPrice", "annualTaxes",
+    "annualHomeownersInsurance", "access_token", "password", "client_secret",
+    "Authorization",
+)
+REDACTED = "[redacted]"
+
+# Attributes every LogRecord has; anything else on a record came from extra=
+_RECORD_ATTRS = frozenset(vars(logging.LogRecord("", 0, "", 0, "", None, None))) | {
+    "message", "asctime"}
+
+
+def redact(value: Any, fields: frozenset) -> Any:
+    """Copy of `value` with the values of keys in `fields` (lowercase) masked."""
+    if isinstance(value, dict):
+        return {
+            k: REDACTED if isinstance(k, str) and k.lower() in fields else redact(v, fields)
+            for k, v in value.items()
+        }
+    if isinstance(value, (list, tuple)):
+        return [redact(v, fields) for v in value]
+    return value
+
+
+class LogBody:
+    """
+    A request/response body attached to a log record through extra=.
+
+    Redacted when created (on the calling thread, so later changes to the
+    original never reach the log); serialized and capped at
+    `max_bytes` only when the record is written.
+    """
+    __slots__ = ("value", "max_bytes")
+
+    def __init__(self, value: Any, redact_fields: frozenset,
+                 max_bytes: Optional[int] = None):
+        self.value = redact(value, redact_fields)
+        self.max_bytes = max_bytes
+
+    def render(self) -> Any:
+        if self.max_bytes is None:
+            return self.value
+        text = self.value if isinstance(self.value, str) else json.dumps(
+            self.value, separators=(",", ":"), default=str)
+        if len(text) <= self.max_bytes:
+            return self.value
+        return {"truncated": text[:self.max_bytes], "bytes": len(text)}
+
+
+class BodyLogPolicy:
+    """
+    Which UWM calls get their bodies logged, and how much of them.
+
+    A `sample_rate` fraction of calls is logged with bodies capped at
+    `max_bytes`; with `full` every call is logged uncapped (debugging
+    only). Bodies are always redacted.
+    """
+
+    def __init__(self, sample_rate: float = 0.01, max_bytes: int = 4096,
+                 full: bool = False,
+                 redact_fields: Iterable[str] = DEFAULT_REDACT_FIELDS):
+        self.sample_rate = sample_rate
+        self.max_bytes = max_bytes
+        self.full = full
+        self.redact_fields = frozenset(f.lower() for f in redact_fields)
+
+    def sampled(self) -> bool:
+        return self.full or (self.sample_rate > 0 and random.random() < self.sample_rate)
+
+    def body(self, value: Any) -> LogBody:
+        return LogBody(value, self.redact_fields,
+                       None if self.full else self.max_bytes)
+
+
+class JsonLineFormatter(logging.Formatter):
+    """One compact JSON object per record: ts, level, logger, msg, extra= fields."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc)
+            .isoformat(timespec="milliseconds"),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_ATTRS:
+                line[key] = value.render() if isinstance(value, LogBody) else value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            line["exc"] = record.exc_text
+        return json.dumps(line, separators=(",", ":"), default=str,
+                          ensure_ascii=False)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """
+    QueueHandler that never blocks the caller: when the queue is full the
+    record is dropped and counted. Only the message is merged on the
+    calling thread; extra= fields and bodies are formatted by the listener.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+        self._exc_formatter = logging.Formatter()
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg, record.args = record.message, None
+        if record.exc_info:
+            record.exc_text = self._exc_formatter.formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class LoggingPipeline:
+    """The root logger's queue handler and its background writer."""
+
+    def __init__(self, handler: _DroppingQueueHandler, listener: QueueListener,
+                 fmt: str):
+        self.handler = handler
+        self.listener = listener
+        self.format = fmt
+
+    def stop(self) -> None:
+        """Flush queued records and stop the writer thread."""
+        if self.listener._thread is not None:
+            self.listener.stop()
+
+    def stats(self) -> dict:
+        return {
+            "format": self.format,
+            "level": logging.getLevelName(logging.getLogger().level),
+            "queued": self.handler.queue.qsize(),
+            "queue_size": self.handler.queue.maxsize,
+            "dropped": self.handler.dropped,
+        }
+
+
+def setup_logging(level: str = "INFO", fmt: str = "json", stream=None,
+                  queue_size: int = 10000) -> LoggingPipeline:
+    """
+    Replace the root logger's handlers with a non-blocking queue handler;
+    one background thread writes the records to `stream` (stderr) as JSON
+    lines (`fmt="json"`) or plain text (`fmt="text"`).
+    """
+    handler = logging.StreamHandler(stream or sys.stderr)
+    if fmt == "json":
+        handler.setFormatter(JsonLineFormatter())
+    else:
+        handler.setFormatter(logging.Formatter(
+            "%(asctime)s %(levelname)s %(name)s: %(message)s"))
+
+    log_queue = queue.Queue(queue_size)
+    queue_handler = _DroppingQueueHandler(log_queue)
+    listener = QueueListener(log_queue, handler, respect_handler_level=True)
+
+    root = logging.getLogger()
+    for existing in list(root.handlers):
+        root.removeHandler(existing)
+    root.addHandler(queue_handler)
+    root.setLevel(level.upper())
+
+    pipeline = LoggingPipeline(queue_handler, listener, fmt)
+    listener.start()
+    atexit.register(pipeline.stop)
+    return pipeline
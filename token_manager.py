@@ -0,0 +1,93 @@
+import logging
+import threading
+import time
+from typing import Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class TokenManager:
+    """
+    Process-wide OAuth access token cache.
+
+    - Caches the token for `expires_in` seconds as reported by the token endpoint
+    - Refreshes `refresh_margin` seconds ahead of expiry
+    - Single-flight: concurrent callers that find the token stale wait on one
+      refresh instead of each doing their own password-grant round trip
+    """
+
+    def __init__(self,
+                 fetch_token: Callable[[], Tuple[str, Optional[float]]],
+                 refresh_margin: float = 60.0,
+                 default_ttl: float = 3600.0):
+        self._fetch_token = fetch_token
+        self._refresh_margin = refresh_margin
+        self._default_ttl = default_ttl
+
+        self._lock = threading.Lock()
+        self._token = None
+        self._expires_at = 0.0
+
+        self.hits = 0
+        self.refreshes = 0
+        self.invalidations = 0
+        self.failures = 0
+
+    def _is_fresh(self, now: float) -> bool:
+        return (self._token is not None
+                and now < self._expires_at - self._refresh_margin)
+
+    def get_token(self, force_refresh: bool = False) -> str:
+        now = time.monotonic()
+        token = self._token
+        if not force_refresh and self._is_fresh(now):
+            self.hits += 1
+            return token
+
+        stale_token = token
+        with self._lock:
+            # Another thread may have refreshed while we waited on the lock
+            now = time.monotonic()
+            if self._is_fresh(now) and (not force_refresh
+                                        or self._token != stale_token):
+                self.hits += 1
+                return self._token
+
+            try:
+                access_token, expires_in = self._fetch_token()
+            except Exception:
+                self.failures += 1
+                raise
+
+            ttl = expires_in if expires_in and expires_in > 0 else self._default_ttl
+            self._token = access_token
+            self._expires_at = time.monotonic() + ttl
+            self.refreshes += 1
+            logger.info("UWM access token refreshed (expires in %.0fs)", ttl)
+            return access_token
+
+    def invalidate(self, token: Optional[str] = None) -> None:
+        """
+        Drop the cached token (e.g. after a 401). If `token` is given, only
+        drop it when it is still the cached one, so a token another thread
+        already replaced is left alone.
+        """
+        with self._lock:
+            if token is not None and token != self._token:
+                return
+            self._token = None
+            self._expires_at = 0.0
+            self.invalidations += 1
+
+    def stats(self) -> dict:
+        remaining = None
+        if self._token is not None:
+            remaining = round(max(0.0, self._expires_at - time.monotonic()), 1)
+        return {
+            "hits": self.hits,
+            "refreshes": self.refreshes,
+            "invalidations": self.invalidations,
+            "failures": self.failures,
+            "has_token": self._token is not None,
+            "expires_in_seconds": remaining,
+        }
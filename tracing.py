@@ -0,0 +1,181 @@
+import contextvars
+import heapq
+import itertools
+import threading
+import time
+from datetime import datetime, timezone
+from typing import List, Optional
+
+# The trace of the analysis running in this context (None: tracing is off).
+# Worker threads see it when tasks are submitted with contextvars.copy_context()
+_current_trace: contextvars.ContextVar = contextvars.ContextVar("analysis_trace",
+                                                                default=None)
+
+
+class Trace:
+    """
+    Timed spans of one traced analysis request. Spans are (name, start,
+    end, attrs) in time.perf_counter() seconds and may be added from
+    several threads. At most `max_spans` are kept; the rest are counted.
+    """
+
+    def __init__(self, name: str, max_spans: int = 200, **attrs):
+        self.name = name
+        self.attrs = attrs
+        self.max_spans = max_spans
+        self.started_at = datetime.now(timezone.utc)
+        self.start = time.perf_counter()
+        self.end = None
+        self.spans = []
+        self.dropped = 0
+        self._lock = threading.Lock()
+        self._token = None
+
+    def add(self, name: str, start: float, end: float, attrs: dict) -> None:
+        with self._lock:
+            if len(self.spans) < self.max_spans:
+                self.spans.append((name, start, end, attrs))
+            else:
+                self.dropped += 1
+
+    def total_ms(self) -> float:
+        return round(((self.end or time.perf_counter()) - self.start) * 1000, 1)
+
+    def summary(self) -> dict:
+        """
+        {"total_ms", "stages": {span name: summed ms}, "spans": [{"name",
+        "at_ms" (offset from the trace start), "ms", attrs...}], "dropped_spans"}.
+        Spans of concurrent UWM calls overlap, so stages can add up to more
+        than total_ms.
+        """
+        with self._lock:
+            spans = sorted(self.spans, key=lambda s: s[1])
+            dropped = self.dropped
+        stages = {}
+        entries = []
+        for name, start, end, attrs in spans:
+            ms = (end - start) * 1000
+            stages[name] = stages.get(name, 0.0) + ms
+            entries.append({"name": name,
+                            "at_ms": round((start - self.start) * 1000, 1),
+                            "ms": round(ms, 1), **attrs})
+        return {
+            "total_ms": self.total_ms(),
+            "stages": {name: round(ms, 1) for name, ms in stages.items()},
+            "spans": entries,
+            "dropped_spans": dropped,
+        }
+
+
+class _Span:
+    __slots__ = ("trace", "name", "attrs", "start")
+
+    def __init__(self, trace: Trace, name: str, attrs: dict):
+        self.trace = trace
+        self.name = name
+        self.attrs = attrs
+
+    def __enter__(self) -> dict:
+        self.start = time.perf_counter()
+        return self.attrs
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is not None:
+            self.attrs["error"] = exc_type.__name__
+        self.trace.add(self.name, self.start, time.perf_counter(), self.attrs)
+
+
+class _NoSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> dict:
+        return {}
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        return None
+
+
+_NO_SPAN = _NoSpan()
+
+
+def span(name: str, **attrs):
+    """
+    Context manager timing a span of the current trace; a no-op when no
+    trace is active. Yields the span's attrs dict, so the block can add
+    attributes (e.g. the response status) as it learns them.
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        return _NO_SPAN
+    return _Span(trace, name, attrs)
+
+
+def add_span(name: str, start: float, end: Optional[float] = None, **attrs) -> None:
+    """Record a span measured by the caller (perf_counter seconds), if tracing."""
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(name, start, time.perf_counter() if end is None else end, attrs)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+class Tracer:
+    """
+    Starts and finishes traces, keeping the `keep_slowest` slowest finished
+    ones (a bounded min-heap on total time) for the debug endpoint.
+    """
+
+    def __init__(self, keep_slowest: int = 50, max_spans: int = 200):
+        self.keep_slowest = keep_slowest
+        self.max_spans = max_spans
+        self._slowest = []  # [(total_ms, seq, entry)]
+        self._seq = itertools.count()
+        self._lock = threading.Lock()
+        self.finished = 0
+
+    def start(self, name: str, enabled: bool = True, **attrs) -> Optional[Trace]:
+        """Make a new trace current in this context; None (no-op) when not enabled."""
+        if not enabled:
+            return None
+        trace = Trace(name, max_spans=self.max_spans, **attrs)
+        trace._token = _current_trace.set(trace)
+        return trace
+
+    def finish(self, trace: Optional[Trace]) -> None:
+        """End `trace` (started in this context) and offer it to the slowest set."""
+        if trace is None:
+            return
+        trace.end = time.perf_counter()
+        _current_trace.reset(trace._token)
+
+        entry = {
+            "name": trace.name,
+            "started_at": trace.started_at.isoformat(),
+            **trace.attrs,
+            **trace.summary(),
+        }
+        item = (entry["total_ms"], next(self._seq), entry)
+        with self._lock:
+            self.finished += 1
+            if len(self._slowest) < self.keep_slowest:
+                heapq.heappush(self._slowest, item)
+            elif self._slowest and item[0] > self._slowest[0][0]:
+                heapq.heapreplace(self._slowest, item)
+
+    def slowest(self, limit: Optional[int] = None, name: Optional[str] = None) -> List[dict]:
+        with self._lock:
+            items = sorted(self._slowest, reverse=True)
+        entries = [entry for _, _, entry in items if name is None or entry["name"] == name]
+        return entries[:limit] if limit else entries
+
+    def clear(self) -> None:
+        with self._lock:
+            self._slowest = []
+
+    def stats(self) -> dict:
+        with self._lock:
+            kept = len(self._slowest)
+        return {"finished": self.finished, "kept": kept,
+                "keep_slowest": self.keep_slowest, "max_spans": self.max_spans}
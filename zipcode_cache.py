@@ -0,0 +1,289 @@
+import csv
+import json
+import logging
+import mmap
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Offline dataset: one fixed-width text line per ZIP, sorted by ZIP, fields
+# separated by OFFLINE_SEP and right-padded with spaces to OFFLINE_RECORD_SIZE
+# bytes (newline included), so record i starts at i * OFFLINE_RECORD_SIZE.
+OFFLINE_RECORD_SIZE = 128
+OFFLINE_SEP = "|"
+OFFLINE_FIELDS = ("zipcode", "city", "state", "county", "countyFips",
+                  "latitude", "longitude")
+
+
+class LookupUnavailable(Exception):
+    """The upstream lookup failed for a reason other than 'not found'."""
+
+
+def build_offline_dataset(csv_path: str, out_path: str) -> int:
+    """
+    Write the offline dataset from a CSV with columns zip, city, state,
+    county, county_fips, latitude, longitude (header row required). Later
+    rows win for a repeated ZIP. Returns the number of records written.
+    """
+    records = {}
+    with open(csv_path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f):
+            zipcode = (row.get("zip") or "").strip().zfill(5)
+            if not zipcode.isdigit() or len(zipcode) != 5:
+                continue
+            values = [zipcode] + [
+                (row.get(col) or "").strip().replace(OFFLINE_SEP, " ")
+                for col in ("city", "state", "county", "county_fips",
+                            "latitude", "longitude")
+            ]
+            line = OFFLINE_SEP.join(values).encode("utf-8")
+            if len(line) > OFFLINE_RECORD_SIZE - 1:
+                raise ValueError(f"Record for {zipcode} exceeds {OFFLINE_RECORD_SIZE - 1} bytes")
+            records[zipcode] = line.ljust(OFFLINE_RECORD_SIZE - 1) + b"\n"
+
+    tmp_path = out_path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        for zipcode in sorted(records):
+            f.write(records[zipcode])
+    os.replace(tmp_path, out_path)
+    return len(records)
+
+
+class OfflineZipDataset:
+    """Read-only, memory-mapped offline dataset; binary search per lookup."""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size % OFFLINE_RECORD_SIZE:
+                raise ValueError(f"{path}: size is not a multiple of {OFFLINE_RECORD_SIZE}")
+            # The map stays valid after the file is closed
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else None
+        self.records = size // OFFLINE_RECORD_SIZE
+
+    def get(self, zipcode: str) -> Optional[dict]:
+        key = zipcode.encode("ascii")
+        lo, hi = 0, self.records
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = mid * OFFLINE_RECORD_SIZE
+            current = self._map[start:start + 5]
+            if current < key:
+                lo = mid + 1
+            elif current > key:
+                hi = mid
+            else:
+                line = self._map[start:start + OFFLINE_RECORD_SIZE].decode("utf-8").rstrip()
+                return dict(zip(OFFLINE_FIELDS, line.split(OFFLINE_SEP)))
+        return None
+
+
+class ZipcodeCache:
+    """
+    Tiered ZIP -> city/state/county lookup.
+
+    1. In-process LRU of up to `max_entries` ZIPs
+    2. SQLite table shared by the workers on the host (`db_path`, optional)
+    3. Offline memory-mapped dataset (`offline_path`, optional; never expires)
+    4. `fetch(zipcode)`: the upstream services. Returns the record, or None
+       for an unknown ZIP; raises on failures, which are not cached.
+
+    Found ZIPs live `ttl_seconds`, unknown ones (and records missing their
+    county) `negative_ttl_seconds`. Entries older than
+    `refresh_after_seconds` are still served but re-fetched in the
+    background; when a fetch fails a stale entry is served instead.
+    """
+
+    def __init__(self,
+                 fetch: Callable[[str], Optional[dict]],
+                 ttl_seconds: float = 30 * 86400,
+                 negative_ttl_seconds: float = 86400,
+                 refresh_after_seconds: float = 7 * 86400,
+                 max_entries: int = 50000,
+                 db_path: Optional[str] = None,
+                 offline_path: Optional[str] = None):
+        self._fetch = fetch
+        self.ttl_seconds = ttl_seconds
+        self.negative_ttl_seconds = negative_ttl_seconds
+        self.refresh_after_seconds = refresh_after_seconds
+        self.max_entries = max_entries
+        self.db_path = db_path
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # {zipcode: (stored_at, record or None)}
+        self._local = threading.local()
+        self._refreshing = set()
+        self._refresher = ThreadPoolExecutor(max_workers=1,
+                                             thread_name_prefix="zip-refresh")
+
+        self.offline = None
+        if offline_path:
+            try:
+                self.offline = OfflineZipDataset(offline_path)
+            except (OSError, ValueError) as e:
+                logger.warning("Offline ZIP dataset not loaded: %s", e)
+
+        self.hits = {"memory": 0, "sqlite": 0, "offline": 0}
+        self.fetches = 0
+        self.fetch_failures = 0
+        self.stale_served = 0
+        self.refreshes = 0
+
+        if db_path:
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db().execute("""
+                CREATE TABLE IF NOT EXISTS zipcodes (
+                    zipcode TEXT PRIMARY KEY,
+                    stored_at REAL NOT NULL,
+                    data TEXT
+                )
+            """)
+
+    # ---------------- SQLite tier ----------------
+    def _db(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _db_get(self, zipcode: str):
+        row = self._db().execute(
+            "SELECT stored_at, data FROM zipcodes WHERE zipcode = ?",
+            (zipcode, )).fetchone()
+        if row is None:
+            return None
+        return row[0], json.loads(row[1]) if row[1] else None
+
+    def _db_put(self, zipcode: str, entry) -> None:
+        stored_at, record = entry
+        self._db().execute(
+            "INSERT OR REPLACE INTO zipcodes (zipcode, stored_at, data) VALUES (?, ?, ?)",
+            (zipcode, stored_at, json.dumps(record) if record else None))
+
+    # ---------------- memory tier ----------------
+    def _remember(self, zipcode: str, entry) -> None:
+        with self._lock:
+            self._entries[zipcode] = entry
+            self._entries.move_to_end(zipcode)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _ttl(self, record: Optional[dict]) -> float:
+        if record is None or not record.get("countyFips"):
+            return self.negative_ttl_seconds
+        return self.ttl_seconds
+
+    # ---------------- public API ----------------
+    def lookup(self, zipcode: str) -> Tuple[Optional[dict], str]:
+        """
+        (record or None if the ZIP is unknown, tier that answered). Raises
+        what `fetch` raises when no tier, fresh or stale, has the ZIP.
+        """
+        now = time.time()
+        stale = None
+
+        with self._lock:
+            entry = self._entries.get(zipcode)
+            if entry is not None:
+                self._entries.move_to_end(zipcode)
+        source = "memory"
+
+        if entry is None and self.db_path:
+            try:
+                entry = self._db_get(zipcode)
+            except sqlite3.Error as e:
+                logger.warning("Zipcode cache read failed: %s", e)
+            if entry is not None:
+                self._remember(zipcode, entry)
+                source = "sqlite"
+
+        if entry is not None:
+            age = now - entry[0]
+            if age <= self._ttl(entry[1]):
+                self.hits[source] += 1
+                if age > self.refresh_after_seconds:
+                    self._schedule_refresh(zipcode)
+                return entry[1], source
+            stale = entry
+
+        if self.offline is not None:
+            record = self.offline.get(zipcode)
+            if record is not None:
+                self.hits["offline"] += 1
+                return record, "offline"
+
+        try:
+            return self._fetch_and_store(zipcode), "network"
+        except Exception:
+            if stale is None:
+                raise
+            self.stale_served += 1
+            return stale[1], "stale"
+
+    def _fetch_and_store(self, zipcode: str) -> Optional[dict]:
+        self.fetches += 1
+        try:
+            record = self._fetch(zipcode)
+        except Exception:
+            self.fetch_failures += 1
+            raise
+
+        entry = (time.time(), record)
+        self._remember(zipcode, entry)
+        if self.db_path:
+            try:
+                self._db_put(zipcode, entry)
+            except sqlite3.Error as e:
+                logger.warning("Zipcode cache write failed: %s", e)
+        return record
+
+    def _schedule_refresh(self, zipcode: str) -> None:
+        with self._lock:
+            if zipcode in self._refreshing:
+                return
+            self._refreshing.add(zipcode)
+
+        def refresh():
+            try:
+                self._fetch_and_store(zipcode)
+                self.refreshes += 1
+            except Exception as e:
+                logger.info("Background zipcode refresh of %s failed: %s", zipcode, e)
+            finally:
+                with self._lock:
+                    self._refreshing.discard(zipcode)
+
+        self._refresher.submit(refresh)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self.db_path:
+            self._db().execute("DELETE FROM zipcodes")
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries = len(self._entries)
+        return {
+            "entries": entries,
+            "max_entries": self.max_entries,
+            "ttl_seconds": self.ttl_seconds,
+            "negative_ttl_seconds": self.negative_ttl_seconds,
+            "refresh_after_seconds": self.refresh_after_seconds,
+            "hits": dict(self.hits),
+            "fetches": self.fetches,
+            "fetch_failures": self.fetch_failures,
+            "stale_served": self.stale_served,
+            "background_refreshes": self.refreshes,
+            "sqlite": self.db_path,
+            "offline_records": self.offline.records if self.offline else None,
+        }